@@ -0,0 +1,93 @@
+"""
+Micro-benchmark for writing embeddings to the database.
+
+Compares the previous ingestion path (npy -> Python list -> struct.pack,
+one INSERT per embedding) with the buffer path used by the data handlers
+(npy view -> float32 buffer, one executemany per item).
+
+Usage:
+    poetry run python scripts/benchmark_embedding_ingest.py [--n 20000] [--dim 768]
+"""
+
+import argparse
+import sqlite3
+import time
+
+import numpy as np
+
+from panoptikon.data_extractors.data_handlers.utils import (
+    deserialize_array,
+    deserialize_array_view,
+    serialize_array,
+)
+from panoptikon.db.embeddings import add_embedding, add_embeddings
+
+
+def create_tables(conn: sqlite3.Connection, n: int):
+    conn.execute("CREATE TABLE item_data (id INTEGER PRIMARY KEY, data_type)")
+    conn.execute(
+        "CREATE TABLE embeddings (id INTEGER PRIMARY KEY, embedding BLOB)"
+    )
+    conn.executemany(
+        "INSERT INTO item_data (id, data_type) VALUES (?, 'clip')",
+        [(i,) for i in range(n)],
+    )
+    conn.commit()
+
+
+def ingest_lists(conn: sqlite3.Connection, payloads, frames: int):
+    for i, payload in enumerate(payloads):
+        for j, embedding in enumerate(deserialize_array(payload)):
+            add_embedding(conn, i * frames + j, "clip", embedding.tolist())
+    conn.commit()
+
+
+def ingest_buffers(conn: sqlite3.Connection, payloads, frames: int):
+    for i, payload in enumerate(payloads):
+        add_embeddings(
+            conn,
+            "clip",
+            [
+                (i * frames + j, embedding)
+                for j, embedding in enumerate(deserialize_array_view(payload))
+            ],
+        )
+    conn.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n", type=int, default=20000, help="Embeddings")
+    parser.add_argument("--dim", type=int, default=768, help="Dimensions")
+    parser.add_argument("--frames", type=int, default=4, help="Per item")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    items = args.n // args.frames
+    payloads = [
+        serialize_array(
+            rng.standard_normal((args.frames, args.dim)).astype(np.float32)
+        )
+        for _ in range(items)
+    ]
+    results = {}
+    for name, ingest in [("lists", ingest_lists), ("buffers", ingest_buffers)]:
+        conn = sqlite3.connect(":memory:")
+        create_tables(conn, items * args.frames)
+        start = time.perf_counter()
+        ingest(conn, payloads, args.frames)
+        elapsed = time.perf_counter() - start
+        results[name] = conn.execute(
+            "SELECT embedding FROM embeddings ORDER BY id"
+        ).fetchall()
+        print(
+            f"{name:>8}: {elapsed:.3f}s "
+            + f"({items * args.frames / elapsed:.0f} embeddings/s)"
+        )
+        conn.close()
+    assert results["lists"] == results["buffers"], "Outputs differ"
+    print("Both paths wrote identical blobs")
+
+
+if __name__ == "__main__":
+    main()
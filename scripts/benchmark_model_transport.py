@@ -0,0 +1,90 @@
+"""
+Micro-benchmark for sending inputs to and outputs from model subprocesses.
+
+Compares the pipe transport (inputs and outputs pickled through the
+multiprocessing pipe) with the shared memory transport (payloads copied
+to a shared memory slab, only descriptors through the pipe), using a
+process-isolated model that echoes its input files back as outputs.
+
+Usage:
+    poetry run python scripts/benchmark_model_transport.py [--requests 50] [--batch 16] [--size-kb 2048]
+"""
+
+import argparse
+import os
+import time
+from typing import Sequence
+
+from inferio.process_model import InferenceModel, ProcessIsolatedInferenceModel
+from inferio.types import PredictionInput
+
+
+class EchoModel(InferenceModel):
+    @classmethod
+    def name(cls) -> str:
+        return "echo"
+
+    def load(self) -> None:
+        pass
+
+    def predict(self, inputs: Sequence[PredictionInput]) -> Sequence[bytes]:
+        return [inp.file or b"" for inp in inputs]
+
+    def unload(self) -> None:
+        pass
+
+
+class EchoModelIsolated(ProcessIsolatedInferenceModel):
+    @classmethod
+    def concrete_class(cls):
+        return EchoModel
+
+
+def run(transport: str, batches, requests: int) -> float:
+    os.environ["INFERENCE_SHM_TRANSPORT"] = str(transport == "shm").lower()
+    os.environ["INFERENCE_SHM_THRESHOLD_KB"] = "0"
+    os.environ["INFERENCE_SHM_SLAB_MB"] = str(
+        max(64, 2 * sum(len(inp.file) for inp in batches[0]) // 1024 // 1024)
+    )
+    model = EchoModelIsolated()
+    model.load()
+    try:
+        # Warm up, and check that the payloads make the round trip intact
+        for batch in batches:
+            outputs = model.predict(batch)
+            assert list(outputs) == [inp.file for inp in batch], "Outputs differ"
+        start = time.perf_counter()
+        for i in range(requests):
+            model.predict(batches[i % len(batches)])
+        return time.perf_counter() - start
+    finally:
+        model.unload()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=50, help="Requests")
+    parser.add_argument("--batch", type=int, default=16, help="Inputs each")
+    parser.add_argument("--size-kb", type=int, default=2048, help="Per input")
+    args = parser.parse_args()
+
+    batches = [
+        [
+            PredictionInput(data=None, file=os.urandom(args.size_kb * 1024))
+            for _ in range(args.batch)
+        ]
+        for _ in range(2)
+    ]
+    # Both ways, for every input of every request
+    total_mb = 2 * args.requests * args.batch * args.size_kb / 1024
+    for transport in ["pipe", "shm"]:
+        elapsed = run(transport, batches, args.requests)
+        print(
+            f"{transport:>5}: {elapsed:.3f}s "
+            + f"({args.requests / elapsed:.1f} requests/s, "
+            + f"{total_mb / elapsed:.0f} MB/s)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,313 @@
+import logging
+import os
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, List, Optional, Sequence
+
+from inferio.process_model import ProcessIsolatedInferenceModel
+from inferio.types import PredictionInput
+
+logger = logging.getLogger(__name__)
+
+
+class DeadlineExceeded(Exception):
+    """The request's deadline passed before it could be run."""
+
+
+@dataclass
+class BatchRequest:
+    model: Any
+    inputs: Sequence[PredictionInput]
+    # time.monotonic() after which the request is dropped if not yet started
+    deadline: Optional[float]
+    # Run ahead of regular requests, without waiting for a batch to fill
+    no_wait: bool = False
+    enqueued: float = field(default_factory=time.monotonic)
+    # Resolves to the outputs for the request's inputs
+    future: Future = field(default_factory=Future)
+
+
+def predict_with_priority(
+    model: Any, inputs: Sequence[PredictionInput], no_wait: bool
+) -> Sequence[Any]:
+    """
+    Run the inputs through the model, passing on the no_wait priority
+    to process-isolated models, which otherwise hold requests briefly
+    to batch them with concurrent ones.
+    """
+    if no_wait and isinstance(model, ProcessIsolatedInferenceModel):
+        return model.predict(inputs, no_wait=True)
+    return model.predict(inputs)
+
+
+def histogram_bucket(size: int) -> str:
+    """Power of two bucket for a batch size, e.g. 5 -> "5-8"."""
+    if size <= 1:
+        return "1"
+    upper = 1 << (size - 1).bit_length()
+    lower = upper // 2 + 1
+    return f"{lower}-{upper}" if lower < upper else str(upper)
+
+
+class BatchScheduler:
+    """
+    Merges concurrent prediction requests for one model into larger batches.
+    Requests are queued, and a worker thread runs them through the model
+    in FIFO order, merging queued requests into batches of up to
+    `max_batch_size` inputs. The worker waits up to `max_delay_ms` after
+    the oldest queued request for more requests to arrive
+    (0 = only merge requests that queued up while the model was busy).
+    A request larger than `max_batch_size` is run on its own, unsplit.
+    Requests whose deadline passes before they are started are dropped.
+    no_wait requests skip ahead of regular ones, and never wait
+    for more requests to arrive.
+    Each request gets back exactly the outputs for its own inputs.
+    If a merged batch fails, its requests are retried one by one,
+    so only the requests that fail on their own get an error.
+    """
+
+    def __init__(self, name: str, max_batch_size: int, max_delay_ms: float):
+        self.name = name
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_delay = max(0.0, max_delay_ms / 1000)
+        self.queue: Deque[BatchRequest] = deque()
+        self.condition = threading.Condition()
+        self.queued_inputs = 0
+        # no_wait requests are always at the front of the queue
+        self.queued_no_wait = 0
+        self.batch_sizes: Counter[str] = Counter()
+        self.requests_per_batch: Counter[str] = Counter()
+        self.expired = 0
+        self.worker = threading.Thread(
+            target=self._run, name=f"batcher-{name}", daemon=True
+        )
+        self.worker.start()
+
+    def predict(
+        self,
+        model: Any,
+        inputs: Sequence[PredictionInput],
+        timeout: Optional[float] = None,
+        no_wait: bool = False,
+    ) -> List[Any]:
+        """
+        Queue the inputs for prediction with the given model,
+        and wait for their outputs.
+        Raises DeadlineExceeded if the request could not be started
+        within `timeout` seconds.
+        """
+        return self.submit(model, inputs, timeout, no_wait).result()
+
+    def submit(
+        self,
+        model: Any,
+        inputs: Sequence[PredictionInput],
+        timeout: Optional[float] = None,
+        no_wait: bool = False,
+    ) -> "Future[List[Any]]":
+        """
+        Queue the inputs for prediction with the given model, without
+        waiting. Returns a future for their outputs, which can be awaited
+        from async code with `asyncio.wrap_future`.
+        Cancelling the future before the request starts drops it.
+        """
+        request = BatchRequest(
+            model=model,
+            inputs=inputs,
+            deadline=(
+                time.monotonic() + timeout if timeout is not None else None
+            ),
+            no_wait=no_wait,
+        )
+        with self.condition:
+            if no_wait:
+                self.queue.insert(self.queued_no_wait, request)
+                self.queued_no_wait += 1
+            else:
+                self.queue.append(request)
+            self.queued_inputs += len(inputs)
+            self.condition.notify()
+        return request.future
+
+    def _pop(self) -> BatchRequest:
+        request = self.queue.popleft()
+        self.queued_inputs -= len(request.inputs)
+        if request.no_wait:
+            self.queued_no_wait -= 1
+        return request
+
+    def _next_batch(self) -> List[BatchRequest]:
+        with self.condition:
+            while not self.queue:
+                self.condition.wait()
+            # Wait for more requests until the batch is full
+            # or the oldest request has waited long enough
+            flush_at = self.queue[0].enqueued + self.max_delay
+            while (
+                self.queued_inputs < self.max_batch_size
+                and not self.queued_no_wait
+            ):
+                remaining = flush_at - time.monotonic()
+                if remaining <= 0:
+                    break
+                self.condition.wait(remaining)
+
+            batch: List[BatchRequest] = []
+            batch_inputs = 0
+            now = time.monotonic()
+            while self.queue:
+                request = self.queue[0]
+                if request.future.cancelled():
+                    self._pop()
+                    continue
+                if request.deadline is not None and now > request.deadline:
+                    self._pop()
+                    # The request may have been cancelled since the check
+                    # above, in which case there is nothing to report
+                    if request.future.set_running_or_notify_cancel():
+                        self.expired += 1
+                        request.future.set_exception(
+                            DeadlineExceeded(
+                                f"Request for {self.name} expired after "
+                                + f"{now - request.enqueued:.3f}s in the queue"
+                            )
+                        )
+                    continue
+                # Only merge requests for the same model instance,
+                # in case the model was reloaded in between
+                if batch and (
+                    request.model is not batch[0].model
+                    or batch_inputs + len(request.inputs) > self.max_batch_size
+                ):
+                    break
+                self._pop()
+                # From here on the request can no longer be cancelled
+                if request.future.set_running_or_notify_cancel():
+                    batch.append(request)
+                batch_inputs += len(request.inputs)
+            return batch
+
+    def _run(self):
+        while True:
+            # The worker must survive anything going wrong with one batch,
+            # or every request queued after it would wait forever
+            batch: List[BatchRequest] = []
+            try:
+                batch = self._next_batch()
+                if batch:
+                    self._run_batch(batch)
+            except Exception as e:
+                logger.error(
+                    f"{self.name}: error in batch worker: {e}", exc_info=True
+                )
+                for request in batch:
+                    if not request.future.done():
+                        request.future.set_exception(e)
+
+    def _run_batch(self, batch: List[BatchRequest]):
+        inputs = [inp for request in batch for inp in request.inputs]
+        self.batch_sizes[histogram_bucket(len(inputs))] += 1
+        self.requests_per_batch[histogram_bucket(len(batch))] += 1
+        if len(batch) > 1:
+            logger.debug(
+                f"{self.name}: merged {len(batch)} requests "
+                + f"into a batch of {len(inputs)}"
+            )
+        try:
+            outputs = self._predict(
+                batch[0].model,
+                inputs,
+                no_wait=any(request.no_wait for request in batch),
+            )
+        except Exception as e:
+            if len(batch) == 1:
+                batch[0].future.set_exception(e)
+                return
+            # One bad input should not fail the other requests
+            # merged into the batch, so retry each request on its own
+            logger.error(
+                f"{self.name}: batch of {len(batch)} requests failed: {e}. "
+                + "Retrying them individually.",
+                exc_info=True,
+            )
+            for request in batch:
+                try:
+                    request.future.set_result(
+                        self._predict(
+                            request.model, request.inputs, request.no_wait
+                        )
+                    )
+                except Exception as individual_e:
+                    request.future.set_exception(individual_e)
+            return
+        start = 0
+        for request in batch:
+            end = start + len(request.inputs)
+            request.future.set_result(outputs[start:end])
+            start = end
+
+    @staticmethod
+    def _predict(
+        model: Any, inputs: Sequence[PredictionInput], no_wait: bool
+    ) -> List[Any]:
+        outputs = list(predict_with_priority(model, inputs, no_wait=no_wait))
+        assert len(outputs) == len(
+            inputs
+        ), f"Model returned {len(outputs)} outputs for {len(inputs)} inputs"
+        return outputs
+
+    def stats(self) -> Dict[str, Any]:
+        with self.condition:
+            return {
+                "queued_requests": len(self.queue),
+                "queued_inputs": self.queued_inputs,
+                "expired_requests": self.expired,
+                "batch_sizes": dict(self.batch_sizes),
+                "requests_per_batch": dict(self.requests_per_batch),
+            }
+
+
+class BatchSchedulers:
+    """
+    One BatchScheduler per inference_id, created on first use.
+    Configured through the environment:
+    INFERENCE_BATCHING (default true), INFERENCE_MAX_BATCH_SIZE (default 64)
+    and INFERENCE_MAX_BATCH_DELAY_MS (default 0).
+    """
+
+    _lock = threading.Lock()
+    _schedulers: Dict[str, BatchScheduler] = {}
+
+    @classmethod
+    def enabled(cls) -> bool:
+        return os.getenv("INFERENCE_BATCHING", "true").lower() not in [
+            "false",
+            "0",
+        ]
+
+    @classmethod
+    def get(cls, inference_id: str) -> BatchScheduler:
+        with cls._lock:
+            if inference_id not in cls._schedulers:
+                cls._schedulers[inference_id] = BatchScheduler(
+                    inference_id,
+                    max_batch_size=int(
+                        os.getenv("INFERENCE_MAX_BATCH_SIZE", "64")
+                    ),
+                    max_delay_ms=float(
+                        os.getenv("INFERENCE_MAX_BATCH_DELAY_MS", "0")
+                    ),
+                )
+            return cls._schedulers[inference_id]
+
+    @classmethod
+    def stats(cls) -> Dict[str, Dict[str, Any]]:
+        with cls._lock:
+            schedulers = dict(cls._schedulers)
+        return {
+            inference_id: scheduler.stats()
+            for inference_id, scheduler in schedulers.items()
+        }
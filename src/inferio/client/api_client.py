@@ -1,17 +1,39 @@
 import json
 import logging
 from re import T
-from typing import Any, Dict, List, Sequence, Tuple, Union
+from typing import (
+    Any,
+    Dict,
+    Generator,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Union,
+)
 
 import requests as r
 from requests import Response
 from requests.adapters import HTTPAdapter
 from urllib3.util import Retry
 
+from inferio.frames import (
+    FRAMES_MEDIA_TYPE,
+    RECORD_ERROR,
+    RECORD_JSON,
+    decode_frames,
+    encode_frames,
+    iter_records,
+)
+
 logger = logging.getLogger(__name__)
 
 
 class InferenceAPIClient:
+    # Base URLs of servers known not to support framed predict requests
+    _no_frames_support: Set[str] = set()
+
     def __init__(self, base_url: str, retries: int = 3):
         self.base_url = base_url
         self.session = self._create_session(retries)
@@ -48,6 +70,7 @@ class InferenceAPIClient:
         lru_size: int,
         ttl_seconds: int,
         inputs: Sequence[Tuple[str | dict | None, str | bytes | None]],
+        no_wait: bool = False,
     ):
         url = f"{self.base_url}/predict/{inference_id}"
         params = {
@@ -55,11 +78,49 @@ class InferenceAPIClient:
             "lru_size": lru_size,
             "ttl_seconds": ttl_seconds,
         }
+        if no_wait:
+            params["no_wait"] = "true"
         json_data = {"inputs": [item[0] for item in inputs]}
-        data = {"data": json.dumps(json_data)}
-        files = process_input_files([item[1] for item in inputs])
+        # Binary outputs come back as frames from servers that support it
+        headers = {
+            "Accept": f"{FRAMES_MEDIA_TYPE}, multipart/mixed, "
+            + "application/octet-stream, application/json"
+        }
+
+        response: Optional[Response] = None
+        if self.base_url not in self._no_frames_support:
+            body = encode_frames(
+                [json.dumps(json_data).encode("utf-8")]
+                + [read_input_file(item[1]) for item in inputs]
+            )
+            response = self.session.post(
+                f"{url}/frames",
+                params=params,
+                data=body,
+                headers={**headers, "Content-Type": FRAMES_MEDIA_TYPE},
+            )
+            if response.status_code in (404, 405):
+                # Possibly an older server without the frames endpoint
+                response = None
+
+        if response is None:
+            data = {"data": json.dumps(json_data)}
+            files = process_input_files([item[1] for item in inputs])
+            response = self.session.post(
+                url, params=params, data=data, files=files, headers=headers
+            )
+            if (
+                response.status_code == 200
+                and self.base_url not in self._no_frames_support
+            ):
+                # Only a successful multipart request shows that the 404
+                # came from the missing endpoint, and not from the model
+                logger.info(
+                    f"{self.base_url} does not support framed predict "
+                    + "requests, falling back to multipart"
+                )
+                self._no_frames_support.add(self.base_url)
 
-        response = self.session.post(url, params=params, data=data, files=files)
         if response.status_code == 200:
             result = handle_predict_resp(response)
             return result
@@ -71,6 +132,55 @@ class InferenceAPIClient:
             response.raise_for_status()
             raise ValueError("Unexpected response")
 
+    def predict_stream(
+        self,
+        inference_id: str,
+        cache_key: str,
+        lru_size: int,
+        ttl_seconds: int,
+        inputs: Sequence[Tuple[str | dict | None, str | bytes | None]],
+        no_wait: bool = False,
+    ) -> Generator[Tuple[int, Any], None, None]:
+        """
+        Like `predict`, but yields (index, output) for each input
+        as soon as its output is ready, in the order they complete.
+        Raises RuntimeError if the prediction for an input fails.
+        """
+        url = f"{self.base_url}/predict/{inference_id}/stream"
+        params = {
+            "cache_key": cache_key,
+            "lru_size": lru_size,
+            "ttl_seconds": ttl_seconds,
+        }
+        if no_wait:
+            params["no_wait"] = "true"
+        json_data = {"inputs": [item[0] for item in inputs]}
+        data = {"data": json.dumps(json_data)}
+        files = process_input_files([item[1] for item in inputs])
+
+        with self.session.post(
+            url, params=params, data=data, files=files, stream=True
+        ) as response:
+            if response.status_code != 200:
+                logger.error(
+                    f"Prediction Fail (Status: {response.status_code})",
+                )
+                logger.debug(f"Response content: {response.content}")
+                response.raise_for_status()
+                raise ValueError("Unexpected response")
+            for index, kind, content in iter_records(
+                response.iter_content(chunk_size=None)
+            ):
+                if kind == RECORD_ERROR:
+                    raise RuntimeError(
+                        f"Prediction failed for input {index}: "
+                        + content.decode("utf-8")
+                    )
+                if kind == RECORD_JSON:
+                    yield index, json.loads(content)
+                else:
+                    yield index, content
+
     def load_model(
         self,
         inference_id: str,
@@ -124,6 +234,10 @@ def handle_predict_resp(
     try:
         content_type = response.headers.get("Content-Type", "")
 
+        # Check if the response is a frames buffer
+        if FRAMES_MEDIA_TYPE in content_type:
+            return decode_frames(response.content)  # type: ignore
+
         # Check if the response is JSON
         if "application/json" in content_type:
             return response.json()[
@@ -175,6 +289,14 @@ def parse_multipart_response(response: Response) -> List[bytes]:
     return files_list
 
 
+def read_input_file(file_item: str | bytes | None) -> bytes | None:
+    # Inputs can be given as the path to a file, or its contents
+    if isinstance(file_item, str):
+        with open(file_item, "rb") as f:
+            return f.read()
+    return file_item
+
+
 def process_input_files(files: List[str | bytes | None]):
     if not files:
         return None
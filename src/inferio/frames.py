@@ -0,0 +1,105 @@
+import json
+import struct
+from typing import (
+    Any,
+    Generator,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+# A compact binary alternative to multipart for predict requests and
+# responses: a list of length-prefixed frames in a single buffer.
+# Layout (little-endian): the magic bytes, the number of frames (uint32),
+# the length of each frame (int64, -1 for a missing frame),
+# then the contents of the frames back to back.
+FRAMES_MEDIA_TYPE = "application/x-inferio-frames"
+FRAMES_MAGIC = b"IFR1"
+_PREFIX = struct.Struct("<4sI")
+
+
+def encode_frames(frames: Sequence[Optional[bytes]]) -> bytes:
+    lengths = [len(frame) if frame is not None else -1 for frame in frames]
+    header = _PREFIX.pack(FRAMES_MAGIC, len(frames)) + struct.pack(
+        f"<{len(frames)}q", *lengths
+    )
+    return b"".join([header, *(frame for frame in frames if frame)])
+
+
+def decode_frames(buffer: bytes) -> List[Optional[bytes]]:
+    """
+    Split a buffer produced by `encode_frames` back into its frames.
+    Raises ValueError if the buffer is not a valid frames buffer.
+    """
+    if len(buffer) < _PREFIX.size:
+        raise ValueError("Truncated frames header")
+    magic, count = _PREFIX.unpack_from(buffer)
+    if magic != FRAMES_MAGIC:
+        raise ValueError(f"Invalid frames magic {magic!r}")
+    offset = _PREFIX.size + 8 * count
+    if len(buffer) < offset:
+        raise ValueError("Truncated frames header")
+    lengths = struct.unpack_from(f"<{count}q", buffer, _PREFIX.size)
+    view = memoryview(buffer)
+    frames: List[Optional[bytes]] = []
+    for length in lengths:
+        if length < 0:
+            frames.append(None)
+            continue
+        end = offset + length
+        if end > len(buffer):
+            raise ValueError("Truncated frame")
+        frames.append(bytes(view[offset:end]))
+        offset = end
+    if offset != len(buffer):
+        raise ValueError("Trailing data after the last frame")
+    return frames
+
+
+# Outputs streamed back one at a time, in the order they complete:
+# a sequence of records, each made of the index of the input it belongs
+# to (uint32), its kind (uint8), the length of its content (int64),
+# then the content: raw bytes, a JSON document, or an error message.
+STREAM_MEDIA_TYPE = "application/x-inferio-frame-stream"
+RECORD_BYTES = 0
+RECORD_JSON = 1
+RECORD_ERROR = 2
+_RECORD = struct.Struct("<IBq")
+
+
+def encode_record(index: int, output: Any) -> bytes:
+    if isinstance(output, bytes):
+        kind, content = RECORD_BYTES, output
+    else:
+        kind, content = RECORD_JSON, json.dumps(output).encode("utf-8")
+    return _RECORD.pack(index, kind, len(content)) + content
+
+
+def encode_error_record(index: int, message: str) -> bytes:
+    content = message.encode("utf-8")
+    return _RECORD.pack(index, RECORD_ERROR, len(content)) + content
+
+
+def iter_records(
+    chunks: Iterable[bytes],
+) -> Generator[Tuple[int, int, bytes], None, None]:
+    """
+    Parse a stream of records, as they arrive, from chunks of any size.
+    Yields (index, kind, content) for each record.
+    """
+    buffer = bytearray()
+    for chunk in chunks:
+        buffer += chunk
+        offset = 0
+        while len(buffer) - offset >= _RECORD.size:
+            index, kind, length = _RECORD.unpack_from(buffer, offset)
+            end = offset + _RECORD.size + length
+            if len(buffer) < end:
+                break
+            yield index, kind, bytes(buffer[offset + _RECORD.size : end])
+            offset = end
+        del buffer[:offset]
+    if buffer:
+        raise ValueError("Truncated record at the end of the stream")
@@ -137,14 +137,17 @@ class FasterWhisperModel(InferenceModel):
                 if len(segment_list) > 0
                 else None
             )
-            outputs.append(
-                {
-                    "transcription": merged_text,
-                    "confidence": average_confidence,
-                    "language": info.language,
-                    "language_confidence": info.language_probability,
-                }
-            )
+            output = {
+                "transcription": merged_text,
+                "confidence": average_confidence,
+                "language": info.language,
+                "language_confidence": info.language_probability,
+            }
+            if isinstance(config, dict) and "segment" in config:
+                # The input is a window of a longer track,
+                # tell the caller which part of it was transcribed
+                output["segment"] = config["segment"]
+            outputs.append(output)
         return outputs
 
 
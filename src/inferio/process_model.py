@@ -5,12 +5,23 @@ import queue
 import signal
 import sys
 import threading
+import time
 import uuid
 from abc import ABC, abstractmethod
 from dataclasses import asdict, dataclass
+from multiprocessing import shared_memory
 from multiprocessing.connection import Connection
-from typing import Any, Dict, List, Optional, Sequence, Type, Union
-
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Type, Union
+
+from inferio.shm_transport import (
+    PayloadLayout,
+    SharedMemoryAttachments,
+    SharedMemoryRing,
+    SharedMemorySettings,
+    payload_size,
+    read_payloads,
+    write_payloads,
+)
 from inferio.types import PredictionInput  # Ensure this is correctly imported
 
 # Configure logging
@@ -29,6 +40,11 @@ class PredictMessage:
     command: str = "predict"
     request_id: str = ""
     inputs: Sequence[dict] = ()  # Changed to dict for serialization
+    # Shared memory slab holding the input files, if any:
+    # {"name": slab name, "layout": PayloadLayout}
+    shm: Optional[Dict[str, Any]] = None
+    # Run as soon as possible, without waiting for other requests to batch with
+    no_wait: bool = False
 
 
 @dataclass
@@ -43,6 +59,8 @@ class ResponseMessage:
     outputs: Optional[Sequence[Any]] = None
     error: Optional[str] = None
     status: Optional[str] = None
+    # Outputs written to the request's shared memory slab
+    shm_layout: Optional[PayloadLayout] = None
 
 
 class InferenceModel(ABC):
@@ -82,6 +100,7 @@ class ProcessIsolatedInferenceModel(InferenceModel, ABC):
         self._process: Optional[multiprocessing.Process] = None
         self._parent_conn, self._child_conn = multiprocessing.Pipe()
         self._response_handlers: Dict[str, queue.Queue] = {}
+        self._shm_ring = SharedMemoryRing(SharedMemorySettings.from_env())
         self._listener_thread: threading.Thread = threading.Thread(
             target=self._listen_responses, daemon=True
         )
@@ -136,7 +155,16 @@ class ProcessIsolatedInferenceModel(InferenceModel, ABC):
         else:
             logger.debug(f"{self.name()} - Subprocess already running.")
 
-    def predict(self, inputs: Sequence[PredictionInput]) -> Sequence[Any]:
+    def predict(
+        self, inputs: Sequence[PredictionInput], no_wait: bool = False
+    ) -> Sequence[Any]:
+        """
+        Run the inputs through the model in the subprocess.
+        Requests are normally held for up to INFERENCE_ACCUMULATE_MS
+        in the subprocess, to be batched with concurrent requests.
+        Latency-sensitive requests (e.g. search queries) should set `no_wait`
+        to be run as soon as they arrive instead.
+        """
         if not self._process or not self._process.is_alive():
             logger.error(
                 f"{self.name()} - Subprocess is not running. Reloading."
@@ -144,13 +172,56 @@ class ProcessIsolatedInferenceModel(InferenceModel, ABC):
             self.load()
 
         request_id = str(uuid.uuid4())
-        predict_msg = PredictMessage(
-            request_id=request_id, inputs=[asdict(i) for i in inputs]
-        )
-        self._parent_conn.send(asdict(predict_msg))
-        logger.debug(
-            f"{self.name()} - Sent predict request with ID {request_id}"
+        predict_msg, slab = self._pack_inputs(request_id, inputs)
+        predict_msg.no_wait = no_wait
+        # Register the handler before sending, so that a fast response
+        # cannot arrive before anyone is waiting for it
+        self._response_handlers[request_id] = queue.Queue()
+        try:
+            self._parent_conn.send(asdict(predict_msg))
+            logger.debug(
+                f"{self.name()} - Sent predict request with ID {request_id}"
+            )
+            return self._get_predict_response(request_id, slab)
+        finally:
+            self._response_handlers.pop(request_id, None)
+            if slab is not None:
+                self._shm_ring.release(slab)
+
+    def _pack_inputs(
+        self, request_id: str, inputs: Sequence[PredictionInput]
+    ) -> Tuple[PredictMessage, Optional[shared_memory.SharedMemory]]:
+        """
+        Build the predict message for the inputs, moving their files
+        to a shared memory slab when they are large enough.
+        Returns the message and the leased slab, if any.
+        """
+        files = [i.file for i in inputs]
+        slab = self._shm_ring.lease(payload_size(files))
+        if slab is not None:
+            layout = write_payloads(slab, files)
+            if layout is not None:
+                return (
+                    PredictMessage(
+                        request_id=request_id,
+                        inputs=[{"data": i.data, "file": None} for i in inputs],
+                        shm={"name": slab.name, "layout": layout},
+                    ),
+                    slab,
+                )
+            self._shm_ring.release(slab)
+        return (
+            PredictMessage(
+                request_id=request_id, inputs=[asdict(i) for i in inputs]
+            ),
+            None,
         )
+
+    def _get_predict_response(
+        self,
+        request_id: str,
+        slab: Optional[shared_memory.SharedMemory],
+    ) -> List[Any]:
         try:
             response = self._get_response(request_id)
             if response.error:
@@ -166,7 +237,14 @@ class ProcessIsolatedInferenceModel(InferenceModel, ABC):
             logger.debug(
                 f"{self.name()} - Received prediction for request {request_id}"
             )
-            return response.outputs
+            outputs = list(response.outputs)
+            if response.shm_layout:
+                assert slab is not None, "Outputs in shared memory without a slab"
+                for index, payload in read_payloads(
+                    slab, response.shm_layout
+                ).items():
+                    outputs[index] = payload
+            return outputs
         except queue.Empty:
             logger.error(
                 f"{self.name()} - Timeout waiting for predict response for request ID {request_id}."
@@ -222,6 +300,7 @@ class ProcessIsolatedInferenceModel(InferenceModel, ABC):
                 self._process = None
         else:
             logger.debug(f"{self.name()} - Subprocess is not running.")
+        self._shm_ring.close()
 
     @classmethod
     def _model_process(cls, conn: Connection, kwargs: Dict[str, Any]) -> None:
@@ -244,24 +323,20 @@ class ProcessIsolatedInferenceModel(InferenceModel, ABC):
             conn.close()
             return
 
+        accumulate_window = (
+            float(os.getenv("INFERENCE_ACCUMULATE_MS", "2")) / 1000
+        )
+        shm = SharedMemoryAttachments()
+        running = True
         try:
-            while True:
-                # Batch retrieval of all available messages
-                messages = []
-                while conn.poll():
-                    try:
-                        message = conn.recv()
-                        messages.append(message)
-                    except EOFError:
-                        logger.error(
-                            f"{model_class.name()} - Subprocess pipe closed."
-                        )
-                        break
-
-                if not messages:
-                    # If no messages are available, wait briefly to avoid busy waiting
-                    threading.Event().wait(0.01)
-                    continue
+            while running:
+                try:
+                    messages = cls._receive_messages(conn, accumulate_window)
+                except EOFError:
+                    logger.error(
+                        f"{model_class.name()} - Subprocess pipe closed."
+                    )
+                    break
 
                 predict_messages: List[PredictMessage] = []
                 for message_dict in messages:
@@ -294,7 +369,7 @@ class ProcessIsolatedInferenceModel(InferenceModel, ABC):
                         # Before unloading, process any pending predict messages
                         if predict_messages:
                             cls._batch_predict(
-                                conn, model_instance, predict_messages
+                                conn, model_instance, predict_messages, shm
                             )
                             # Clear the predict messages list
                             predict_messages.clear()
@@ -310,6 +385,7 @@ class ProcessIsolatedInferenceModel(InferenceModel, ABC):
                             logger.debug(
                                 f"{model_class.name()} - Model unloaded in subprocess."
                             )
+                            running = False
                             break  # Exit the subprocess loop
                         except Exception as e:
                             response = ResponseMessage(
@@ -321,7 +397,9 @@ class ProcessIsolatedInferenceModel(InferenceModel, ABC):
                                 exc_info=True,
                             )
                 if predict_messages:
-                    cls._batch_predict(conn, model_instance, predict_messages)
+                    cls._batch_predict(
+                        conn, model_instance, predict_messages, shm
+                    )
 
         except Exception as e:
             error_response = ResponseMessage(error=str(e))
@@ -331,17 +409,91 @@ class ProcessIsolatedInferenceModel(InferenceModel, ABC):
                 exc_info=True,
             )
         finally:
+            shm.close()
             conn.close()
             logger.debug(f"{model_class.name()} - Subprocess terminating.")
 
+    @staticmethod
+    def _receive_messages(conn: Connection, window: float) -> List[dict]:
+        """
+        Block until a message arrives, then keep collecting the messages
+        that arrive within `window` seconds of it, so that concurrent
+        predict requests can be batched together.
+        Only regular predict requests wait for the window, anything else
+        (no_wait requests, load and unload commands) is handled as soon
+        as the messages already in the pipe have been read.
+        """
+        messages = [conn.recv()]
+        deadline = time.monotonic() + window
+        while True:
+            urgent = any(
+                m.get("command") != "predict" or m.get("no_wait")
+                for m in messages
+            )
+            timeout = 0.0 if urgent else max(0.0, deadline - time.monotonic())
+            if not conn.poll(timeout):
+                return messages
+            messages.append(conn.recv())
+
+    @staticmethod
+    def _read_inputs(
+        msg: PredictMessage, shm: SharedMemoryAttachments
+    ) -> List[PredictionInput]:
+        inputs = [PredictionInput(**pi) for pi in msg.inputs]
+        if msg.shm is not None:
+            files = read_payloads(shm.get(msg.shm["name"]), msg.shm["layout"])
+            for index, file in files.items():
+                inputs[index].file = file
+        return inputs
+
+    @staticmethod
+    def _send_outputs(
+        conn: Connection,
+        msg: PredictMessage,
+        outputs: Sequence[Any],
+        shm: SharedMemoryAttachments,
+    ):
+        """
+        Send the outputs for a request. If its inputs came through
+        shared memory, the outputs are written back to the same slab
+        (the inputs have already been read), unless they don't fit.
+        """
+        outputs = list(outputs)
+        layout = None
+        if msg.shm is not None:
+            layout = write_payloads(shm.get(msg.shm["name"]), outputs)
+            for index in layout or {}:
+                outputs[index] = None
+        response = ResponseMessage(
+            request_id=msg.request_id, outputs=outputs, shm_layout=layout
+        )
+        conn.send(asdict(response))
+
     @staticmethod
     def _batch_predict(
         conn: Connection,
         model_instance: InferenceModel,
         predict_msgs: List[PredictMessage],
+        shm: SharedMemoryAttachments,
     ):
         MAX_BATCH_SIZE: int = int(os.getenv("MAX_COMBINED_BATCH", 32))
 
+        msg_inputs: Dict[str, List[PredictionInput]] = {}
+        valid_msgs: List[PredictMessage] = []
+        for msg in predict_msgs:
+            try:
+                msg_inputs[msg.request_id] = (
+                    ProcessIsolatedInferenceModel._read_inputs(msg, shm)
+                )
+                valid_msgs.append(msg)
+            except Exception as e:
+                response = ResponseMessage(
+                    request_id=msg.request_id,
+                    error=f"Failed to read inputs: {e}",
+                )
+                conn.send(asdict(response))
+        predict_msgs = valid_msgs
+
         batches: List[List[PredictMessage]] = []
         current_batch: List[PredictMessage] = []
         current_batch_size: int = 0
@@ -372,9 +524,7 @@ class ProcessIsolatedInferenceModel(InferenceModel, ABC):
             combined_inputs = []
 
             for msg in batch:
-                combined_inputs.extend(
-                    [PredictionInput(**pi) for pi in msg.inputs]
-                )
+                combined_inputs.extend(msg_inputs[msg.request_id])
 
             if len(batch) > 1:
                 logger.debug(
@@ -389,10 +539,9 @@ class ProcessIsolatedInferenceModel(InferenceModel, ABC):
                 for msg in batch:
                     end = start + len(msg.inputs)
                     individual_outputs = outputs[start:end]
-                    response = ResponseMessage(
-                        request_id=msg.request_id, outputs=individual_outputs
+                    ProcessIsolatedInferenceModel._send_outputs(
+                        conn, msg, individual_outputs, shm
                     )
-                    conn.send(asdict(response))
                     logger.debug(
                         f"{model_instance.name()} - Batched prediction completed for request {msg.request_id}."
                     )
@@ -406,16 +555,12 @@ class ProcessIsolatedInferenceModel(InferenceModel, ABC):
                 for msg in batch:
                     request_id = msg.request_id
                     try:
-                        individual_inputs = [
-                            PredictionInput(**pi) for pi in msg.inputs
-                        ]
                         individual_outputs = model_instance.predict(
-                            individual_inputs
+                            msg_inputs[request_id]
                         )
-                        response = ResponseMessage(
-                            request_id=request_id, outputs=individual_outputs
+                        ProcessIsolatedInferenceModel._send_outputs(
+                            conn, msg, individual_outputs, shm
                         )
-                        conn.send(asdict(response))
                         logger.debug(
                             f"{model_instance.name()} - Individual prediction completed for request {request_id}."
                         )
@@ -466,8 +611,9 @@ class ProcessIsolatedInferenceModel(InferenceModel, ABC):
                 break
 
     def _get_response(self, request_id: str, timeout: Optional[float] = None) -> ResponseMessage:
-        response_queue: queue.Queue = queue.Queue()
-        self._response_handlers[request_id] = response_queue
+        response_queue: queue.Queue = self._response_handlers.setdefault(
+            request_id, queue.Queue()
+        )
         logger.debug(
             f"{self.name()} - Waiting for response for request ID {request_id}."
         )
@@ -1,12 +1,35 @@
+import asyncio
 import logging
 import os
-from typing import Any, Dict, List
-
-from fastapi import APIRouter, File, Form, HTTPException, Query, UploadFile
+from typing import Any, Dict, List, Optional
+
+from fastapi import (
+    APIRouter,
+    Body,
+    File,
+    Form,
+    Header,
+    HTTPException,
+    Query,
+    UploadFile,
+)
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from fastapi_utilities.repeat.repeat_every import repeat_every
 from pydantic import BaseModel
 from pydantic.dataclasses import dataclass
 
+from inferio.batching import (
+    BatchSchedulers,
+    DeadlineExceeded,
+    predict_with_priority,
+)
+from inferio.frames import (
+    FRAMES_MEDIA_TYPE,
+    STREAM_MEDIA_TYPE,
+    encode_error_record,
+    encode_record,
+)
 from inferio.impl.clap import ClapModel, ClapModelIsolated
 from inferio.impl.clip import CLIPIsolated, ClipModel
 from inferio.impl.clip_inf import InfinityCLIP
@@ -22,9 +45,11 @@ from inferio.impl.wd_tagger import WDTagger, WDTaggerIsolated
 from inferio.impl.whisper import FasterWhisperModel, FasterWhisperModelIsolated
 from inferio.manager import InferenceModel, ModelManager
 from inferio.registry import ModelRegistry
+from inferio.types import PredictionInput
 from inferio.utils import (
     add_cudnn_to_path,
     encode_output_response,
+    parse_frames_request,
     parse_input_request,
 )
 
@@ -80,18 +105,34 @@ Binary files are mapped to the structured input by their filename which must be
 The exact format depends on the specific model being used.
 The output can be either a JSON object containing an array under the key "outputs", a multipart/mixed response for binary data,
 or a single application/octet-stream for a single binary output.
+Clients that send `application/x-inferio-frames` in their Accept header get binary outputs in that format instead,
+see `POST /predict/{group}/{inference_id}/frames`.
 
 Binary outputs are usually embeddings, which are provided in the npy format and can be loaded with numpy.load.
 
 See `inferio.client` for an example of how to use this endpoint, which is non-trivial due to the multipart form data input and output.
 """,
 )
-def predict(
+async def predict(
     group: str,
     inference_id: str,
     cache_key: str = Query(...),
     lru_size: int = Query(...),
     ttl_seconds: int = Query(...),
+    timeout_ms: Optional[int] = Query(
+        None,
+        description="""
+Maximum time in milliseconds the request may wait in the model's batching queue before it starts.
+If it cannot start in time, it fails with a 503 status code instead of running late.
+""",
+    ),
+    no_wait: bool = Query(
+        False,
+        description="""
+Run the request as soon as possible, ahead of queued requests, without waiting for other requests to batch it with.
+Meant for latency-sensitive requests, such as embedding a search query.
+""",
+    ),
     data: str = Form(
         ...,
         description="""
@@ -133,33 +174,229 @@ Each file must have a filename that is an integer starting from 0, representing
 Files may be optional depending on the model, some do not operate on binary data. 
 """,
     ),  # The binary files
+    accept: Optional[str] = Header(None),
 ):
-    inputs = parse_input_request(data, files)
+    inputs = await parse_input_request(data, files)
     logger.debug(
         f"Processing {len(inputs)} ({len(files)} files) inputs for model {group}/{inference_id}"
     )
+    outputs = await run_prediction(
+        group,
+        inference_id,
+        cache_key,
+        lru_size,
+        ttl_seconds,
+        timeout_ms,
+        no_wait,
+        inputs,
+    )
+    return encode_output_response(outputs, accept)
 
+
+@router.post(
+    "/predict/{group}/{inference_id}/frames",
+    summary="Run batch inference on a model, with a compact binary encoding",
+    description=f"""
+Same as `POST /predict/{{group}}/{{inference_id}}`, but the request body is a single
+`{FRAMES_MEDIA_TYPE}` buffer instead of multipart form data,
+which avoids the overhead of multipart encoding and parsing for large batches.
+
+The buffer is a list of length-prefixed frames (see `inferio.frames`):
+the first frame is the JSON data (the same object as in the `data` field of the multipart endpoint),
+followed by exactly one frame per input with that input's file, or a missing frame (length -1) for inputs without one.
+
+If the Accept header includes `{FRAMES_MEDIA_TYPE}` and all outputs are binary,
+the response is a frames buffer with one frame per output. Otherwise, the response is the same as for the multipart endpoint.
+""",
+)
+async def predict_frames(
+    group: str,
+    inference_id: str,
+    cache_key: str = Query(...),
+    lru_size: int = Query(...),
+    ttl_seconds: int = Query(...),
+    timeout_ms: Optional[int] = Query(None),
+    no_wait: bool = Query(False),
+    body: bytes = Body(..., media_type=FRAMES_MEDIA_TYPE),
+    accept: Optional[str] = Header(None),
+):
+    inputs = parse_frames_request(body)
+    logger.debug(
+        f"Processing {len(inputs)} framed inputs for model {group}/{inference_id}"
+    )
+    outputs = await run_prediction(
+        group,
+        inference_id,
+        cache_key,
+        lru_size,
+        ttl_seconds,
+        timeout_ms,
+        no_wait,
+        inputs,
+    )
+    return encode_output_response(outputs, accept)
+
+
+@router.post(
+    "/predict/{group}/{inference_id}/stream",
+    summary="Run batch inference on a model, streaming back each output as soon as it is ready",
+    description=f"""
+Same as `POST /predict/{{group}}/{{inference_id}}`, but outputs are streamed back one at a time,
+in the order they complete, instead of all at once at the end of the batch.
+
+Each input is queued for the model on its own, and merged back into batches with the other inputs
+and with concurrent requests, so a large request does not hold up smaller ones queued after it
+any longer than its current batch does.
+Without batching (`INFERENCE_BATCHING=false`), all outputs are sent together when the batch completes.
+Only the outputs are streamed: the request body, including every uploaded file,
+is received in full before any input is queued.
+
+The response is a `{STREAM_MEDIA_TYPE}` stream of records (see `inferio.frames`),
+each one holding the index of the input it belongs to, and either the output (binary or JSON),
+or an error message if the prediction for that input failed.
+""",
+)
+async def predict_stream(
+    group: str,
+    inference_id: str,
+    cache_key: str = Query(...),
+    lru_size: int = Query(...),
+    ttl_seconds: int = Query(...),
+    timeout_ms: Optional[int] = Query(None),
+    no_wait: bool = Query(False),
+    data: str = Form(...),
+    files: List[UploadFile] = File([]),
+):
+    inputs = await parse_input_request(data, files)
+    logger.debug(
+        f"Streaming {len(inputs)} ({len(files)} files) inputs for model {group}/{inference_id}"
+    )
+    model_name = f"{group}/{inference_id}"
+    # Load the model with cache key, LRU size, and long TTL to avoid unloading during prediction
+    model: InferenceModel = await run_in_threadpool(
+        ModelManager().load_model, model_name, cache_key, lru_size, -1
+    )
+    timeout = timeout_ms / 1000 if timeout_ms is not None else None
+
+    async def predict_one(index: int, input: PredictionInput):
+        try:
+            outputs = await asyncio.wrap_future(
+                BatchSchedulers.get(model_name).submit(
+                    model, [input], timeout=timeout, no_wait=no_wait
+                )
+            )
+            return [(index, outputs[0], None)]
+        except Exception as e:
+            return [(index, None, e)]
+
+    async def predict_all():
+        try:
+            outputs = await run_in_threadpool(
+                predict_with_priority, model, inputs, no_wait
+            )
+            return [(index, output, None) for index, output in enumerate(outputs)]
+        except Exception as e:
+            return [(index, None, e) for index in range(len(inputs))]
+
+    async def stream_records():
+        tasks: List[asyncio.Future] = []
+        try:
+            if BatchSchedulers.enabled():
+                tasks = [
+                    asyncio.ensure_future(predict_one(index, input))
+                    for index, input in enumerate(inputs)
+                ]
+            else:
+                tasks = [asyncio.ensure_future(predict_all())]
+            for next_done in asyncio.as_completed(tasks):
+                for index, output, error in await next_done:
+                    if error is None:
+                        yield encode_record(index, output)
+                    elif isinstance(error, DeadlineExceeded):
+                        yield encode_error_record(index, str(error))
+                    else:
+                        logger.error(
+                            f"Prediction failed for model {inference_id}: {error}"
+                        )
+                        yield encode_error_record(index, "Prediction failed")
+        finally:
+            # Inputs still queued when the client goes away are dropped
+            for task in tasks:
+                task.cancel()
+            # Update the model's TTL after the prediction is made.
+            # Run in the threadpool so it does not block the event loop,
+            # but not awaited, as this may run while the response is cancelled
+            asyncio.get_running_loop().run_in_executor(
+                None,
+                ModelManager().load_model,
+                model_name,
+                cache_key,
+                lru_size,
+                ttl_seconds,
+            )
+
+    return StreamingResponse(stream_records(), media_type=STREAM_MEDIA_TYPE)
+
+
+async def run_prediction(
+    group: str,
+    inference_id: str,
+    cache_key: str,
+    lru_size: int,
+    ttl_seconds: int,
+    timeout_ms: Optional[int],
+    no_wait: bool,
+    inputs: List[PredictionInput],
+) -> List[bytes | dict | list | str]:
+    """
+    Run the inputs through the model. With batching enabled, the request
+    is handed to the model's batch scheduler and awaited, so that waiting
+    for the model does not tie up a threadpool worker.
+    """
+    model_name = f"{group}/{inference_id}"
     # Load the model with cache key, LRU size, and long TTL to avoid unloading during prediction
-    model: InferenceModel = ModelManager().load_model(
-        f"{group}/{inference_id}", cache_key, lru_size, -1
+    model: InferenceModel = await run_in_threadpool(
+        ModelManager().load_model, model_name, cache_key, lru_size, -1
     )
 
     try:
         # Perform prediction
-        outputs: List[bytes | dict | list | str] = list(model.predict(inputs))
+        outputs: List[bytes | dict | list | str]
+        if BatchSchedulers.enabled():
+            # Merged with concurrent requests for the same model
+            outputs = await asyncio.wrap_future(
+                BatchSchedulers.get(model_name).submit(
+                    model,
+                    inputs,
+                    timeout=(
+                        timeout_ms / 1000 if timeout_ms is not None else None
+                    ),
+                    no_wait=no_wait,
+                )
+            )
+        else:
+            outputs = list(
+                await run_in_threadpool(
+                    predict_with_priority, model, inputs, no_wait
+                )
+            )
+    except DeadlineExceeded as e:
+        logger.warning(str(e))
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logger.error(f"Prediction failed for model {inference_id}: {e}")
         raise HTTPException(status_code=500, detail="Prediction failed")
     finally:
         # Update the model's TTL after the prediction is made
-        ModelManager().load_model(
-            f"{group}/{inference_id}",
+        await run_in_threadpool(
+            ModelManager().load_model,
+            model_name,
             cache_key,
             lru_size,
             ttl_seconds,
         )
 
-    return encode_output_response(outputs)
+    return outputs
 
 
 @dataclass
@@ -285,6 +522,20 @@ def get_metadata() -> Dict[str, Dict[str, Any]]:
     return ModelRegistry().list_inference_ids()
 
 
+@router.get(
+    "/batching",
+    summary="Get batching statistics for each model",
+    description="""
+Returns, for each model that has received prediction requests, the number of requests and inputs currently waiting in its batching queue,
+the number of requests dropped because their deadline passed,
+and histograms (in power of two buckets) of the number of inputs per batch and of the number of requests merged into each batch.
+""",
+    response_model=Dict[str, Dict[str, Any]],
+)
+def get_batching_stats() -> Dict[str, Dict[str, Any]]:
+    return BatchSchedulers.stats()
+
+
 @repeat_every(seconds=10, logger=logger)
 async def check_ttl():
     """Check the TTL of all loaded models and unload expired ones.
@@ -0,0 +1,170 @@
+import logging
+import os
+import threading
+from dataclasses import dataclass
+from multiprocessing import resource_tracker, shared_memory
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Index of a payload in its message -> (offset, size) in the slab
+PayloadLayout = Dict[int, Tuple[int, int]]
+
+
+@dataclass
+class SharedMemorySettings:
+    """
+    When and how to move large payloads between inferio and
+    model subprocesses through shared memory instead of the pipe.
+    """
+
+    enabled: bool = True
+    # Only use shared memory for messages carrying at least this many bytes
+    threshold: int = 512 * 1024
+    # Size of each slab, messages that don't fit go through the pipe
+    slab_size: int = 64 * 1024 * 1024
+    # Maximum number of slabs per model, i.e. concurrent transfers
+    slabs: int = 4
+
+    @classmethod
+    def from_env(cls) -> "SharedMemorySettings":
+        return cls(
+            enabled=os.getenv("INFERENCE_SHM_TRANSPORT", "true").lower()
+            not in ["false", "0"],
+            threshold=int(os.getenv("INFERENCE_SHM_THRESHOLD_KB", "512"))
+            * 1024,
+            slab_size=int(os.getenv("INFERENCE_SHM_SLAB_MB", "64"))
+            * 1024
+            * 1024,
+            slabs=int(os.getenv("INFERENCE_SHM_SLABS", "4")),
+        )
+
+
+class SharedMemoryRing:
+    """
+    Parent side of the transport: a bounded ring of shared memory slabs,
+    created on first use and leased to one request at a time.
+    The request writes its inputs to the slab, the subprocess reads them
+    and writes the outputs back to the same slab, so only small
+    descriptors go through the pipe.
+    Leasing never blocks: when every slab is busy, or the payload
+    does not fit, the caller falls back to the pipe.
+    """
+
+    def __init__(self, settings: SharedMemorySettings):
+        self.settings = settings
+        self.lock = threading.Lock()
+        self.free: List[shared_memory.SharedMemory] = []
+        self.all: List[shared_memory.SharedMemory] = []
+        if settings.enabled and os.name == "posix":
+            # Subprocesses must share our resource tracker, otherwise
+            # the one they start when attaching to a slab will unlink it
+            # when they exit. Only subprocesses started after this
+            # inherit it, so it must run before the model is loaded.
+            resource_tracker.ensure_running()
+
+    def lease(self, size: int) -> Optional[shared_memory.SharedMemory]:
+        if (
+            not self.settings.enabled
+            or size < self.settings.threshold
+            or size > self.settings.slab_size
+        ):
+            return None
+        with self.lock:
+            if self.free:
+                return self.free.pop()
+            if len(self.all) >= self.settings.slabs:
+                return None
+            try:
+                slab = shared_memory.SharedMemory(
+                    create=True, size=self.settings.slab_size
+                )
+            except Exception as e:
+                logger.warning(f"Failed to create shared memory slab: {e}")
+                return None
+            self.all.append(slab)
+            return slab
+
+    def release(self, slab: shared_memory.SharedMemory):
+        with self.lock:
+            if slab in self.all:
+                self.free.append(slab)
+
+    def close(self):
+        with self.lock:
+            for slab in self.all:
+                try:
+                    slab.close()
+                    slab.unlink()
+                except Exception as e:
+                    logger.debug(f"Failed to release slab {slab.name}: {e}")
+            self.all.clear()
+            self.free.clear()
+
+
+class SharedMemoryAttachments:
+    """
+    Subprocess side of the transport: the parent's slabs,
+    attached by name on first use and kept open until closed.
+    The parent owns the slabs and is responsible for unlinking them.
+    """
+
+    def __init__(self):
+        self.slabs: Dict[str, shared_memory.SharedMemory] = {}
+
+    def get(self, name: str) -> shared_memory.SharedMemory:
+        if name not in self.slabs:
+            try:
+                # Keep the resource tracker from unlinking
+                # the parent's slab when this process exits
+                self.slabs[name] = shared_memory.SharedMemory(
+                    name=name, track=False  # type: ignore[call-arg]
+                )
+            except TypeError:
+                # Python < 3.13
+                self.slabs[name] = shared_memory.SharedMemory(name=name)
+        return self.slabs[name]
+
+    def close(self):
+        for slab in self.slabs.values():
+            try:
+                slab.close()
+            except Exception:
+                pass
+        self.slabs.clear()
+
+
+def payload_size(payloads: Sequence[Any]) -> int:
+    return sum(
+        len(p) for p in payloads if isinstance(p, (bytes, bytearray))
+    )
+
+
+def write_payloads(
+    slab: shared_memory.SharedMemory, payloads: Sequence[Any]
+) -> Optional[PayloadLayout]:
+    """
+    Copy every bytes payload into the slab, back to back.
+    Returns their layout, or None if they don't fit.
+    """
+    if payload_size(payloads) > slab.size:
+        return None
+    layout: PayloadLayout = {}
+    offset = 0
+    for index, payload in enumerate(payloads):
+        if not isinstance(payload, (bytes, bytearray)):
+            continue
+        end = offset + len(payload)
+        slab.buf[offset:end] = payload
+        layout[index] = (offset, len(payload))
+        offset = end
+    return layout
+
+
+def read_payloads(
+    slab: shared_memory.SharedMemory, layout: Mapping[int, Tuple[int, int]]
+) -> Dict[int, bytes]:
+    return {
+        int(index): bytes(slab.buf[offset : offset + size])
+        for index, (offset, size) in layout.items()
+    }
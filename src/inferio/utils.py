@@ -7,6 +7,7 @@ from typing import List, Optional, Union
 from fastapi import HTTPException, Response, UploadFile
 from fastapi.responses import JSONResponse, StreamingResponse
 
+from inferio.frames import FRAMES_MEDIA_TYPE, decode_frames, encode_frames
 from inferio.types import PredictionInput
 
 
@@ -25,7 +26,20 @@ def extract_index_from_content_disposition(header: str) -> Optional[int]:
     return None
 
 
-def encode_output_response(outputs: List[bytes | dict | list | str]):
+def encode_output_response(
+    outputs: List[bytes | dict | list | str], accept: Optional[str] = None
+):
+    # Binary outputs are sent as frames to clients that accept them
+    if (
+        accept
+        and FRAMES_MEDIA_TYPE in accept
+        and all(isinstance(output, bytes) for output in outputs)
+    ):
+        return Response(
+            content=encode_frames(outputs),  # type: ignore
+            media_type=FRAMES_MEDIA_TYPE,
+        )
+
     # Handle the outputs by returning a streaming response if there is only one binary output
     if len(outputs) == 1 and isinstance(outputs[0], bytes):
         return StreamingResponse(
@@ -73,7 +87,17 @@ def encode_output_response(outputs: List[bytes | dict | list | str]):
     return JSONResponse(content={"outputs": encoded_outputs})
 
 
-def parse_input_request(data: str, files: List[UploadFile]):
+async def parse_input_request(data: str, files: List[UploadFile]):
+    # By now, the whole multipart body has been received and the files
+    # spooled by Starlette, they are read back without blocking the event loop
+    prediction_inputs = parse_input_data(data)
+    for file in files:
+        index = get_file_index(file, len(prediction_inputs))
+        prediction_inputs[index].file = await file.read()
+    return prediction_inputs
+
+
+def parse_input_data(data: str) -> List[PredictionInput]:
     parsed_json = json.loads(data)
     inputs: List[Union[dict, str, None]] = parsed_json.get("inputs", [])
     prediction_inputs = [
@@ -81,26 +105,52 @@ def parse_input_request(data: str, files: List[UploadFile]):
     ]
     if not prediction_inputs:
         raise HTTPException(status_code=400, detail="No inputs provided")
+    return prediction_inputs
 
-    # Populate PredictionInput objects
-    for file in files:
-        # Extract the index from the Content-Disposition header
-        content_disposition = file.headers.get("content-disposition")
-        if not content_disposition:
-            raise HTTPException(
-                status_code=400,
-                detail="Missing Content-Disposition header",
-            )
-        index = extract_index_from_content_disposition(content_disposition)
 
-        if index is not None and 0 <= index < len(prediction_inputs):
-            prediction_inputs[index].file = file.file.read()
-        else:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Invalid index {index} in Content-Disposition header",
-            )
-    return prediction_inputs
+def get_file_index(file: UploadFile, input_count: int) -> int:
+    # Extract the index from the Content-Disposition header
+    content_disposition = file.headers.get("content-disposition")
+    if not content_disposition:
+        raise HTTPException(
+            status_code=400,
+            detail="Missing Content-Disposition header",
+        )
+    index = extract_index_from_content_disposition(content_disposition)
+
+    if index is not None and 0 <= index < input_count:
+        return index
+    raise HTTPException(
+        status_code=400,
+        detail=f"Invalid index {index} in Content-Disposition header",
+    )
+
+
+def parse_frames_request(body: bytes) -> List[PredictionInput]:
+    """
+    Parse a predict request in the frames format: the first frame is
+    the JSON data (as in the `data` form field of a multipart request),
+    followed by one frame per input holding its file, if any.
+    """
+    try:
+        frames = decode_frames(body)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not frames or frames[0] is None:
+        raise HTTPException(status_code=400, detail="Missing data frame")
+    data, files = frames[0], frames[1:]
+    inputs: List[Union[dict, str, None]] = json.loads(data).get("inputs", [])
+    if not inputs:
+        raise HTTPException(status_code=400, detail="No inputs provided")
+    if len(files) != len(inputs):
+        raise HTTPException(
+            status_code=400,
+            detail=f"Got {len(files)} file frames for {len(inputs)} inputs",
+        )
+    return [
+        PredictionInput(data=item, file=file)
+        for item, file in zip(inputs, files)
+    ]
 
 
 def add_cudnn_to_path():
@@ -31,6 +31,7 @@ from panoptikon.db.files import (
     get_item_metadata_by_sha256,
 )
 from panoptikon.utils import open_file, show_in_fm
+from panoptikon.watcher import sync_folder_watcher
 from searchui.router import get_routers
 
 logger = logging.getLogger(__name__)
@@ -49,6 +50,7 @@ def cronjob():
     for index_db in get_db_lists()[0]:
         try_cronjob(index_db=index_db)
         preload_embedding_models(index_db=index_db)
+        sync_folder_watcher(index_db=index_db)
 
 
 app = FastAPI(
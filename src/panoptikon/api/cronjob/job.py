@@ -1,10 +1,11 @@
 import logging
-from typing import List
+from collections import defaultdict
+from typing import Any, DefaultDict, Dict, List
 
 from panoptikon.api.routers.jobs.manager import Job
 from panoptikon.api.routers.jobs.router import job_manager
 from panoptikon.api.routers.utils import get_db_system_wl
-from panoptikon.data_extractors.models import ModelOptsFactory
+from panoptikon.data_extractors.models import ModelGroup, ModelOptsFactory
 from panoptikon.types import CronJob
 
 logger = logging.getLogger(__name__)
@@ -45,6 +46,11 @@ def run_cronjob(index_db: str):
                 )
                 derived_data_jobs.append(scheduled_job)
 
+        if system_config.cron_composite_jobs:
+            src_jobs = enqueue_composite_jobs(
+                conn_args, src_jobs, job_tag, index_db
+            )
+
         ordered_jobs = src_jobs + derived_data_jobs
 
         for scheduled_job in ordered_jobs:
@@ -64,3 +70,48 @@ def run_cronjob(index_db: str):
             )
     except Exception as e:
         logger.error(f"Error running cronjob: {e}", exc_info=True)
+
+
+def enqueue_composite_jobs(
+    conn_args: Dict[str, Any],
+    scheduled_jobs: List[CronJob],
+    job_tag: str,
+    index_db: str,
+) -> List[CronJob]:
+    """
+    Enqueue one composite job for each group of scheduled jobs
+    whose models take the same kind of input.
+    Returns the jobs that were not part of any group.
+    """
+    groups: DefaultDict[str, List[CronJob]] = defaultdict(list)
+    for scheduled_job in scheduled_jobs:
+        model = ModelOptsFactory.get_model(scheduled_job.inference_id)
+        if not isinstance(model, ModelGroup):
+            groups[scheduled_job.inference_id].append(scheduled_job)
+            continue
+        handler_name, _ = model.input_spec()
+        groups[handler_name].append(scheduled_job)
+
+    remaining_jobs: List[CronJob] = []
+    for group in groups.values():
+        if len(group) < 2:
+            remaining_jobs.extend(group)
+            continue
+        inference_ids = [scheduled_job.inference_id for scheduled_job in group]
+        logger.info(
+            f"Scheduling a composite job for {', '.join(inference_ids)} "
+            + f"(DB: {index_db})"
+        )
+        job_manager.enqueue_job(
+            Job(
+                queue_id=job_manager.get_next_job_id(),
+                job_type="composite_extraction",
+                conn_args=conn_args,
+                metadata=",".join(inference_ids),
+                inference_ids=inference_ids,
+                batch_sizes=[scheduled_job.batch_size for scheduled_job in group],
+                thresholds=[scheduled_job.threshold for scheduled_job in group],
+                tag=job_tag,
+            )
+        )
+    return remaining_jobs
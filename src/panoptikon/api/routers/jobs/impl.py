@@ -1,8 +1,10 @@
 import datetime
 import logging
-from typing import Any, Dict
+import sqlite3
+from typing import Any, Dict, List
 
-from panoptikon.data_extractors.models import ModelOptsFactory
+from panoptikon.config_type import SystemConfig
+from panoptikon.data_extractors.models import ModelGroup, ModelOptsFactory
 from panoptikon.data_extractors.types import (
     ExtractionJobProgress,
     ExtractionJobReport,
@@ -18,6 +20,7 @@ from panoptikon.folders import (
     rescan_all_folders,
     update_folder_lists,
 )
+from panoptikon.previews import generate_missing_previews
 
 logger = logging.getLogger(__name__)
 
@@ -32,6 +35,7 @@ def run_folder_update(conn_args: Dict[str, Any]):
             persist_system_config(conn_args["index_db"], system_config)
             with atomic_transaction(conn, logger):
                 update_result = update_folder_lists(conn, system_config)
+            run_preview_generation(conn, system_config)
 
             logger.info(
                 f"""
@@ -100,6 +104,7 @@ def rescan_folders(conn_args: Dict[str, Any]):
             ids, files_deleted, items_deleted, rule_files_deleted = (
                 rescan_all_folders(conn, system_config=system_config)
             )
+        run_preview_generation(conn, system_config)
         if files_deleted or items_deleted or rule_files_deleted:
             vacuum_database(conn)
         analyze_database(conn)
@@ -108,6 +113,27 @@ def rescan_folders(conn_args: Dict[str, Any]):
             + f"Files deleted due to rules: {rule_files_deleted}"
         )
 
+
+def run_preview_generation(
+    conn: sqlite3.Connection, system_config: SystemConfig
+):
+    """
+    Generate the thumbnails and blurhashes missing after a folder scan.
+    Runs after the scan has been committed, writing in small batches,
+    so new files are searchable right away and previews arrive as they are ready.
+    """
+    try:
+        generate_missing_previews(
+            conn,
+            workers=system_config.thumbnail_workers,
+            write_batch_size=system_config.thumbnail_write_batch_size,
+        )
+    except Exception as e:
+        logger.error(
+            f"Preview generation failed with error: {e}", exc_info=True
+        )
+
+
 def delete_model_data(
     inference_id: str,
     conn_args: Dict[str, Any],
@@ -194,4 +220,76 @@ def run_data_extraction_job(
             )
             with atomic_transaction(conn, logger):
                 remove_incomplete_jobs(conn)
-                logger.info("Removed incomplete jobs from the database")
\ No newline at end of file
+                logger.info("Removed incomplete jobs from the database")
+
+def run_composite_extraction_job(
+    inference_ids: List[str],
+    batch_sizes: List[int | None],
+    thresholds: List[float | None],
+    conn_args: Dict[str, Any],
+):
+    from panoptikon.config import retrieve_system_config
+    from panoptikon.data_extractors.composite_job import (
+        run_composite_extraction_job as run_composite_job,
+    )
+
+    with ensure_close(get_database_connection(**conn_args)) as conn:
+        system_config = retrieve_system_config(conn_args["index_db"])
+        resync_needed = is_resync_needed(conn, system_config)
+
+    if resync_needed:
+        logger.info(
+            "Folders in config changed. Resync needed, running folder update"
+        )
+        run_folder_update(conn_args)
+
+    models = []
+    for inference_id, batch_size, model_threshold in zip(
+        inference_ids, batch_sizes, thresholds
+    ):
+        model = ModelOptsFactory.get_model(inference_id)
+        assert isinstance(
+            model, ModelGroup
+        ), f"{inference_id} cannot be part of a composite job"
+        models.append((model, batch_size, model_threshold))
+
+    job_name = ", ".join(inference_ids)
+    with ensure_close(get_database_connection(**conn_args)) as conn:
+        try:
+            with atomic_transaction(conn, logger):
+                start_time = datetime.datetime.now()
+                reports: Dict[str, ExtractionJobReport] = {}
+                for setter_name, progress in run_composite_job(
+                    conn, system_config, models
+                ):
+                    if type(progress) == ExtractionJobReport:
+                        # Job is complete for this model
+                        reports[setter_name] = progress
+
+            total_time = datetime.datetime.now() - start_time
+            total_time_pretty = str(total_time).split(".")[0]
+            logger.info(
+                f"Composite extraction completed for models {job_name} "
+                + f"in {total_time_pretty}."
+            )
+            for setter_name, report in reports.items():
+                logger.info(
+                    f"{setter_name}: processed {report.images} images, "
+                    + f"{report.videos} videos and {report.other} other files "
+                    + f"({report.units} individual pieces of data). "
+                    + f"{len(report.failed_paths)} files failed to process."
+                )
+                if len(report.failed_paths) > 0:
+                    logger.info(
+                        f"Failed files: {', '.join(report.failed_paths)}"
+                    )
+            analyze_database(conn)
+        except Exception as e:
+            logger.error(
+                f"Composite extraction job for models {job_name} "
+                + f"failed with error: {e}",
+                exc_info=True,
+            )
+            with atomic_transaction(conn, logger):
+                remove_incomplete_jobs(conn)
+                logger.info("Removed incomplete jobs from the database")
@@ -14,6 +14,7 @@ from panoptikon.api.routers.jobs.impl import (
     delete_job_data,
     delete_model_data,
     rescan_folders,
+    run_composite_extraction_job,
     run_data_extraction_job,
     run_folder_update,
 )
@@ -24,6 +25,7 @@ logger = logging.getLogger(__name__)
 # Define Job Types
 JobType = Literal[
     "data_extraction",
+    "composite_extraction",
     "data_deletion",
     "folder_rescan",
     "folder_update",
@@ -40,6 +42,11 @@ class Job(BaseModel):
     batch_size: Optional[int] = None
     threshold: Optional[float] = None
     tag: Optional[str] = None
+    # Composite extraction jobs run several models,
+    # with one batch size and threshold per model
+    inference_ids: Optional[List[str]] = None
+    batch_sizes: Optional[List[Optional[int]]] = None
+    thresholds: Optional[List[Optional[float]]] = None
 
 
 @dataclass
@@ -76,6 +83,15 @@ def execute_job(job: Job):
                 threshold=job.threshold,
                 conn_args=job.conn_args,
             )
+        elif job.job_type == "composite_extraction":
+            assert job.inference_ids, "Inference IDs are required."
+            run_composite_extraction_job(
+                inference_ids=job.inference_ids,
+                batch_sizes=job.batch_sizes
+                or [None] * len(job.inference_ids),
+                thresholds=job.thresholds or [None] * len(job.inference_ids),
+                conn_args=job.conn_args,
+            )
         elif job.job_type == "data_deletion":
             assert job.metadata is not None, "Inference ID is required."
             delete_model_data(
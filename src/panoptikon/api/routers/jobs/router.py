@@ -93,6 +93,66 @@ def enqueue_data_extraction_job(
     return jobs
 
 
+# Endpoint to run several models in a single pass over the items
+@router.post(
+    "/data/extraction/composite",
+    summary="Run a composite data extraction job",
+    description="""
+Runs extraction for several models in a single pass over the items.
+Each item's inputs are loaded once for all the models that share
+the same input spec, instead of once per model.
+Each model still gets its own job log and its own results.
+All models must target items (not text).
+    """,
+)
+def enqueue_composite_extraction_job(
+    inference_ids: List[str] = Query(..., title="Inference ID List"),
+    batch_size: Optional[int] = Query(default=None, title="Batch Size"),
+    threshold: Optional[float] = Query(
+        default=None, title="Confidence Threshold"
+    ),
+    conn_args: Dict[str, Any] = Depends(get_db_system_wl),
+) -> JobModel:
+    batch_sizes: List[Optional[int]] = []
+    thresholds: List[Optional[float]] = []
+    for inference_id in inference_ids:
+        model = ModelOptsFactory.get_model(inference_id)
+        if model.target_entities() != ["items"]:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"{inference_id} does not target items",
+            )
+        def_batch_size, def_threshold = get_default_config(
+            inference_id, conn_args["index_db"]
+        )
+        chosen_batch_size = batch_size
+        chosen_threshold = threshold
+
+        if chosen_batch_size is None or chosen_batch_size < 1:
+            chosen_batch_size = def_batch_size
+        if chosen_threshold is None:
+            chosen_threshold = def_threshold
+        batch_sizes.append(chosen_batch_size)
+        thresholds.append(chosen_threshold)
+
+    job = Job(
+        queue_id=job_manager.get_next_job_id(),
+        job_type="composite_extraction",
+        conn_args=conn_args,
+        metadata=",".join(inference_ids),
+        inference_ids=inference_ids,
+        batch_sizes=batch_sizes,
+        thresholds=thresholds,
+    )
+    job_manager.enqueue_job(job)
+    return JobModel(
+        queue_id=job.queue_id,
+        job_type=job.job_type,
+        metadata=job.metadata,
+        index_db=job.conn_args["index_db"],
+    )
+
+
 def get_default_config(
     inference_id: str, index_db: str
 ) -> Tuple[int, float | None]:
@@ -23,3 +23,57 @@ class SystemConfig(BaseModel):
     preload_embedding_models: bool = Field(default=False)
     job_filters: List[JobFilter] = Field(default_factory=list)
     filescan_filter: Optional[Match] = None
+    # Number of threads hashing and probing new files during a folder scan.
+    # 1 keeps the scan fully sequential.
+    scan_workers: int = Field(default=1)
+    # Maximum number of files queued for hashing at once (0 = 2 * workers)
+    scan_max_in_flight: int = Field(default=0)
+    # Load all known file records for a folder in one query before a scan,
+    # instead of looking each walked path up individually
+    scan_preload_files: bool = Field(default=False)
+    # Detect files that were moved or renamed since they were last seen
+    # by their size, mtime and inode/device, and reuse their hash
+    scan_detect_moves: bool = Field(default=True)
+    # Also compare a hash of a few sampled chunks of the file
+    # before accepting a move, and use it to detect moves across devices
+    scan_move_sampled_hash: bool = Field(default=False)
+    # Watch the included folders for changes (Linux only, uses inotify)
+    # and index new, modified and deleted files as they happen
+    watch_folders: bool = Field(default=False)
+    # Seconds without new events before a changed path is processed
+    watch_debounce_seconds: float = Field(default=2.0)
+    # Commit rescans of all folders every N files and/or every T seconds,
+    # so an interrupted scan resumes from its last checkpoint
+    # instead of starting over (0 = never).
+    # Scans of newly added folders are never checkpointed
+    scan_checkpoint_files: int = Field(default=0)
+    scan_checkpoint_seconds: float = Field(default=0)
+    # Processes generating thumbnails and blurhashes after folder scans
+    # (1 = generate them in the job process itself)
+    thumbnail_workers: int = Field(default=4)
+    # Number of items whose previews are written per transaction
+    thumbnail_write_batch_size: int = Field(default=32)
+    # Threads loading the inputs of data extraction jobs (decoding files,
+    # extracting frames...) while the previous batches are being inferred
+    # (0 = load inputs sequentially, between inference batches)
+    extraction_loader_threads: int = Field(default=2)
+    # Number of batches whose inputs are loaded ahead of inference
+    extraction_prefetch_batches: int = Field(default=2)
+    # Number of inference requests a data extraction job keeps outstanding
+    # (results are still handled in order)
+    extraction_inference_concurrency: int = Field(default=1)
+    # Extraction results are written in one transaction
+    # every N items, or every T milliseconds, whichever comes first
+    extraction_write_batch_size: int = Field(default=64)
+    extraction_write_interval_ms: int = Field(default=1000)
+    # Fetch the items a data extraction job has to process in chunks
+    # of N items, ordered by id, prefetching the next chunk in the background
+    # (0 = fetch them all with a single query, newest first)
+    extraction_queue_chunk_size: int = Field(default=0)
+    # Run the scheduled jobs for models that take the same kind of input
+    # (e.g. video frames) as one composite job, loading each item once
+    cron_composite_jobs: bool = Field(default=False)
+    # Size in MB of the on-disk cache of decoded extraction inputs
+    # (frames, audio...), keyed by file hash and input settings,
+    # so re-running models over the same files skips decoding (0 = disabled)
+    extraction_input_cache_mb: int = Field(default=0)
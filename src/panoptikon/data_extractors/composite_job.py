@@ -0,0 +1,234 @@
+import logging
+import sqlite3
+from dataclasses import dataclass, field
+from typing import Any, Dict, Generator, List, Sequence, Tuple
+
+from panoptikon.config_type import SystemConfig
+from panoptikon.data_extractors.dynamic_job import (
+    ExtractionJobFunctions,
+    get_job_functions,
+)
+from panoptikon.data_extractors.extraction_job import (
+    ExtractionJobWriter,
+    InputLoaderPool,
+    LoadResult,
+    batch_items,
+    load_item_inputs,
+    prefetch_items,
+    start_extraction_job,
+)
+from panoptikon.data_extractors.input_cache import InputCache
+from panoptikon.data_extractors.models import ModelGroup
+from panoptikon.data_extractors.types import (
+    ExtractionJobProgress,
+    ExtractionJobReport,
+    ExtractionJobStart,
+    JobInputData,
+)
+from panoptikon.db import atomic_transaction
+from panoptikon.db.extraction_log import (
+    count_items_missing_data_extraction,
+    get_items_missing_any_data_extraction,
+    remove_incomplete_jobs,
+)
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CompositeJobModel:
+    model: ModelGroup
+    batch_size: int
+    threshold: float | None
+    functions: ExtractionJobFunctions
+    writer: ExtractionJobWriter
+    # Items still to be processed by this model
+    remaining: int
+    # Loaded items waiting to be sent to inference
+    batch: List[Tuple[JobInputData, int, Sequence[Any]]] = field(
+        default_factory=list
+    )
+    batch_units: int = 0
+
+
+def run_composite_extraction_job(
+    conn: sqlite3.Connection,
+    config: SystemConfig,
+    models: Sequence[Tuple[ModelGroup, int | None, float | None]],
+) -> Generator[
+    Tuple[
+        str, ExtractionJobStart | ExtractionJobProgress | ExtractionJobReport
+    ],
+    Any,
+    None,
+]:
+    """
+    Run extraction jobs for several models in a single pass over the items.
+    Each item is read once, and its inputs are loaded once for each
+    distinct input spec among the models that still need to process it,
+    instead of once per model.
+    As in `run_extraction_job`, inputs are loaded by a thread pool
+    unless `config.extraction_loader_threads` is 0.
+    Every model gets its own job log, and its results are written
+    under its own setter name, as with separate jobs.
+    Models are given as (model, batch_size, threshold), where None
+    means the model's default. All models must target items.
+    Yields (setter name, job event) tuples.
+    """
+    for model, _, _ in models:
+        if model.target_entities() != ["items"]:
+            raise ValueError(
+                f"{model.setter_name()} does not target items, "
+                + "it cannot be part of a composite job"
+            )
+    # Commit the current transaction
+    conn.commit()
+    with atomic_transaction(conn, logger):
+        remove_incomplete_jobs(conn)
+
+    input_cache = InputCache.from_config(config)
+    jobs: Dict[str, CompositeJobModel] = {}
+    for model, batch_size, threshold in models:
+        batch_size, threshold = model.job_settings(batch_size, threshold)
+        initial_remaining = count_items_missing_data_extraction(
+            conn, config, model
+        )
+        if initial_remaining < 1:
+            logger.info(f"No items to process, skipping {model.setter_name()}")
+            continue
+        functions = get_job_functions(conn, model, threshold, input_cache)
+        functions.load_model()
+        # Incomplete jobs were removed above, and removing them here
+        # would remove the logs of the jobs started for the previous models
+        job_id, start_time = start_extraction_job(
+            conn, model, threshold, batch_size, remove_incomplete=False
+        )
+        yield model.setter_name(), ExtractionJobStart(
+            start_time, initial_remaining, job_id
+        )
+        jobs[model.setter_name()] = CompositeJobModel(
+            model=model,
+            batch_size=batch_size,
+            threshold=threshold,
+            functions=functions,
+            writer=ExtractionJobWriter(
+                conn,
+                config,
+                model.setter_name(),
+                job_id,
+                start_time,
+                functions.result_handler,
+                on_write_commit=functions.on_write_commit,
+                on_write_rollback=functions.on_write_rollback,
+            ),
+            remaining=initial_remaining,
+        )
+    if not jobs:
+        logger.info("No items to process for any model, aborting")
+        return
+
+    logger.info(f"Running composite job for {', '.join(jobs.keys())}")
+
+    def load_inputs(
+        loader_conn: sqlite3.Connection,
+        item: JobInputData,
+        setter_names: List[str],
+    ) -> Dict[str, LoadResult]:
+        loaded: Dict[str, LoadResult] = {}
+        results: Dict[str, LoadResult] = {}
+        for setter_name in setter_names:
+            functions = jobs[setter_name].functions
+            if functions.input_key not in loaded:
+                loaded[functions.input_key] = load_item_inputs(
+                    loader_conn, item, functions.data_loader
+                )
+            results[setter_name] = loaded[functions.input_key]
+        return results
+
+    # Setter names that need each item, keyed by sha256
+    needed_by: Dict[str, List[str]] = {}
+
+    def get_items():
+        for item, remaining, setter_names in (
+            get_items_missing_any_data_extraction(
+                conn, config, [job.model for job in jobs.values()]
+            )
+        ):
+            needed_by[item.sha256] = setter_names
+            yield item, remaining
+
+    def run_batch(job: CompositeJobModel):
+        batch = iter(job.batch)
+        job.batch, job.batch_units = [], 0
+        for item, remaining, inputs, outputs in batch_items(
+            batch,
+            job.batch_size,
+            job.writer.timed_inference(job.functions.batch_inference),
+        ):
+            for progress in job.writer.add(item, remaining, inputs, outputs):
+                yield job.model.setter_name(), progress
+
+    loader_threads = config.extraction_loader_threads
+    if loader_threads > 0:
+        loader_pool = InputLoaderPool(conn, loader_threads)
+
+        def submit(item: JobInputData):
+            setter_names = needed_by.pop(item.sha256)
+            return loader_pool.submit(
+                lambda loader_conn: load_inputs(
+                    loader_conn, item, setter_names
+                )
+            )
+
+        max_batch_size = max(job.batch_size for job in jobs.values())
+        loaded = prefetch_items(
+            get_items(),
+            submit,
+            max_in_flight=max(
+                loader_threads,
+                config.extraction_prefetch_batches * max_batch_size,
+            ),
+        )
+    else:
+        loader_pool = None
+
+        def load_in_transaction(item: JobInputData) -> Dict[str, LoadResult]:
+            with atomic_transaction(conn, logger):
+                return load_inputs(conn, item, needed_by.pop(item.sha256))
+
+        loaded = (
+            (item, remaining, load_in_transaction(item))
+            for item, remaining in get_items()
+        )
+
+    try:
+        for item, _, results in loaded:
+            for setter_name, (inputs, load_time) in results.items():
+                job = jobs[setter_name]
+                job.remaining = max(0, job.remaining - 1)
+                if inputs is None:
+                    job.writer.add_failed(item)
+                    inputs = []
+                else:
+                    job.writer.add_load_time(load_time)
+                job.batch.append((item, job.remaining, inputs))
+                job.batch_units += len(inputs)
+                if job.batch_units >= job.batch_size:
+                    yield from run_batch(job)
+        for job in jobs.values():
+            if job.batch:
+                yield from run_batch(job)
+            for progress in job.writer.flush():
+                yield job.model.setter_name(), progress
+    finally:
+        if loader_pool is not None:
+            loader_pool.close()
+
+    for setter_name, job in jobs.items():
+        report = job.writer.finish(
+            count_items_missing_data_extraction(conn, config, job.model)
+        )
+        job.functions.cleanup()
+        yield setter_name, report
+    if input_cache is not None:
+        input_cache.log_stats()
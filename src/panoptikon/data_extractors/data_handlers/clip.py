@@ -1,9 +1,11 @@
 import sqlite3
 from typing import Sequence
 
-from panoptikon.data_extractors.data_handlers.utils import deserialize_array
+from panoptikon.data_extractors.data_handlers.utils import (
+    deserialize_array_view,
+)
 from panoptikon.data_extractors.types import JobInputData
-from panoptikon.db.embeddings import add_embedding
+from panoptikon.db.embeddings import add_embeddings
 from panoptikon.db.extraction_log import add_item_data
 
 
@@ -15,8 +17,9 @@ def handle_clip(
     embeddings: Sequence[bytes],
 ):
     data_ids = []
+    rows = []
     for idx, embedding_buf in enumerate(embeddings):
-        embedding = deserialize_array(embedding_buf).tolist()
+        embedding = deserialize_array_view(embedding_buf)
         data_id = add_item_data(
             conn,
             item=item.sha256,
@@ -25,8 +28,9 @@ def handle_clip(
             data_type="clip",
             index=idx,
         )
-        add_embedding(conn, data_id, "clip", embedding)
+        rows.append((data_id, embedding))
         data_ids.append(data_id)
+    add_embeddings(conn, "clip", rows)
     if not data_ids:
         add_item_data(
             conn,
@@ -10,7 +10,7 @@ from panoptikon.data_extractors.data_handlers.utils import from_dict
 from panoptikon.data_extractors.types import JobInputData, TagResult
 from panoptikon.db.extracted_text import add_extracted_text
 from panoptikon.db.extraction_log import add_item_data
-from panoptikon.db.tags import add_tag_to_item
+from panoptikon.db.tags import TagCache, add_tags_to_item
 
 logger = logging.getLogger(__name__)
 
@@ -94,6 +94,7 @@ def handle_tag_result(
     setter_name: str,
     item: JobInputData,
     results: Sequence[Dict[str, Any]],
+    tag_cache: TagCache | None = None,
 ):
     if len(results) == 0:
         add_item_data(
@@ -143,14 +144,15 @@ def handle_tag_result(
         index=0,
         is_placeholder=len(tags) == 0,
     )
-    for namespace, tag, confidence in tags:
-        add_tag_to_item(
-            conn,
-            data_id=tags_data_id,
-            namespace=f"{main_namespace}:{namespace}",
-            name=tag,
-            confidence=confidence,
-        )
+    add_tags_to_item(
+        conn,
+        data_id=tags_data_id,
+        tags=[
+            (f"{main_namespace}:{namespace}", tag, confidence)
+            for namespace, tag, confidence in tags
+        ],
+        tag_cache=tag_cache,
+    )
 
     if len(tags) == 0:
         return []
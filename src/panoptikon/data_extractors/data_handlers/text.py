@@ -2,7 +2,7 @@ import sqlite3
 from typing import Any, Dict, Sequence
 
 from panoptikon.data_extractors.types import JobInputData
-from panoptikon.db.extracted_text import add_extracted_text
+from panoptikon.db.extracted_text import add_extracted_texts
 from panoptikon.db.extraction_log import add_item_data
 
 
@@ -21,6 +21,7 @@ def handle_text(
     """
     string_set = set()
     data_ids = []
+    texts = []
     for idx, text_result in enumerate(text_results):
         transcription: str | None = text_result.get("transcription", None)
         assert (
@@ -45,14 +46,16 @@ def handle_text(
             index=idx,
         )
         data_ids.append(data_id)
-        add_extracted_text(
-            conn,
-            data_id=data_id,
-            text=cleaned_string,
-            language=language,
-            language_confidence=language_confidence,
-            confidence=confidence,
+        texts.append(
+            (
+                data_id,
+                cleaned_string,
+                language,
+                language_confidence,
+                confidence,
+            )
         )
+    add_extracted_texts(conn, texts)
     if len(data_ids) == 0:
         # Add a dummy item_data entry to indicate that the item was processed
         # but no text was extracted
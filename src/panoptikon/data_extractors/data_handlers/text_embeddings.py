@@ -3,9 +3,11 @@ from typing import Sequence
 
 import numpy as np
 
-from panoptikon.data_extractors.data_handlers.utils import deserialize_array
+from panoptikon.data_extractors.data_handlers.utils import (
+    deserialize_array_view,
+)
 from panoptikon.data_extractors.types import JobInputData
-from panoptikon.db.embeddings import add_embedding
+from panoptikon.db.embeddings import add_embeddings
 from panoptikon.db.extraction_log import add_item_data
 
 
@@ -17,11 +19,12 @@ def handle_text_embeddings(
     embeddings: Sequence[bytes],
 ):
     data_ids = []
+    rows = []
     assert len(embeddings) == 1, "Mismatch in data ids"
     assert isinstance(embeddings[0], bytes), "Embedding is not a byte string"
     assert item.data_id is not None, "Item data id is not set"
     assert item.text is not None, "Item text is not set"
-    text_embeddings = deserialize_array(embeddings[0])
+    text_embeddings = deserialize_array_view(embeddings[0])
 
     # Check if the embedding is a single-dimensional array and reshape if necessary
     if text_embeddings.ndim == 1:
@@ -45,8 +48,9 @@ def handle_text_embeddings(
             src_data_id=item.data_id,
             index=idx,
         )
-        add_embedding(conn, data_id, "text-embedding", embedding.tolist())
+        rows.append((data_id, embedding))
         data_ids.append(data_id)
+    add_embeddings(conn, "text-embedding", rows)
 
     if not data_ids:
         add_item_data(
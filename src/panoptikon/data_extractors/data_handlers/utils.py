@@ -9,6 +9,28 @@ def deserialize_array(buffer: bytes) -> np.ndarray:
     return np.load(bio, allow_pickle=False)
 
 
+def deserialize_array_view(buffer: bytes) -> np.ndarray:
+    """
+    Like `deserialize_array`, but returns a read-only view
+    over the payload of the npy buffer instead of copying it.
+    """
+    bio = io.BytesIO(buffer)
+    version = np.lib.format.read_magic(bio)
+    if version == (1, 0):
+        shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(bio)
+    else:
+        shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(bio)
+    if dtype.hasobject:
+        raise ValueError("Object arrays are not supported")
+    array = np.frombuffer(
+        buffer,
+        dtype=dtype,
+        count=int(np.prod(shape)),
+        offset=bio.tell(),
+    )
+    return array.reshape(shape, order="F" if fortran_order else "C")
+
+
 def serialize_array(array: np.ndarray) -> bytes:
     buffer = io.BytesIO()
     np.save(buffer, array)
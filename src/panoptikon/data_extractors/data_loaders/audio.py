@@ -2,9 +2,10 @@ import io
 import json
 import random
 import subprocess
+import tempfile
 import wave
 from dataclasses import dataclass
-from typing import List, Optional
+from typing import Any, Dict, Generator, List, Optional, Tuple
 
 import mutagen
 import numpy as np
@@ -44,9 +45,12 @@ class MediaInfo:
     subtitle_tracks: List[SubtitleTrack]
 
 
-def extract_media_info(file: str) -> MediaInfo:
+def probe_media(file: str) -> Dict[str, Any]:
     """
-    Extract detailed information from an audio or video file, including subtitles.
+    Run ffprobe once on an audio or video file,
+    returning its full stream and format information.
+    The result can be cached (see `panoptikon.db.media_probes`)
+    and passed to the other functions in this module to avoid probing again.
 
     Parameters
     ----------
@@ -55,24 +59,49 @@ def extract_media_info(file: str) -> MediaInfo:
 
     Returns
     -------
-    MediaInfo
-        A dataclass containing information about audio tracks, video track (if present), and subtitle tracks.
+    Dict[str, Any]
+        The parsed JSON output of ffprobe.
     """
     try:
-        # Run ffprobe to get detailed stream and format information
         cmd = [
             "ffprobe",
             "-v",
             "error",
-            "-show_entries",
-            "stream=index,codec_type,codec_name,duration,width,height,tags:format=duration",
+            "-show_streams",
+            "-show_format",
             "-of",
             "json",
             file,
         ]
         result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-        data = json.loads(result.stdout)
+        return json.loads(result.stdout)
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"Failed to analyze file: {e.stderr}") from e
+    except json.JSONDecodeError as e:
+        raise RuntimeError(f"Failed to parse ffprobe output: {str(e)}") from e
+
+
+def extract_media_info(
+    file: str, probe: Dict[str, Any] | None = None
+) -> MediaInfo:
+    """
+    Extract detailed information from an audio or video file, including subtitles.
 
+    Parameters
+    ----------
+    file: str
+        The path to the audio or video file to analyze.
+
+    probe: Dict[str, Any] | None
+        The output of `probe_media` for this file, if already available.
+
+    Returns
+    -------
+    MediaInfo
+        A dataclass containing information about audio tracks, video track (if present), and subtitle tracks.
+    """
+    data = probe if probe is not None else probe_media(file)
+    try:
         audio_tracks = []
         video_track = None
         subtitle_tracks = []
@@ -118,12 +147,21 @@ def extract_media_info(file: str) -> MediaInfo:
             subtitle_tracks=subtitle_tracks,
         )
 
-    except subprocess.CalledProcessError as e:
-        raise RuntimeError(f"Failed to analyze file: {e.stderr}") from e
-    except (json.JSONDecodeError, KeyError) as e:
+    except KeyError as e:
         raise RuntimeError(f"Failed to parse ffprobe output: {str(e)}") from e
 
 
+def get_audio_stream_count(probe: Dict[str, Any]) -> int:
+    """
+    Count the audio streams in the output of `probe_media`
+    """
+    return sum(
+        1
+        for stream in probe.get("streams", [])
+        if stream.get("codec_type") == "audio"
+    )
+
+
 SAMPLE_RATE = 16000
 
 
@@ -133,7 +171,9 @@ def format_ffmpeg_error(error: str) -> str:
     return " ".join(error_message)
 
 
-def check_audio_stream(file: str) -> bool:
+def check_audio_stream(
+    file: str, probe: Dict[str, Any] | None = None
+) -> bool:
     """
     Check if a file has any audio streams
 
@@ -142,11 +182,16 @@ def check_audio_stream(file: str) -> bool:
     file: str
         The file to check for audio streams
 
+    probe: Dict[str, Any] | None
+        The output of `probe_media` for this file, if already available.
+
     Returns
     -------
     bool
         True if the file has audio streams, False otherwise.
     """
+    if probe is not None:
+        return get_audio_stream_count(probe) > 0
     try:
         # Run ffprobe to get stream information
         cmd = [
@@ -173,7 +218,9 @@ def check_audio_stream(file: str) -> bool:
         ) from e
 
 
-def load_audio(file: str, sr: int = SAMPLE_RATE) -> List[np.ndarray]:
+def load_audio(
+    file: str, sr: int = SAMPLE_RATE, probe: Dict[str, Any] | None = None
+) -> List[np.ndarray]:
     """
     Open an audio file and read all audio tracks as mono waveforms, resampling as necessary.
 
@@ -185,6 +232,9 @@ def load_audio(file: str, sr: int = SAMPLE_RATE) -> List[np.ndarray]:
     sr: int
         The sample rate to resample the audio if necessary
 
+    probe: Dict[str, Any] | None
+        The output of `probe_media` for this file, if already available.
+
     Returns
     -------
     List[np.ndarray]
@@ -192,31 +242,16 @@ def load_audio(file: str, sr: int = SAMPLE_RATE) -> List[np.ndarray]:
         Returns an empty list if no audio tracks are found.
     """
     try:
-        # Get the number of audio streams in the file
-        probe_cmd = [
-            "ffprobe",
-            "-v",
-            "error",
-            "-select_streams",
-            "a",
-            "-show_entries",
-            "stream=index",
-            "-of",
-            "csv=p=0",
-            file,
-        ]
-        result = subprocess.run(
-            probe_cmd, capture_output=True, text=True, check=True
-        )
-        stream_indices = [
-            int(x) for x in result.stdout.strip().split("\n") if x
-        ]
+        if probe is None:
+            probe = probe_media(file)
+        # `-map 0:a:N` selects the Nth audio stream
+        stream_count = get_audio_stream_count(probe)
 
-        if not stream_indices:
+        if not stream_count:
             return []
 
         audio_tracks = []
-        for index in stream_indices:
+        for index in range(stream_count):
             cmd = [
                 "ffmpeg",
                 "-nostdin",
@@ -251,7 +286,9 @@ def load_audio(file: str, sr: int = SAMPLE_RATE) -> List[np.ndarray]:
         raise RuntimeError(f"An unexpected error occurred: {str(e)}") from e
 
 
-def load_audio_single(file: str, sr: int = SAMPLE_RATE) -> List[np.ndarray]:
+def load_audio_single(
+    file: str, sr: int = SAMPLE_RATE, probe: Dict[str, Any] | None = None
+) -> List[np.ndarray]:
     """
     Open an audio file and read as mono waveform, resampling as necessary
 
@@ -263,10 +300,16 @@ def load_audio_single(file: str, sr: int = SAMPLE_RATE) -> List[np.ndarray]:
     sr: int
         The sample rate to resample the audio if necessary
 
+    probe: Dict[str, Any] | None
+        The output of `probe_media` for this file, if already available.
+        Files without audio streams are then skipped without running ffmpeg.
+
     Returns
     -------
     A NumPy array containing the audio waveform, in float32 dtype.
     """
+    if probe is not None and get_audio_stream_count(probe) == 0:
+        return []
     try:
         # Launches a subprocess to decode audio while down-mixing and resampling as necessary.
         # Requires the ffmpeg CLI to be installed.
@@ -289,7 +332,7 @@ def load_audio_single(file: str, sr: int = SAMPLE_RATE) -> List[np.ndarray]:
         ]
         out = subprocess.run(cmd, capture_output=True, check=True).stdout
     except subprocess.CalledProcessError as e:
-        if not check_audio_stream(file):
+        if not check_audio_stream(file, probe):
             return []
         raise RuntimeError(
             f"Failed to load audio: {format_ffmpeg_error(e.stderr.decode())}"
@@ -298,6 +341,117 @@ def load_audio_single(file: str, sr: int = SAMPLE_RATE) -> List[np.ndarray]:
     return [np.frombuffer(out, np.int16).flatten().astype(np.float32) / 32768.0]
 
 
+def stream_audio_chunks(
+    file: str,
+    sr: int = SAMPLE_RATE,
+    chunk_seconds: float = 30.0,
+    max_chunks: int | None = None,
+    probe: Dict[str, Any] | None = None,
+) -> Generator[Tuple[float, bytes], None, None]:
+    """
+    Decode the default audio track of a file as mono 16-bit PCM,
+    yielding it in fixed-size windows as ffmpeg produces them,
+    so only one window is held in memory at a time
+    regardless of the length of the file.
+
+    Parameters
+    ----------
+    file: str
+        The audio file to open
+
+    sr: int
+        The sample rate to resample the audio if necessary
+
+    chunk_seconds: float
+        The length of each window in seconds (the last one may be shorter)
+
+    max_chunks: int | None
+        Stop decoding after this many windows
+
+    probe: Dict[str, Any] | None
+        The output of `probe_media` for this file, if already available.
+        Files without audio streams are then skipped without running ffmpeg.
+
+    Yields
+    ------
+    Tuple[float, bytes]
+        The start time of the window in seconds, and its PCM samples
+        (convert them with `pcm_to_array` or `pcm_to_audio_bytes`)
+    """
+    if probe is not None and get_audio_stream_count(probe) == 0:
+        return
+    cmd = [
+        "ffmpeg",
+        "-nostdin",
+        "-v",
+        "error",
+        "-threads",
+        "0",
+        "-i",
+        file,
+        "-f",
+        "s16le",
+        "-ac",
+        "1",
+        "-acodec",
+        "pcm_s16le",
+        "-ar",
+        str(sr),
+        "-",
+    ]
+    chunk_bytes = max(1, int(chunk_seconds * sr)) * 2
+    # stderr goes to a file, so ffmpeg can never block on a full pipe
+    # while we are only reading stdout
+    with tempfile.TemporaryFile() as stderr:
+        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=stderr)
+        assert process.stdout is not None
+        samples_read = 0
+        chunks = 0
+        stopped_early = True
+        try:
+            while max_chunks is None or chunks < max_chunks:
+                pcm = process.stdout.read(chunk_bytes)
+                if not pcm:
+                    stopped_early = False
+                    break
+                yield samples_read / sr, pcm
+                samples_read += len(pcm) // 2
+                chunks += 1
+        finally:
+            process.stdout.close()
+            if process.poll() is None:
+                process.kill()
+            returncode = process.wait()
+        if returncode != 0 and not stopped_early:
+            stderr.seek(0)
+            error = stderr.read().decode(errors="replace")
+            if chunks == 0 and not check_audio_stream(file, probe):
+                return
+            raise RuntimeError(
+                f"Failed to load audio: {format_ffmpeg_error(error)}"
+            )
+
+
+def pcm_to_array(pcm: bytes) -> np.ndarray:
+    """
+    Convert mono 16-bit PCM samples to a float32 waveform.
+    """
+    return np.frombuffer(pcm, np.int16).astype(np.float32) / 32768.0
+
+
+def pcm_to_audio_bytes(pcm: bytes, sample_rate: int = 16000) -> bytes:
+    """
+    Wrap mono 16-bit PCM samples in a WAV file.
+    """
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav_file:
+        wav_file.setnchannels(1)  # mono
+        wav_file.setsampwidth(2)  # 16-bit
+        wav_file.setframerate(sample_rate)
+        wav_file.writeframes(pcm)
+    return buffer.getvalue()
+
+
 def array_to_audio_bytes(
     audio_array: np.ndarray, sample_rate: int = 16000
 ) -> bytes:
@@ -318,22 +472,7 @@ def array_to_audio_bytes(
     """
     # Convert float32 array to int16
     audio_array = (audio_array * 32768).astype(np.int16)
-
-    # Create buffer
-    buffer = io.BytesIO()
-
-    # Create wave write object
-    with wave.open(buffer, "wb") as wav_file:
-        wav_file.setnchannels(1)  # mono
-        wav_file.setsampwidth(2)  # 16-bit
-        wav_file.setframerate(sample_rate)
-        wav_file.writeframes(audio_array.tobytes())
-
-    # Get the bytes
-    wav_bytes = buffer.getvalue()
-    buffer.close()
-
-    return wav_bytes
+    return pcm_to_audio_bytes(audio_array.tobytes(), sample_rate)
 
 
 def create_audio_placeholder(
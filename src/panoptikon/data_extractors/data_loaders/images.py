@@ -9,12 +9,21 @@ from attr import dataclass
 from PIL import Image as PILImage
 from PIL import ImageSequence
 
-from panoptikon.data_extractors.data_loaders.pdf import read_pdf
-from panoptikon.data_extractors.data_loaders.video import video_to_frames
+from panoptikon.data_extractors.data_loaders.pdf import (
+    PageRenderSettings,
+    iter_pdf_pages,
+)
+from panoptikon.data_extractors.data_loaders.video import (
+    FrameSamplingSettings,
+    sample_video_frames,
+    video_to_frames,
+)
 from panoptikon.data_extractors.types import JobInputData
 from panoptikon.db.storage import (
     get_frames_bytes,
+    get_rendered_document,
     store_frames,
+    store_rendered_document,
     thumbnail_to_bytes,
 )
 
@@ -55,6 +64,8 @@ def image_loader(
     conn: sqlite3.Connection,
     item: JobInputData,
     slice_settings: ImageSliceSettings | None = ImageSliceSettings(),
+    frame_sampling: FrameSamplingSettings | None = None,
+    page_settings: PageRenderSettings | None = None,
 ) -> Sequence[bytes]:
     if (item.width and item.height 
         and 
@@ -80,6 +91,29 @@ def image_loader(
                 item.height,
                 slice_settings,
             )
+    if (
+        item.type.startswith("video")
+        and frame_sampling is not None
+        and frame_sampling.mode != "uniform"
+    ):
+        if not item.duration or not item.video_tracks:
+            logger.debug(
+                f"Video {item.sha256} has no duration or video tracks, skipping"
+            )
+            return []
+        # Adaptively sampled frames depend on the model's frame budget,
+        # so they are not stored with the item's frames
+        return slice_target_size(
+            [
+                thumbnail_to_bytes(frame, "JPEG")
+                for frame in sample_video_frames(
+                    item.path, frame_sampling, duration=item.duration
+                )
+            ],
+            item.width,
+            item.height,
+            slice_settings,
+        )
     if item.type.startswith("video"):
         if frames := get_frames_bytes(conn, item.sha256):
             logger.debug(f"Loaded {len(frames)} frames from database")
@@ -92,7 +126,9 @@ def image_loader(
                     f"Video {item.sha256} has no video tracks, skipping"
                 )
                 return []
-            pil_frames = video_to_frames(item.path, num_frames=4)
+            pil_frames = video_to_frames(
+                item.path, num_frames=4, duration=item.duration
+            )
             frames = store_frames(
                 conn,
                 item.sha256,
@@ -107,38 +143,38 @@ def image_loader(
             slice_settings,
         )
 
-    if item.type.startswith("application/pdf"):
-        pages_pil = [PILImage.fromarray(page) for page in read_pdf(item.path)]
-        pages_slices = [
-            slice_target_size(
-                [thumbnail_to_bytes(page, "JPEG")],
-                page.width,
-                page.height,
-                slice_settings,
-            )
-            for page in pages_pil
-        ]
-        return [s for page_slices in pages_slices for s in page_slices]
-    if item.type.startswith("text/html"):
-        res = read_html(item.path)
-        assert res is not None, "Failed to read HTML file"
-        pages_pil = [PILImage.fromarray(page) for page in read_pdf(res)]
-        pages_slices = [
-            slice_target_size(
-                [thumbnail_to_bytes(page, "JPEG")],
-                page.width,
-                page.height,
-                slice_settings,
+    if item.type.startswith("application/pdf") or item.type.startswith(
+        "text/html"
+    ):
+        document: str | bytes = item.path
+        if item.type.startswith("text/html"):
+            document = get_html_document(conn, item.sha256, item.path)
+        # Pages are rendered and encoded one at a time,
+        # and only up to the page budget
+        slices: List[bytes] = []
+        for page in iter_pdf_pages(
+            document, page_settings or PageRenderSettings()
+        ):
+            page_image = PILImage.fromarray(page)
+            slices.extend(
+                slice_target_size(
+                    [thumbnail_to_bytes(page_image, "JPEG")],
+                    page_image.width,
+                    page_image.height,
+                    slice_settings,
+                )
             )
-            for page in pages_pil
-        ]
-        return [s for page_slices in pages_slices for s in page_slices]
+        return slices
     return []
 
 
-def get_pdf_image(file_path: str) -> PILImage.Image:
-
-    return PILImage.fromarray(read_pdf(file_path)[0])
+def get_pdf_image(file: str | bytes) -> PILImage.Image:
+    # Only the first page is rendered
+    pages = iter_pdf_pages(file, PageRenderSettings(max_pages=1))
+    try:
+        return PILImage.fromarray(next(pages))
+    finally:
+        pages.close()
 
 
 def read_html(url: str, **kwargs: Any) -> bytes | None:
@@ -158,10 +194,36 @@ def read_html(url: str, **kwargs: Any) -> bytes | None:
     return HTML(url, **kwargs).write_pdf()
 
 
-def get_html_image(file_path: str) -> PILImage.Image:
+def render_html(file_path: str) -> bytes:
     res = read_html(file_path)
     assert res is not None, "Failed to read HTML file"
-    return PILImage.fromarray(read_pdf(res)[0])
+    return res
+
+
+def get_html_document(
+    conn: sqlite3.Connection, sha256: str, file_path: str
+) -> bytes:
+    """
+    Get the PDF rendering of an HTML file,
+    rendering and storing it if it was not already stored.
+    """
+    document = get_rendered_document(conn, sha256)
+    if document is None:
+        document = render_html(file_path)
+        store_rendered_document(conn, sha256, document)
+    return document
+
+
+def get_html_image(
+    file_path: str, document: bytes | None = None
+) -> PILImage.Image:
+    """
+    Render the first page of an HTML file,
+    from its PDF rendering if it is already available.
+    """
+    if document is None:
+        document = render_html(file_path)
+    return get_pdf_image(document)
 
 
 def generate_thumbnail(
@@ -1,8 +1,81 @@
-from typing import Any, List, Optional, Union
+from dataclasses import dataclass
+from typing import Any, Generator, List, Optional, Union
 
 import numpy as np
 
 
+@dataclass
+class PageRenderSettings:
+    """
+    How many pages of a document to render, and at what resolution.
+    """
+
+    # Stop after this many pages (None = render every page)
+    max_pages: Optional[int] = None
+    # Longest side of a rendered page in pixels, pages are never rendered
+    # above `scale` (None = always render at `scale`)
+    max_size: Optional[int] = None
+    # Rendering scale (1 corresponds to 72dpi)
+    scale: float = 2
+
+    @classmethod
+    def from_opts(
+        cls, opts: dict, default_max_pages: Optional[int] = None
+    ) -> "PageRenderSettings":
+        return cls(
+            max_pages=opts.get("max_pages", default_max_pages),
+            max_size=opts.get("page_size", cls.max_size),
+            scale=opts.get("page_scale", cls.scale),
+        )
+
+
+def iter_pdf_pages(
+    file: Union[str, bytes],
+    settings: PageRenderSettings = PageRenderSettings(),
+    rgb_mode: bool = True,
+    password: Optional[str] = None,
+    **kwargs: Any,
+) -> Generator[np.ndarray, None, None]:
+    """Lazily rasterise the pages of a PDF file into images in numpy format.
+    Pages are only rendered as they are consumed, so stopping early
+    (or setting `settings.max_pages`) skips the remaining pages entirely.
+
+    Args:
+    ----
+        file: the path to the PDF file, or its contents
+        settings: how many pages to render, and at what resolution
+        rgb_mode: if True, the output will be RGB, otherwise BGR
+        password: a password to unlock the document, if encrypted
+        **kwargs: additional parameters to :meth:`pypdfium2.PdfPage.render`
+
+    Yields:
+    -------
+        each page decoded as a numpy ndarray of shape H x W x C
+    """
+    import pypdfium2 as pdfium
+
+    pdf = pdfium.PdfDocument(file, password=password, autoclose=True)
+    try:
+        page_count = len(pdf)
+        if settings.max_pages is not None:
+            page_count = min(page_count, settings.max_pages)
+        for index in range(page_count):
+            page = pdf[index]
+            scale = settings.scale
+            if settings.max_size:
+                # Page sizes are in points (1/72 inch), i.e. pixels at scale 1
+                width, height = page.get_size()
+                scale = min(scale, settings.max_size / max(width, height, 1))
+            try:
+                yield page.render(
+                    scale=scale, rev_byteorder=rgb_mode, **kwargs
+                ).to_numpy()
+            finally:
+                page.close()
+    finally:
+        pdf.close()
+
+
 def read_pdf(
     file: Union[str, bytes],
     scale: int = 2,
@@ -24,11 +97,12 @@ def read_pdf(
     -------
         the list of pages decoded as numpy ndarray of shape H x W x C
     """
-    import pypdfium2 as pdfium
-
-    # Rasterise pages to numpy ndarrays with pypdfium2
-    pdf = pdfium.PdfDocument(file, password=password, autoclose=True)
-    return [
-        page.render(scale=scale, rev_byteorder=rgb_mode, **kwargs).to_numpy()
-        for page in pdf
-    ]
+    return list(
+        iter_pdf_pages(
+            file,
+            PageRenderSettings(scale=scale),
+            rgb_mode=rgb_mode,
+            password=password,
+            **kwargs,
+        )
+    )
@@ -1,8 +1,11 @@
 import logging
-import os
+import math
+import re
 import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from io import BytesIO
-from typing import List
+from typing import List, Tuple
 
 import PIL.Image
 from PIL.Image import Image
@@ -12,12 +15,10 @@ from panoptikon.data_extractors.data_loaders.audio import extract_media_info
 logger = logging.getLogger(__name__)
 
 
-def extract_frames_ffmpeg(path: str, num_frames: int):
-    # Create a temporary directory to store extracted frames
-    temp_dir = os.getenv("TEMP_DIR", "./data/tmp")
-    os.makedirs(temp_dir, exist_ok=True)
-
-    # Get the duration of the video in seconds
+def probe_duration(path: str) -> float:
+    """
+    Get the duration of a video in seconds with ffprobe.
+    """
     try:
         result = subprocess.run(
             [
@@ -33,65 +34,316 @@ def extract_frames_ffmpeg(path: str, num_frames: int):
             stdout=subprocess.PIPE,
             stderr=subprocess.STDOUT,
         )
-        duration = float(result.stdout)
+        return float(result.stdout)
     except Exception as e:
         info = extract_media_info(path)
         if info.video_track and info.video_track.duration:
-            duration = info.video_track.duration
+            return info.video_track.duration
         else:
             raise ValueError(
                 f"Could not extract duration of video at {path}"
             ) from e
 
-    # Calculate interval between frames
-    interval = duration / num_frames
 
-    # Build ffmpeg command to extract frames at regular intervals
-    command = [
-        "ffmpeg",
+# Maximum number of ffmpeg seeks to run at the same time for one video
+SEEK_WORKERS = 4
+
+
+def extract_frame_at(
+    path: str, timestamp: float, snap_to_keyframe: bool = True
+) -> bytes | None:
+    """
+    Extract a single frame at the given timestamp, returned as BMP bytes
+    streamed over ffmpeg's stdout (uncompressed RGB, so no encoding cost).
+    The seek happens on the input side, so only the frames around the
+    timestamp are decoded.
+    With `snap_to_keyframe`, only the keyframe at or before the timestamp
+    is decoded, which is much faster but less precise.
+    Returns None if no frame could be decoded at that position.
+    """
+    command = ["ffmpeg", "-nostdin", "-v", "error"]
+    if snap_to_keyframe:
+        command += ["-skip_frame", "nokey", "-noaccurate_seek"]
+    command += [
+        "-ss",
+        f"{timestamp:.3f}",
         "-i",
         path,
-        "-vf",
-        f"fps=1/{interval}",
-        "-vsync",
-        "vfr",
-        f"{temp_dir}/frame_%04d.png",
+        "-map",
+        "0:v:0",
+        "-frames:v",
+        "1",
+        "-f",
+        "image2pipe",
+        "-c:v",
+        "bmp",
+        "-pix_fmt",
+        "bgr24",
+        "-",
     ]
-
-    # Execute ffmpeg command and suppress output
-    subprocess.run(
+    result = subprocess.run(
         command,
-        check=True,
-        stdout=subprocess.DEVNULL,
-        stderr=subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
     )
+    if result.returncode != 0 or not result.stdout:
+        logger.debug(
+            f"Failed to extract frame at {timestamp:.3f}s from {path}: "
+            + result.stderr.decode(errors="replace").strip()
+        )
+        return None
+    return result.stdout
 
-    # Get list of extracted frames
-    extracted_frames = sorted(os.listdir(temp_dir))
 
-    # Load frames into PIL images and clean up immediately
-    frames = []
-    for frame_file in extracted_frames:
-        frame_path = os.path.join(temp_dir, frame_file)
-        with open(frame_path, "rb") as f:
-            if len(frames) < num_frames:
-                frame_image = PIL.Image.open(BytesIO(f.read()))
-                frames.append(frame_image)
-        os.remove(frame_path)  # Remove the frame after reading
+def extract_frames_ffmpeg(
+    path: str,
+    num_frames: int,
+    duration: float | None = None,
+    snap_to_keyframes: bool = True,
+    workers: int = SEEK_WORKERS,
+) -> List[Image]:
+    # Get the duration of the video in seconds, unless it is already known
+    # (it is part of the item metadata probed when the file was scanned)
+    if not duration:
+        duration = probe_duration(path)
+
+    # Same timestamps as sampling the video at a fixed interval
+    interval = duration / num_frames
+    timestamps = [i * interval for i in range(num_frames)]
+    return extract_frames_at(
+        path, timestamps, snap_to_keyframes=snap_to_keyframes, workers=workers
+    )
+
+
+def extract_frames_at(
+    path: str,
+    timestamps: List[float],
+    snap_to_keyframes: bool = True,
+    workers: int = SEEK_WORKERS,
+) -> List[Image]:
+    """
+    Extract one frame at each of the given timestamps, running the seeks
+    in parallel. Frames that could not be decoded are left out.
+    """
+
+    def extract(timestamp: float) -> bytes | None:
+        frame = None
+        if snap_to_keyframes:
+            frame = extract_frame_at(path, timestamp, snap_to_keyframe=True)
+        if frame is None:
+            frame = extract_frame_at(path, timestamp, snap_to_keyframe=False)
+        return frame
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        results = list(executor.map(extract, timestamps))
+
+    if snap_to_keyframes:
+        # Videos with sparse keyframes can snap several timestamps
+        # to the same keyframe, extract those precisely instead
+        seen = set()
+        for i, frame in enumerate(results):
+            if frame is not None and frame in seen:
+                results[i] = extract_frame_at(
+                    path, timestamps[i], snap_to_keyframe=False
+                )
+            if frame is not None:
+                seen.add(frame)
 
+    frames = []
+    for frame in results:
+        if frame is None:
+            continue
+        frame_image = PIL.Image.open(BytesIO(frame))
+        frame_image.load()
+        frames.append(frame_image)
     return frames
 
 
 def video_to_frames(
-    video_path: str, num_frames: int | None = None
+    video_path: str,
+    num_frames: int | None = None,
+    duration: float | None = None,
 ) -> List[Image]:
     """
     Extract keyframes from a video and save them as images.
     :param video_path: Path to the video file
     :param num_frames: Number of frames to extract (default: None, extract all keyframes)
+    :param duration: Duration of the video in seconds, if known (saves an ffprobe call)
     """
     if num_frames is None:
         num_frames = 4
     logger.debug(f"Extracting {num_frames} frames from video at {video_path}")
-    keyframes = extract_frames_ffmpeg(video_path, num_frames=num_frames)
+    keyframes = extract_frames_ffmpeg(
+        video_path, num_frames=num_frames, duration=duration
+    )
     return keyframes
+
+
+@dataclass
+class FrameSamplingSettings:
+    """
+    How to sample frames from a video for inference.
+    "uniform" takes `max_frames` evenly spaced frames.
+    "scene" scales the number of frames with the duration of the video
+    (`frames_per_minute`, between `min_frames` and `max_frames`),
+    spends the budget on the strongest scene changes first,
+    and drops frames that are perceptually near-identical to one already kept.
+    """
+
+    mode: str = "uniform"
+    max_frames: int = 4
+    min_frames: int = 1
+    frames_per_minute: float = 2.0
+    # Minimum ffmpeg scene score (0-1) for a frame to count as a scene change
+    scene_threshold: float = 0.3
+    # Frames whose difference hashes are within this Hamming distance
+    # of an already selected frame are dropped
+    dedupe_distance: int = 4
+
+    @classmethod
+    def from_opts(cls, opts: dict) -> "FrameSamplingSettings":
+        return cls(
+            mode=opts.get("sampling", cls.mode),
+            max_frames=opts.get("max_frames", cls.max_frames),
+            min_frames=opts.get("min_frames", cls.min_frames),
+            frames_per_minute=opts.get(
+                "frames_per_minute", cls.frames_per_minute
+            ),
+            scene_threshold=opts.get("scene_threshold", cls.scene_threshold),
+            dedupe_distance=opts.get("dedupe_distance", cls.dedupe_distance),
+        )
+
+    def frame_budget(self, duration: float) -> int:
+        budget = math.ceil(duration / 60 * self.frames_per_minute)
+        return max(self.min_frames, min(self.max_frames, budget))
+
+
+def detect_scene_changes(
+    path: str, threshold: float
+) -> List[Tuple[float, float]]:
+    """
+    Find the scene changes in a video with ffmpeg's scene score.
+    Only keyframes are decoded, and they are downscaled before scoring,
+    so this is fast even for long videos.
+    Returns a list of (timestamp, score) for every keyframe whose score
+    is above the threshold.
+    """
+    command = [
+        "ffmpeg",
+        "-nostdin",
+        "-v",
+        "error",
+        "-skip_frame",
+        "nokey",
+        "-i",
+        path,
+        "-map",
+        "0:v:0",
+        "-vf",
+        f"scale=160:-2,select='gt(scene,{threshold})',metadata=print:file=-",
+        "-f",
+        "null",
+        "-",
+    ]
+    result = subprocess.run(
+        command,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    if result.returncode != 0:
+        logger.debug(
+            f"Scene detection failed for {path}: {result.stderr.strip()}"
+        )
+        return []
+    # metadata=print outputs a "pts_time" line for each selected frame,
+    # followed by its metadata (including lavfi.scene_score)
+    scenes: List[Tuple[float, float]] = []
+    timestamp: float | None = None
+    for line in result.stdout.splitlines():
+        if match := re.search(r"pts_time:([\d.]+)", line):
+            timestamp = float(match.group(1))
+        elif timestamp is not None and (
+            match := re.search(r"lavfi\.scene_score=([\d.]+)", line)
+        ):
+            scenes.append((timestamp, float(match.group(1))))
+            timestamp = None
+    return scenes
+
+
+def difference_hash(image: Image, hash_size: int = 8) -> int:
+    """
+    Perceptual difference hash (dHash) of an image,
+    as a hash_size * hash_size bit integer.
+    """
+    pixels = list(
+        image.convert("L")
+        .resize((hash_size + 1, hash_size), PIL.Image.Resampling.BILINEAR)
+        .getdata()
+    )
+    value = 0
+    for row in range(hash_size):
+        for col in range(hash_size):
+            left = pixels[row * (hash_size + 1) + col]
+            right = pixels[row * (hash_size + 1) + col + 1]
+            value = (value << 1) | (left > right)
+    return value
+
+
+def dedupe_frames(frames: List[Image], max_distance: int) -> List[Image]:
+    """
+    Drop frames that are perceptually near-identical to an earlier frame.
+    """
+    kept: List[Image] = []
+    hashes: List[int] = []
+    for frame in frames:
+        frame_hash = difference_hash(frame)
+        if any(
+            (frame_hash ^ other).bit_count() <= max_distance
+            for other in hashes
+        ):
+            continue
+        kept.append(frame)
+        hashes.append(frame_hash)
+    return kept
+
+
+def sample_video_frames(
+    video_path: str,
+    settings: FrameSamplingSettings,
+    duration: float | None = None,
+) -> List[Image]:
+    """
+    Sample frames from a video according to the given settings.
+    In "scene" mode, the frame budget is first spent on evenly spaced frames
+    (up to `min_frames`), then on scene changes by decreasing scene score.
+    Frames are returned in chronological order.
+    """
+    if settings.mode != "scene":
+        return video_to_frames(
+            video_path, num_frames=settings.max_frames, duration=duration
+        )
+    if not duration:
+        duration = probe_duration(video_path)
+
+    budget = settings.frame_budget(duration)
+    min_frames = max(1, settings.min_frames)
+    interval = duration / min_frames
+    timestamps = [i * interval for i in range(min_frames)]
+    scenes = detect_scene_changes(video_path, settings.scene_threshold)
+    for timestamp, _ in sorted(scenes, key=lambda scene: -scene[1]):
+        if len(timestamps) >= budget:
+            break
+        # Skip scene changes right next to a frame that was already selected
+        if any(abs(timestamp - other) < 1.0 for other in timestamps):
+            continue
+        timestamps.append(timestamp)
+    timestamps.sort()
+
+    logger.debug(
+        f"Sampling {len(timestamps)} frames ({len(scenes)} scene changes, "
+        + f"budget {budget}) from video at {video_path}"
+    )
+    # Scene changes are detected on keyframes, so snapping is exact for them
+    frames = extract_frames_at(video_path, timestamps, snap_to_keyframes=True)
+    return dedupe_frames(frames, settings.dedupe_distance)
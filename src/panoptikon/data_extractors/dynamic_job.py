@@ -1,6 +1,8 @@
+import json
 import logging
 import sqlite3
-from typing import Any, Dict, List, Sequence, Tuple
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Sequence, Tuple
 
 from inferio.impl.utils import serialize_array
 from panoptikon.config_type import SystemConfig
@@ -13,17 +15,118 @@ from panoptikon.data_extractors.data_handlers.text_embeddings import (
 from panoptikon.data_extractors.data_loaders.audio import (
     array_to_audio_bytes,
     load_audio_single,
+    pcm_to_array,
+    pcm_to_audio_bytes,
+    probe_media,
+    stream_audio_chunks,
 )
 from panoptikon.data_extractors.data_loaders.images import (
     ImageSliceSettings,
     image_loader,
 )
+from panoptikon.data_extractors.data_loaders.pdf import PageRenderSettings
+from panoptikon.data_extractors.data_loaders.video import (
+    FrameSamplingSettings,
+)
 from panoptikon.data_extractors.extraction_job import run_extraction_job
+from panoptikon.data_extractors.input_cache import InputCache
 from panoptikon.data_extractors.models import ModelGroup
 from panoptikon.data_extractors.types import JobInputData
+from panoptikon.db.media_probes import get_media_probe, store_media_probe
+from panoptikon.db.tags import TagCache
 
 logger = logging.getLogger(__name__)
 
+# Input handlers whose outputs are expensive enough to be worth caching
+# (decoding images, documents, video and audio)
+CACHEABLE_INPUTS = {"image_frames", "audio_tracks", "audio_files", "md5_image"}
+
+# Windows of an item's audio are all held in memory until the item is done,
+# so the number of windows per item is capped unless max_chunks is set
+DEFAULT_MAX_AUDIO_CHUNKS = 60
+
+
+def get_item_media_probe(
+    conn: sqlite3.Connection,
+    item: JobInputData,
+    new_probes: Dict[str, Dict[str, Any]],
+) -> Dict[str, Any]:
+    """
+    Get the cached ffprobe output for an item, probing the file on a miss.
+    New probes are added to `new_probes` instead of being stored here,
+    as inputs may be loaded on a loader thread's connection, which must
+    not write to the index database (see `InputLoaderPool`).
+    The job stores them along with the item's results.
+    """
+    probe = get_media_probe(conn, item.sha256)
+    if probe is None:
+        probe = probe_media(item.path)
+        new_probes[item.sha256] = probe
+    return probe
+
+
+def load_audio_segments(
+    conn: sqlite3.Connection,
+    item: JobInputData,
+    sample_rate: int,
+    handler_opts: Dict[str, Any],
+    new_probes: Dict[str, Dict[str, Any]],
+) -> List[Tuple[Dict[str, Any], bytes]]:
+    """
+    Stream the audio of an item in windows of `chunk_seconds`,
+    as (segment, PCM samples) work units.
+    Each segment is a {"segment": {"start": float, "end": float}} dict
+    giving the position of the window in the file in seconds,
+    which is sent to the model along with the window.
+    Only the first `max_chunks` windows are loaded
+    (default DEFAULT_MAX_AUDIO_CHUNKS), as they are all kept in memory.
+    """
+    chunk_seconds: float = handler_opts["chunk_seconds"]
+    max_chunks: int = handler_opts.get("max_chunks", DEFAULT_MAX_AUDIO_CHUNKS)
+    segments = [
+        (
+            {
+                "segment": {
+                    "start": start,
+                    "end": start + len(pcm) / 2 / sample_rate,
+                }
+            },
+            pcm,
+        )
+        for start, pcm in stream_audio_chunks(
+            item.path,
+            sr=sample_rate,
+            chunk_seconds=chunk_seconds,
+            max_chunks=max_chunks,
+            probe=get_item_media_probe(conn, item, new_probes),
+        )
+    ]
+    if len(segments) >= max_chunks:
+        logger.info(
+            f"Reached max_chunks ({max_chunks}) for {item.path}, any audio past it is skipped"
+        )
+    return segments
+
+
+@dataclass
+class ExtractionJobFunctions:
+    """
+    The functions used by an extraction job to load the inputs for an item,
+    run inference on them and write the results.
+    Models with the same `input_key` load the same inputs for an item.
+    """
+
+    input_key: str
+    data_loader: Callable[[sqlite3.Connection, JobInputData], Sequence[Any]]
+    batch_inference: Callable[[Sequence[Any]], Sequence[Any]]
+    result_handler: Callable[[int, JobInputData, Sequence, Sequence], None]
+    load_model: Callable[[], None]
+    cleanup: Callable[[], None]
+    # Called by the job after the results it wrote are committed
+    # or rolled back, to keep in-memory caches consistent
+    on_write_commit: Callable[[], None] = lambda: None
+    on_write_rollback: Callable[[], None] = lambda: None
+
 
 def run_dynamic_extraction_job(
     conn: sqlite3.Connection,
@@ -35,6 +138,41 @@ def run_dynamic_extraction_job(
     """
     Run a job that processes items in the database using the given model.
     """
+    input_cache = InputCache.from_config(config)
+    functions = get_job_functions(conn, model, threshold, input_cache)
+
+    def cleanup():
+        functions.cleanup()
+        if input_cache is not None:
+            input_cache.log_stats()
+
+    return run_extraction_job(
+        conn,
+        config,
+        model,
+        batch_size,
+        threshold,
+        functions.data_loader,
+        functions.batch_inference,
+        functions.result_handler,
+        cleanup,
+        load_callback=functions.load_model,
+        on_write_commit=functions.on_write_commit,
+        on_write_rollback=functions.on_write_rollback,
+    )
+
+
+def get_job_functions(
+    conn: sqlite3.Connection,
+    model: ModelGroup,
+    threshold: float | None,
+    input_cache: InputCache | None = None,
+) -> ExtractionJobFunctions:
+    """
+    Get the functions to run an extraction job with the given model.
+    If an input cache is given, expensive inputs are read from it
+    and cached on a miss.
+    """
     if threshold:
         logger.info(f"Using score threshold {threshold}")
     else:
@@ -50,13 +188,17 @@ def run_dynamic_extraction_job(
         model.unload_model("batch")
 
     handler_name, handler_opts = model.input_spec()
+    # ffprobe outputs of loaded items missing from the cache, by sha256
+    new_probes: Dict[str, Dict[str, Any]] = {}
 
     if handler_name == "image_frames":
 
         def frame_loader(
+            conn: sqlite3.Connection,
             item: JobInputData,
         ) -> Sequence[Tuple[Dict[str, Any], bytes]]:
             max_frames = handler_opts.get("max_frames", 4)
+            frame_sampling = FrameSamplingSettings.from_opts(handler_opts)
             slice_frames = handler_opts.get("slice_frames", True)
             slice_settings = None
             if slice_frames:
@@ -66,7 +208,17 @@ def run_dynamic_extraction_job(
                     max_multiplier=1.6,
                     target_multiplier=1.5,
                 )
-            frames = image_loader(conn, item, slice_settings=slice_settings)
+            frames = image_loader(
+                conn,
+                item,
+                slice_settings=slice_settings,
+                frame_sampling=frame_sampling,
+                # Every page yields at least one frame, so pages
+                # past max_frames would be rendered for nothing
+                page_settings=PageRenderSettings.from_opts(
+                    handler_opts, default_max_pages=max_frames
+                ),
+            )
             return [({}, frame) for frame in frames[:max_frames]]
 
         data_loader = frame_loader
@@ -76,10 +228,22 @@ def run_dynamic_extraction_job(
         max_tracks: int = handler_opts.get("max_tracks", 4)
 
         def audio_loader(
+            conn: sqlite3.Connection,
             item: JobInputData,
         ) -> Sequence[Tuple[Dict[str, Any], bytes]]:
             if item.type.startswith("video") or item.type.startswith("audio"):
-                audio = load_audio_single(item.path, sr=sample_rate)
+                if handler_opts.get("chunk_seconds"):
+                    return [
+                        (segment, serialize_array(pcm_to_array(pcm)))
+                        for segment, pcm in load_audio_segments(
+                            conn, item, sample_rate, handler_opts, new_probes
+                        )
+                    ]
+                audio = load_audio_single(
+                    item.path,
+                    sr=sample_rate,
+                    probe=get_item_media_probe(conn, item, new_probes),
+                )
 
                 return [
                     ({}, serialize_array(track)) for track in audio[:max_tracks]
@@ -92,10 +256,25 @@ def run_dynamic_extraction_job(
         max_tracks: int = handler_opts.get("max_tracks", 4)
 
         def audio_file_loader(
+            conn: sqlite3.Connection,
             item: JobInputData,
         ) -> Sequence[Tuple[Dict[str, Any], bytes]]:
             if item.type.startswith("video") or item.type.startswith("audio"):
-                audio = load_audio_single(item.path, sr=sample_rate)
+                if handler_opts.get("chunk_seconds"):
+                    return [
+                        (
+                            {"type": "audio", **segment},
+                            pcm_to_audio_bytes(pcm, sample_rate),
+                        )
+                        for segment, pcm in load_audio_segments(
+                            conn, item, sample_rate, handler_opts, new_probes
+                        )
+                    ]
+                audio = load_audio_single(
+                    item.path,
+                    sr=sample_rate,
+                    probe=get_item_media_probe(conn, item, new_probes),
+                )
                 return [
                     (
                         {"type": "audio"},
@@ -110,6 +289,7 @@ def run_dynamic_extraction_job(
     elif handler_name == "extracted_text":
 
         def get_item_text(
+            conn: sqlite3.Connection,
             item: JobInputData,
         ) -> Sequence[Tuple[Dict[str, Any], None]]:
             assert item.data_id is not None, "Data ID must be present"
@@ -122,6 +302,7 @@ def run_dynamic_extraction_job(
     elif handler_name == "md5":
 
         def get_md5(
+            conn: sqlite3.Connection,
             item: JobInputData,
         ) -> Sequence[Tuple[Dict[str, Any], None]]:
             assert item.md5 is not None, "Md5 must be present"
@@ -131,10 +312,16 @@ def run_dynamic_extraction_job(
     elif handler_name == "md5_image":
 
         def get_md5_image(
+            conn: sqlite3.Connection,
             item: JobInputData,
         ) -> Sequence[Tuple[Dict[str, Any], None | bytes]]:
             assert item.md5 is not None, "Md5 must be present"
-            frames = image_loader(conn, item, slice_settings=None)
+            frames = image_loader(
+                conn,
+                item,
+                slice_settings=None,
+                page_settings=PageRenderSettings(max_pages=1),
+            )
             frame = None
             if frames:
                 frame = frames[0]
@@ -152,7 +339,13 @@ def run_dynamic_extraction_job(
             [({**data, **inference_opts}, file) for data, file in batch],
         )
 
+    on_write_commit = lambda: None
+    on_write_rollback = lambda: None
+
     if model.data_type() == "tags":
+        tag_cache = TagCache.load(conn)
+        on_write_commit = tag_cache.commit
+        on_write_rollback = tag_cache.rollback
 
         def tag_handler(
             job_id: int,
@@ -160,7 +353,14 @@ def run_dynamic_extraction_job(
             _: Sequence[Any],
             outputs: Sequence[Dict[str, Any]],
         ):
-            handle_tag_result(conn, job_id, model.setter_name(), item, outputs)
+            handle_tag_result(
+                conn,
+                job_id,
+                model.setter_name(),
+                item,
+                outputs,
+                tag_cache=tag_cache,
+            )
 
         result_handler = tag_handler
 
@@ -204,15 +404,38 @@ def run_dynamic_extraction_job(
     else:
         raise ValueError(f"Data handler not found for {model.data_type()}")
 
-    return run_extraction_job(
-        conn,
-        config,
-        model,
-        batch_size,
-        threshold,
-        data_loader,
-        batch_inference_func,
-        result_handler,  # type: ignore
-        cleanup,
-        load_callback=load_model,
+    item_result_handler = result_handler
+
+    def store_probe_with_results(
+        job_id: int,
+        item: JobInputData,
+        inputs: Sequence[Any],
+        outputs: Sequence[Any],
+    ):
+        probe = new_probes.pop(item.sha256, None)
+        item_result_handler(job_id, item, inputs, outputs)
+        # Written on the job's connection, in the same transaction
+        if probe is not None:
+            store_media_probe(conn, item.sha256, probe)
+
+    result_handler = store_probe_with_results
+
+    input_key = f"{handler_name}:{json.dumps(handler_opts, sort_keys=True)}"
+    if (
+        input_cache is not None
+        and handler_name in CACHEABLE_INPUTS
+        # Chunked audio is large, and cheap to decode again
+        and not handler_opts.get("chunk_seconds")
+    ):
+        data_loader = input_cache.cached_loader(input_key, data_loader)
+
+    return ExtractionJobFunctions(
+        input_key=input_key,
+        data_loader=data_loader,
+        batch_inference=batch_inference_func,
+        result_handler=result_handler,  # type: ignore
+        load_model=load_model,
+        cleanup=cleanup,
+        on_write_commit=on_write_commit,
+        on_write_rollback=on_write_rollback,
     )
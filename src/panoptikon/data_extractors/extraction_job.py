@@ -2,13 +2,18 @@ from __future__ import annotations
 
 import logging
 import sqlite3
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime
 from typing import (
     TYPE_CHECKING,
     Any,
     Callable,
+    Deque,
     Dict,
     Generator,
+    Iterator,
     List,
     Sequence,
     Tuple,
@@ -22,11 +27,17 @@ from panoptikon.data_extractors.types import (
     ExtractionJobStart,
     JobInputData,
 )
-from panoptikon.db import atomic_transaction
+from panoptikon.db import (
+    atomic_transaction,
+    get_database_connection,
+    get_index_db_name,
+)
 from panoptikon.db.extraction_log import (
     add_data_log,
+    count_items_missing_data_extraction,
     get_items_missing_data_extraction,
     remove_incomplete_jobs,
+    stream_items_missing_data_extraction,
     update_log,
 )
 from panoptikon.db.setters import upsert_setter
@@ -39,6 +50,11 @@ logger = logging.getLogger(__name__)
 
 R = TypeVar("R")
 I = TypeVar("I")
+T = TypeVar("T")
+
+# The inputs loaded for an item (None if loading failed),
+# and how long loading took in seconds
+LoadResult = Tuple[Sequence[Any] | None, float]
 
 
 def run_extraction_job(
@@ -47,209 +63,477 @@ def run_extraction_job(
     model_opts: models.ModelOpts,
     batch_size: int,
     threshold: float | None,
-    input_transform: Callable[[JobInputData], Sequence[I]],
+    input_transform: Callable[[sqlite3.Connection, JobInputData], Sequence[I]],
     run_batch_inference: Callable[[Sequence[I]], Sequence[R]],
     output_handler: Callable[
         [int, JobInputData, Sequence[I], Sequence[R]], None
     ],
     final_callback: Callable[[], None] = lambda: None,
     load_callback: Callable[[], None] = lambda: None,
+    on_write_commit: Callable[[], None] = lambda: None,
+    on_write_rollback: Callable[[], None] = lambda: None,
 ):
     """
     Run a job that processes items in the database
     using the given batch inference function and item extractor.
+    Unless `config.extraction_loader_threads` is 0, inputs are loaded
+    by a thread pool (each thread with its own database connection),
+    up to `config.extraction_prefetch_batches` batches ahead of inference.
+    Up to `config.extraction_inference_concurrency` batches are sent
+    to the inference server at the same time.
+    Results are written in groups of items sharing one transaction,
+    each item in its own savepoint.
+    With `config.extraction_queue_chunk_size` set, items are fetched
+    in keyset-paginated chunks instead of with a single query.
     """
     # Commit the current transaction
     conn.commit()
     with atomic_transaction(conn, logger):
         remove_incomplete_jobs(conn)
 
-    def get_remaining():
-        # Get first item to obtain the total number of items remaining
-        return (
-            next(
-                get_items_missing_data_extraction(
-                    conn,
-                    config,
-                    model_opts=model_opts,
-                ),
-                [None, -1],
-            )[1]
-            + 1
-        )
-
-    initial_remaining = get_remaining()
+    initial_remaining = count_items_missing_data_extraction(
+        conn, config, model_opts
+    )
     if initial_remaining < 1:
         logger.info(f"No items to process, aborting {model_opts.setter_name()}")
         return
 
     load_callback()
 
-    start_time = datetime.now()
-    scan_time = start_time.isoformat()
-
-    failed_items: Dict[str, JobInputData] = {}
-    processed_items, videos, images, other, total_processed_units = (
-        0,
-        0,
-        0,
-        0,
-        0,
+    job_id, start_time = start_extraction_job(
+        conn, model_opts, threshold, batch_size
+    )
+    yield ExtractionJobStart(
+        start_time,
+        initial_remaining,
+        job_id,
+    )
+    writer = ExtractionJobWriter(
+        conn,
+        config,
+        model_opts.setter_name(),
+        job_id,
+        start_time,
+        output_handler,
+        on_write_commit=on_write_commit,
+        on_write_rollback=on_write_rollback,
+    )
+
+    def handle_loaded_inputs(
+        loaded: Iterator[Tuple[JobInputData, int, LoadResult]],
+    ):
+        for item, remaining, (inputs, load_time) in loaded:
+            if inputs is None:
+                writer.add_failed(item)
+                inputs = []
+            else:
+                writer.add_load_time(load_time)
+            yield item, remaining, inputs
+
+    if config.extraction_queue_chunk_size > 0:
+        items = stream_items_missing_data_extraction(
+            conn,
+            config,
+            model_opts,
+            chunk_size=config.extraction_queue_chunk_size,
+            total_count=initial_remaining,
+        )
+    else:
+        items = get_items_missing_data_extraction(
+            conn,
+            config,
+            model_opts=model_opts,
+        )
+    loader_threads = config.extraction_loader_threads
+    if loader_threads > 0:
+        loader_pool = InputLoaderPool(conn, loader_threads)
+        loaded = prefetch_items(
+            items,
+            lambda item: loader_pool.submit(
+                lambda loader_conn: load_item_inputs(
+                    loader_conn, item, input_transform
+                )
+            ),
+            max_in_flight=max(
+                loader_threads,
+                config.extraction_prefetch_batches * batch_size,
+            ),
+        )
+    else:
+        loader_pool = None
+
+        def load_in_transaction(item: JobInputData) -> LoadResult:
+            with atomic_transaction(conn, logger):
+                return load_item_inputs(conn, item, input_transform)
+
+        loaded = (
+            (item, remaining, load_in_transaction(item))
+            for item, remaining in items
+        )
+
+    try:
+        for item, remaining, inputs, outputs in batch_items(
+            handle_loaded_inputs(loaded),
+            batch_size,
+            writer.timed_inference(run_batch_inference),
+            max_in_flight_batches=config.extraction_inference_concurrency,
+        ):
+            yield from writer.add(item, remaining, inputs, outputs)
+        yield from writer.flush()
+    finally:
+        if loader_pool is not None:
+            loader_pool.close()
+
+    report = writer.finish(
+        count_items_missing_data_extraction(conn, config, model_opts)
     )
-    data_load_time, inference_time = 0.0, 0.0
+    final_callback()
+    yield report
+
+
+def start_extraction_job(
+    conn: sqlite3.Connection,
+    model_opts: models.ModelOpts,
+    threshold: float | None,
+    batch_size: int,
+    remove_incomplete: bool = True,
+) -> Tuple[int, datetime]:
+    """
+    Add the log entry for a new extraction job.
+    Returns the job id and the start time of the job.
+    """
+    start_time = datetime.now()
     with atomic_transaction(conn, logger):
         job_id = add_data_log(
             conn,
-            scan_time,
+            start_time.isoformat(),
             threshold,
             [model_opts.data_type()],
             model_opts.setter_name(),
             batch_size,
+            remove_incomplete=remove_incomplete,
         )
         upsert_setter(
             conn,
             model_opts.setter_name(),
         )
-    yield ExtractionJobStart(
-        start_time,
-        initial_remaining,
-        job_id,
-    )
+    return job_id, start_time
 
-    def run_batch_inference_with_counter(work_units: Sequence):
-        nonlocal total_processed_units, inference_time
-        total_processed_units += len(work_units)
-        inf_start = datetime.now()
-        o = run_batch_inference(work_units)
-        inference_time += (datetime.now() - inf_start).total_seconds()
-        return o
 
-    def transform_input_handle_error(item: JobInputData):
-        try:
-            nonlocal data_load_time
-            load_start = datetime.now()
-            
-            with atomic_transaction(conn, logger):
-                o = input_transform(item)
-   
-            data_load_time += (datetime.now() - load_start).total_seconds()
-            return o
-        except Exception as e:
-            logger.error(
-                f"Error processing item {item.path}: {e}", exc_info=True
-            )
-            nonlocal failed_items
-            failed_items = add_failed_item(failed_items, item)
-            return []
+class ExtractionJobWriter:
+    """
+    Writes the results of an extraction job and keeps its log up to date.
+    Handler outputs are buffered and written in one transaction
+    every `extraction_write_batch_size` items
+    or `extraction_write_interval_ms` milliseconds,
+    each item in its own savepoint.
+    """
 
-    for item, remaining, inputs, outputs in batch_items(
-        get_items_missing_data_extraction(
-            conn,
-            config,
-            model_opts=model_opts,
-        ),
-        batch_size,
-        transform_input_handle_error,
-        run_batch_inference_with_counter,
+    def __init__(
+        self,
+        conn: sqlite3.Connection,
+        config: "SystemConfig",
+        setter_name: str,
+        job_id: int,
+        start_time: datetime,
+        output_handler: Callable[[int, JobInputData, Sequence, Sequence], None],
+        on_write_commit: Callable[[], None] = lambda: None,
+        on_write_rollback: Callable[[], None] = lambda: None,
     ):
-        processed_items += 1
-        if get_item_failed(failed_items, item):
+        self.conn = conn
+        self.setter_name = setter_name
+        self.job_id = job_id
+        self.start_time = start_time
+        self.scan_time = start_time.isoformat()
+        self.output_handler = output_handler
+        self.on_write_commit = on_write_commit
+        self.on_write_rollback = on_write_rollback
+        self.write_batch_size = max(1, config.extraction_write_batch_size)
+        self.write_interval = config.extraction_write_interval_ms / 1000
+
+        self.failed_items: Dict[str, JobInputData] = {}
+        self.processed_items = 0
+        self.images, self.videos, self.other = 0, 0, 0
+        self.total_processed_units = 0
+        self.data_load_time, self.inference_time = 0.0, 0.0
+        self.counter_lock = threading.Lock()
+        self.pending: List[
+            Tuple[JobInputData, int, int, Sequence, Sequence]
+        ] = []
+        self.last_flush = datetime.now()
+
+    def add_failed(self, item: JobInputData):
+        add_failed_item(self.failed_items, item)
+
+    def add_load_time(self, load_time: float):
+        # With loader threads, this is the sum of their load times
+        self.data_load_time += load_time
+
+    def timed_inference(
+        self, run_batch_inference: Callable[[Sequence[I]], Sequence[R]]
+    ) -> Callable[[Sequence[I]], Sequence[R]]:
+        """
+        Wrap a batch inference function to count the work units
+        it processes and the time it takes.
+        """
+
+        def run_batch_inference_with_counter(work_units: Sequence[I]):
+            inf_start = datetime.now()
+            o = run_batch_inference(work_units)
+            # With concurrent requests, this is the sum of their durations
+            with self.counter_lock:
+                self.total_processed_units += len(work_units)
+                self.inference_time += (
+                    datetime.now() - inf_start
+                ).total_seconds()
+            return o
+
+        return run_batch_inference_with_counter
+
+    def add(
+        self,
+        item: JobInputData,
+        remaining: int,
+        inputs: Sequence,
+        outputs: Sequence,
+    ) -> Generator[ExtractionJobProgress, Any, None]:
+        """
+        Buffer the outputs for an item,
+        writing the buffer once it is full or old enough.
+        """
+        self.processed_items += 1
+        if get_item_failed(self.failed_items, item):
             # Skip items that have already failed
-            continue
-
-        with atomic_transaction(conn, logger):
-            try:
-                output_handler(job_id, item, inputs, outputs)
-            except Exception as e:
-                logger.error(f"Error handling item {item.path}: {e}")
-                failed_items = add_failed_item(failed_items, item)
-                conn.rollback()
-                continue
-            if item.type.startswith("video"):
-                videos += 1
-            elif item.type.startswith("image"):
-                images += 1
-            else:
-                other += 1
-            total_items = remaining + processed_items
-            eta_str = estimate_eta(scan_time, processed_items, remaining)
+            return
+        self.pending.append(
+            (item, remaining, self.processed_items, inputs, outputs)
+        )
+        if (
+            len(self.pending) >= self.write_batch_size
+            or (datetime.now() - self.last_flush).total_seconds()
+            >= self.write_interval
+        ):
+            yield from self.flush()
+
+    def flush(self) -> Generator[ExtractionJobProgress, Any, None]:
+        """
+        Write all buffered outputs in one transaction.
+        """
+        if not self.pending:
+            return
+        conn = self.conn
+        written: List[Tuple[JobInputData, int, int]] = []
+        try:
+            with atomic_transaction(conn, logger):
+                for item, remaining, item_index, inputs, outputs in self.pending:
+                    # Each item is written in its own savepoint, so that
+                    # an item that fails to be written does not affect the others
+                    conn.execute("SAVEPOINT extraction_item")
+                    try:
+                        self.output_handler(self.job_id, item, inputs, outputs)
+                    except Exception as e:
+                        logger.error(f"Error handling item {item.path}: {e}")
+                        self.add_failed(item)
+                        conn.execute("ROLLBACK TO extraction_item")
+                        conn.execute("RELEASE extraction_item")
+                        self.on_write_rollback()
+                        continue
+                    conn.execute("RELEASE extraction_item")
+                    if item.type.startswith("video"):
+                        self.videos += 1
+                    elif item.type.startswith("image"):
+                        self.images += 1
+                    else:
+                        self.other += 1
+                    written.append((item, remaining, item_index))
+                self.update_log(self.pending[-1][1], finished=False)
+        except Exception:
+            self.on_write_rollback()
+            raise
+        self.on_write_commit()
+        self.pending.clear()
+        self.last_flush = datetime.now()
+        for item, remaining, item_index in written:
+            total_items = remaining + item_index
+            eta_str = estimate_eta(self.scan_time, item_index, remaining)
             logger.info(
-                f"{model_opts.setter_name()}: ({processed_items}/{total_items}) "
+                f"{self.setter_name}: ({item_index}/{total_items}) "
                 + f"(ETA: {eta_str}) "
                 + f"Processed ({item.type}) {item.path}"
             )
-            update_log(
-                conn,
-                job_id,
-                image_files=images,
-                video_files=videos,
-                other_files=other,
-                total_segments=total_processed_units,
-                errors=len(failed_items.keys()),
-                total_remaining=remaining,
-                data_load_time=data_load_time,
-                inference_time=inference_time,
-                finished=False,
-            )
             yield ExtractionJobProgress(
-                start_time, processed_items, total_items, eta_str, item, job_id
+                self.start_time,
+                item_index,
+                total_items,
+                eta_str,
+                item,
+                self.job_id,
             )
 
-    logger.info(
-        f"Processed {processed_items} items:"
-        + f" {images} images and {videos} videos "
-        + f"totalling {total_processed_units} frames"
-    )
-    remaining_paths = get_remaining()
-    with atomic_transaction(conn, logger):
+    def update_log(self, remaining: int, finished: bool):
         update_log(
-            conn,
-            job_id,
-            image_files=images,
-            video_files=videos,
-            other_files=other,
-            total_segments=total_processed_units,
-            errors=len(failed_items.keys()),
-            total_remaining=remaining_paths,
-            data_load_time=data_load_time,
-            inference_time=inference_time,
-            finished=True,
+            self.conn,
+            self.job_id,
+            image_files=self.images,
+            video_files=self.videos,
+            other_files=self.other,
+            total_segments=self.total_processed_units,
+            errors=len(self.failed_items.keys()),
+            total_remaining=remaining,
+            data_load_time=self.data_load_time,
+            inference_time=self.inference_time,
+            finished=finished,
         )
-        logger.info("Updated log with scan results")
 
-    failed_paths = [item.path for item in failed_items.values()]
-    final_callback()
-    yield ExtractionJobReport(
-        start_time=start_time,
-        end_time=datetime.now(),
-        images=images,
-        videos=videos,
-        other=other,
-        total=processed_items,
-        units=total_processed_units,
-        failed_paths=failed_paths,
-    )
+    def finish(self, remaining: int) -> ExtractionJobReport:
+        """
+        Mark the job as finished, after all outputs have been flushed.
+        """
+        assert not self.pending, "Outputs must be flushed before finishing"
+        logger.info(
+            f"Processed {self.processed_items} items:"
+            + f" {self.images} images and {self.videos} videos "
+            + f"totalling {self.total_processed_units} frames"
+        )
+        with atomic_transaction(self.conn, logger):
+            self.update_log(remaining, finished=True)
+            logger.info("Updated log with scan results")
 
+        return ExtractionJobReport(
+            start_time=self.start_time,
+            end_time=datetime.now(),
+            images=self.images,
+            videos=self.videos,
+            other=self.other,
+            total=self.processed_items,
+            units=self.total_processed_units,
+            failed_paths=[item.path for item in self.failed_items.values()],
+        )
 
-def batch_items(
+
+def deny_index_writes(
+    action: int,
+    arg1: str | None,
+    arg2: str | None,
+    db_name: str | None,
+    trigger: str | None,
+) -> int:
+    """
+    SQLite authorizer refusing writes to the index database (main),
+    while allowing them to the attached storage database.
+    """
+    if db_name == "main" and action in (
+        sqlite3.SQLITE_INSERT,
+        sqlite3.SQLITE_UPDATE,
+        sqlite3.SQLITE_DELETE,
+    ):
+        return sqlite3.SQLITE_DENY
+    return sqlite3.SQLITE_OK
+
+
+class InputLoaderPool:
+    """
+    Thread pool for loading item inputs.
+    Each thread gets its own autocommit connection, so loaders only hold
+    the write lock for the statements that actually write
+    (e.g. caching frames).
+    Loader connections can only write to the storage database.
+    The job keeps a read snapshot of the index database open while it
+    reads its items, and a commit to the index database from another
+    connection would make the job's next write transaction fail with
+    "database is locked". Anything a loader has to write to the index
+    database must be handed back and written by the job (see
+    `get_item_media_probe`).
+    """
+
+    def __init__(self, conn: sqlite3.Connection, threads: int):
+        self.index_db = get_index_db_name(conn)
+        self.executor = ThreadPoolExecutor(max_workers=threads)
+        self.thread_local = threading.local()
+        self.conns: List[sqlite3.Connection] = []
+
+    def get_conn(self) -> sqlite3.Connection:
+        if not hasattr(self.thread_local, "conn"):
+            # Closed by the job's thread in close()
+            thread_conn = get_database_connection(
+                write_lock=True,
+                index_db=self.index_db,
+                check_same_thread=False,
+            )
+            thread_conn.isolation_level = None
+            thread_conn.set_authorizer(deny_index_writes)
+            self.thread_local.conn = thread_conn
+            self.conns.append(thread_conn)
+        return self.thread_local.conn
+
+    def submit(self, load: Callable[[sqlite3.Connection], T]) -> Future[T]:
+        return self.executor.submit(lambda: load(self.get_conn()))
+
+    def close(self):
+        self.executor.shutdown(wait=True, cancel_futures=True)
+        for loader_conn in self.conns:
+            loader_conn.close()
+
+
+def load_item_inputs(
+    conn: sqlite3.Connection,
+    item: JobInputData,
+    input_transform: Callable[[sqlite3.Connection, JobInputData], Sequence[I]],
+) -> LoadResult:
+    """
+    Load the inputs for an item, logging any error instead of raising it.
+    """
+    load_start = datetime.now()
+    try:
+        inputs = input_transform(conn, item)
+    except Exception as e:
+        logger.error(f"Error processing item {item.path}: {e}", exc_info=True)
+        return None, 0.0
+    return inputs, (datetime.now() - load_start).total_seconds()
+
+
+def prefetch_items(
     items_generator: Generator[Tuple[JobInputData, int], Any, None],
+    submit: Callable[[JobInputData], Future[T]],
+    max_in_flight: int,
+) -> Generator[Tuple[JobInputData, int, T], Any, None]:
+    """
+    Submit up to `max_in_flight` items ahead of the one being consumed,
+    yielding their results in the original order.
+    """
+    in_flight: Deque[Tuple[JobInputData, int, Future[T]]] = deque()
+    for item, remaining in items_generator:
+        in_flight.append((item, remaining, submit(item)))
+        if len(in_flight) >= max_in_flight:
+            item, remaining, future = in_flight.popleft()
+            yield item, remaining, future.result()
+    while in_flight:
+        item, remaining, future = in_flight.popleft()
+        yield item, remaining, future.result()
+
+
+def batch_items(
+    loaded_items: Iterator[Tuple[JobInputData, int, Sequence[I]]],
     batch_size: int,
-    input_transform_func: Callable[[JobInputData], Sequence[I]],
     process_batch_func: Callable[[Sequence[I]], Sequence[R]],
+    max_in_flight_batches: int = 1,
 ):
     """
-    Process items in batches using the given
-    item extractor and batch processing functions.
+    Process items in batches using the given batch processing function.
+    `loaded_items` yields each item along with its already loaded inputs.
+    With `max_in_flight_batches` > 1, batches are processed concurrently
+    in a thread pool, and their results are yielded in submission order.
     """
-    while True:
+    Batch = Tuple[List[Tuple[JobInputData, int]], List[I], Dict[int, List[int]]]
+
+    def next_batch() -> Batch | None:
         batch: List[Tuple[JobInputData, int]] = []
         work_units: List[I] = []
         batch_index_to_work_units: dict[int, List[int]] = {}
-        for item, remaining in items_generator:
+        for item, remaining, item_wus in loaded_items:
             batch_index = len(batch)
             batch.append((item, remaining))
             batch_index_to_work_units[batch_index] = []
-            item_wus = input_transform_func(item)
             for wu in item_wus:
                 # The index of the work unit we are adding
                 wu_index = len(work_units)
@@ -260,10 +544,11 @@ def batch_items(
                 break
         if len(work_units) == 0:
             # No more work to do
-            break
-        processed_batch_items = minibatcher(
-            work_units, process_batch_func, batch_size
-        )
+            return None
+        return batch, work_units, batch_index_to_work_units
+
+    def yield_batch(batch_data: Batch, processed_batch_items: List[R]):
+        batch, work_units, batch_index_to_work_units = batch_data
         # Yield the batch and the processed items matching the work units to the batch item
         for batch_index, wu_indices in batch_index_to_work_units.items():
             item, remaining = batch[batch_index]
@@ -271,6 +556,32 @@ def batch_items(
                 processed_batch_items[i] for i in wu_indices
             ]
 
+    if max_in_flight_batches <= 1:
+        while (batch_data := next_batch()) is not None:
+            processed_batch_items = minibatcher(
+                batch_data[1], process_batch_func, batch_size
+            )
+            yield from yield_batch(batch_data, processed_batch_items)
+        return
+
+    in_flight: Deque[Tuple[Batch, Future[List[R]]]] = deque()
+    with ThreadPoolExecutor(max_workers=max_in_flight_batches) as executor:
+        try:
+            while (batch_data := next_batch()) is not None:
+                future = executor.submit(
+                    minibatcher, batch_data[1], process_batch_func, batch_size
+                )
+                in_flight.append((batch_data, future))
+                if len(in_flight) >= max_in_flight_batches:
+                    batch_data, future = in_flight.popleft()
+                    yield from yield_batch(batch_data, future.result())
+            while in_flight:
+                batch_data, future = in_flight.popleft()
+                yield from yield_batch(batch_data, future.result())
+        finally:
+            for _, future in in_flight:
+                future.cancel()
+
 
 def minibatcher(
     input_list: Sequence[I],
@@ -0,0 +1,164 @@
+import hashlib
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Sequence
+
+from panoptikon.config_type import SystemConfig
+from panoptikon.data_extractors.types import JobInputData
+
+logger = logging.getLogger(__name__)
+
+# Bump when the format of the cached inputs changes,
+# so that entries written by older versions are never read
+CACHE_VERSION = 1
+
+
+def get_input_cache_dir() -> str:
+    data_dir = os.getenv("DATA_FOLDER", "data")
+    return os.path.join(data_dir, "input_cache")
+
+
+class InputCache:
+    """
+    On-disk cache of the model-ready inputs produced by extraction loaders
+    (decoded frames, resampled audio...), so that running another model
+    with the same input spec over the same files skips decoding entirely.
+    Entries are content-addressed by the file's sha256 and the loader's
+    input key, and shared by all index databases.
+    The total size of the cache is bounded, and the least recently used
+    entries are evicted first (recency is kept in the files' mtime,
+    so it survives restarts).
+    Safe to use from several loader threads.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        # Entry paths and sizes, least recently used first
+        self.entries: OrderedDict[str, int] = OrderedDict()
+        self.total_bytes = 0
+        os.makedirs(directory, exist_ok=True)
+        self._scan()
+
+    @classmethod
+    def from_config(cls, config: SystemConfig) -> "InputCache | None":
+        if config.extraction_input_cache_mb <= 0:
+            return None
+        return cls(
+            get_input_cache_dir(),
+            config.extraction_input_cache_mb * 1024 * 1024,
+        )
+
+    def _scan(self):
+        found = []
+        for prefix in os.scandir(self.directory):
+            if not prefix.is_dir():
+                continue
+            for entry in os.scandir(prefix.path):
+                if not entry.name.endswith(".bin"):
+                    continue
+                stat = entry.stat()
+                found.append((stat.st_mtime, entry.path, stat.st_size))
+        for _, path, size in sorted(found):
+            self.entries[path] = size
+            self.total_bytes += size
+        self._evict()
+
+    def _path(self, sha256: str, input_key: str) -> str:
+        key = hashlib.sha256(
+            f"{CACHE_VERSION}:{sha256}:{input_key}".encode()
+        ).hexdigest()
+        return os.path.join(self.directory, key[:2], f"{key}.bin")
+
+    def get(self, sha256: str, input_key: str) -> Sequence[Any] | None:
+        path = self._path(sha256, input_key)
+        with self.lock:
+            if path not in self.entries:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(path)
+        try:
+            with open(path, "rb") as f:
+                inputs = pickle.load(f)
+            os.utime(path)
+        except Exception as e:
+            logger.debug(f"Failed to read cached inputs from {path}: {e}")
+            with self.lock:
+                self._remove(path)
+                self.misses += 1
+            return None
+        with self.lock:
+            self.hits += 1
+        return inputs
+
+    def put(self, sha256: str, input_key: str, inputs: Sequence[Any]):
+        data = pickle.dumps(list(inputs), protocol=pickle.HIGHEST_PROTOCOL)
+        if len(data) > self.max_bytes:
+            return
+        path = self._path(sha256, input_key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.debug(f"Failed to cache inputs to {path}: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+        with self.lock:
+            self.total_bytes -= self.entries.pop(path, 0)
+            self.entries[path] = len(data)
+            self.total_bytes += len(data)
+            self._evict()
+
+    def _remove(self, path: str):
+        self.total_bytes -= self.entries.pop(path, 0)
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def _evict(self):
+        while self.total_bytes > self.max_bytes and self.entries:
+            path = next(iter(self.entries))
+            self._remove(path)
+
+    def cached_loader(
+        self,
+        input_key: str,
+        load: Callable[[sqlite3.Connection, JobInputData], Sequence[Any]],
+    ) -> Callable[[sqlite3.Connection, JobInputData], Sequence[Any]]:
+        """
+        Wrap an extraction loader to read its inputs from the cache,
+        and to cache them on a miss.
+        """
+
+        def load_cached(
+            conn: sqlite3.Connection, item: JobInputData
+        ) -> Sequence[Any]:
+            inputs = self.get(item.sha256, input_key)
+            if inputs is None:
+                inputs = load(conn, item)
+                self.put(item.sha256, input_key, inputs)
+            return inputs
+
+        return load_cached
+
+    def log_stats(self):
+        lookups = self.hits + self.misses
+        hit_rate = self.hits / lookups if lookups else 0.0
+        logger.info(
+            f"Input cache: {self.hits} hits, {self.misses} misses "
+            + f"({hit_rate:.0%} hit rate), "
+            + f"{self.total_bytes / 1024 / 1024:.1f} MB "
+            + f"of {self.max_bytes / 1024 / 1024:.0f} MB used"
+        )
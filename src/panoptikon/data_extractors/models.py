@@ -153,6 +153,7 @@ class ModelOpts(ABC):
         lru_size: int,
         ttl_seconds: int,
         inputs: Sequence[Tuple[str | dict | None, bytes | None]],
+        no_wait: bool = False,
     ):
         raise NotImplementedError
 
@@ -267,17 +268,15 @@ class ModelGroup(ModelOpts):
             msg += f"\nDeleted {orphans_deleted} orphaned tags.\n"
         return msg
 
-    def run_extractor(
+    def job_settings(
         self,
-        conn: sqlite3.Connection,
-        config: "SystemConfig",
         batch_size: int | None = None,
         threshold: float | None = None,
-    ):
-        from panoptikon.data_extractors.dynamic_job import (
-            run_dynamic_extraction_job,
-        )
-
+    ) -> Tuple[int, float | None]:
+        """
+        Get the batch size and threshold to run a job with,
+        falling back to the model's defaults.
+        """
         if batch_size is None:
             batch_size = self.default_batch_size()
 
@@ -289,7 +288,20 @@ class ModelGroup(ModelOpts):
                 "but model does not accept thresholds."
             )
             threshold = None
+        return batch_size, threshold
+
+    def run_extractor(
+        self,
+        conn: sqlite3.Connection,
+        config: "SystemConfig",
+        batch_size: int | None = None,
+        threshold: float | None = None,
+    ):
+        from panoptikon.data_extractors.dynamic_job import (
+            run_dynamic_extraction_job,
+        )
 
+        batch_size, threshold = self.job_settings(batch_size, threshold)
         return run_dynamic_extraction_job(
             conn, config, self, batch_size=batch_size, threshold=threshold
         )
@@ -300,9 +312,15 @@ class ModelGroup(ModelOpts):
         lru_size: int,
         ttl_seconds: int,
         inputs: Sequence[Tuple[str | dict | None, bytes | None]],
+        no_wait: bool = False,
     ):
         result = get_inference_api_client().predict(
-            self.setter_name(), cache_key, lru_size, ttl_seconds, inputs
+            self.setter_name(),
+            cache_key,
+            lru_size,
+            ttl_seconds,
+            inputs,
+            no_wait=no_wait,
         )
         return result
 
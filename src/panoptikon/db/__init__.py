@@ -18,6 +18,7 @@ def get_database_connection(
     user_data_wl: bool = False,
     index_db: str | None = None,
     user_data_db: str | None = None,
+    check_same_thread: bool = True,
 ) -> sqlite3.Connection:
     db_file, user_db_file, storage_db_file = get_db_paths(
         index_db=index_db,
@@ -30,7 +31,7 @@ def get_database_connection(
         write_lock = True
         # Acquire a write lock
         logger.debug(f"Opening index database in write mode")
-        conn = sqlite3.connect(db_file)
+        conn = sqlite3.connect(db_file, check_same_thread=check_same_thread)
         logger.debug(f"Attaching storage database in write mode")
         conn.execute(f"ATTACH DATABASE '{storage_db_file}' AS storage")
         cursor = conn.cursor()
@@ -39,7 +40,11 @@ def get_database_connection(
     else:
         write_lock = False
         # Read-only connection
-        conn = sqlite3.connect(f"file:{db_file}?mode=ro", uri=True)
+        conn = sqlite3.connect(
+            f"file:{db_file}?mode=ro",
+            uri=True,
+            check_same_thread=check_same_thread,
+        )
         # Attach storage database
         conn.execute(
             f"ATTACH DATABASE 'file:{storage_db_file}?mode=ro' AS storage"
@@ -88,6 +93,17 @@ def get_db_paths(index_db: str | None = None, user_data_db: str | None = None):
     return index_db_file, user_db_file, storage_db_file
 
 
+def get_index_db_name(conn: sqlite3.Connection) -> str:
+    """
+    Get the name of the index database a connection was opened on,
+    so that other threads can open their own connection to it.
+    """
+    for _, name, file in conn.execute("PRAGMA database_list").fetchall():
+        if name == "main":
+            return os.path.basename(os.path.dirname(file))
+    raise ValueError("Connection has no main database")
+
+
 def get_db_default_names():
     index = os.getenv("INDEX_DB", "default")
     user_data = os.getenv("USER_DATA_DB", "default")
@@ -165,6 +181,27 @@ def atomic_transaction(connection: sqlite3.Connection, logger: logging.Logger):
         logger.exception("Rolling back transaction")
         raise
 
+def checkpoint_transaction(
+    connection: sqlite3.Connection,
+    logger: logging.Logger,
+    max_attempts: int = 12,
+):
+    """
+    Commit the transaction opened by `atomic_transaction` so far,
+    and immediately open a new one in its place.
+    Other writers may get the lock in between, so acquiring it again
+    is retried (each attempt waits for the connection's busy timeout).
+    """
+    connection.commit()
+    for attempt in range(1, max_attempts + 1):
+        try:
+            connection.execute('BEGIN IMMEDIATE')
+            return
+        except sqlite3.OperationalError as e:
+            if "locked" not in str(e) or attempt == max_attempts:
+                raise
+            logger.debug(f"Database locked after checkpoint, retrying ({attempt})")
+
 @contextmanager
 def ensure_close(connection: sqlite3.Connection):
     """
@@ -1,8 +1,10 @@
 import logging
 import sqlite3
-from typing import List
+from typing import List, Sequence, Tuple
 
-from panoptikon.db.utils import serialize_f32
+import numpy as np
+
+from panoptikon.db.utils import as_f32_buffer, serialize_f32
 from panoptikon.types import OutputDataType
 
 logger = logging.getLogger(__name__)
@@ -33,3 +35,34 @@ def add_embedding(
 
     assert cursor.lastrowid is not None, "Last row ID is None"
     return cursor.lastrowid
+
+
+def add_embeddings(
+    conn: sqlite3.Connection,
+    data_type: OutputDataType,
+    embeddings: Sequence[Tuple[int, np.ndarray]],
+):
+    """
+    Insert several embeddings, given as (data_id, embedding), at once.
+    The arrays are written as float32 buffers without going
+    through Python lists (see `as_f32_buffer`).
+    All embeddings must have the same number of dimensions.
+    """
+    rows = [
+        (as_f32_buffer(embedding), data_id, data_type)
+        for data_id, embedding in embeddings
+    ]
+    if len({len(embedding) for embedding, _, _ in rows}) > 1:
+        raise ValueError("Embeddings have different dimensions")
+    cursor = conn.cursor()
+    cursor.executemany(
+        """
+        INSERT INTO embeddings
+            (id, embedding)
+        SELECT item_data.id, ?
+        FROM item_data
+        WHERE item_data.id = ?
+        AND item_data.data_type = ?
+    """,
+        rows,
+    )
@@ -1,5 +1,5 @@
 import sqlite3
-from typing import List, Optional, Tuple
+from typing import List, Optional, Sequence, Tuple
 
 from panoptikon.types import ExtractedText, ExtractedTextStats
 
@@ -47,6 +47,45 @@ def add_extracted_text(
     return cursor.lastrowid
 
 
+def add_extracted_texts(
+    conn: sqlite3.Connection,
+    texts: Sequence[
+        Tuple[int, str, str | None, float | None, float | None]
+    ],
+):
+    """
+    Insert several extracted texts into the database at once.
+    Each text is given as
+    (data_id, text, language, language_confidence, confidence)
+    """
+    cursor = conn.cursor()
+    cursor.executemany(
+        """
+        INSERT INTO extracted_text
+            (id, language, language_confidence, confidence, text, text_length)
+        SELECT item_data.id, ?, ?, ?, ?, ?
+        FROM item_data
+        WHERE item_data.id = ?
+        AND item_data.data_type = 'text'
+        """,
+        [
+            (
+                language,
+                (
+                    round(float(language_confidence), 4)
+                    if language_confidence is not None
+                    else None
+                ),
+                round(float(confidence), 4) if confidence is not None else None,
+                text,
+                len(text),
+                data_id,
+            )
+            for data_id, text, language, language_confidence, confidence in texts
+        ],
+    )
+
+
 def get_extracted_text_for_item(
     conn: sqlite3.Connection,
     item_id: int,
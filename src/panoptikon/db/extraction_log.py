@@ -1,10 +1,16 @@
 import os
 import sqlite3
 from datetime import datetime
-from typing import TYPE_CHECKING, List, Tuple
+from typing import TYPE_CHECKING, Dict, Generator, List, Sequence, Tuple
 
 if TYPE_CHECKING:
     import panoptikon.data_extractors.models as models
+    from panoptikon.data_extractors.types import JobInputData
+    from panoptikon.db.pql.pql_model import (
+        AndOperator,
+        PQLQuery,
+        QueryElement,
+    )
 
 import logging
 
@@ -23,9 +29,11 @@ def add_data_log(
     types: List[str],
     setter: str,
     batch_size: int,
+    remove_incomplete: bool = True,
 ):
     # Remove any incomplete logs before starting a new one
-    remove_incomplete_jobs(conn)
+    if remove_incomplete:
+        remove_incomplete_jobs(conn)
     cursor = conn.cursor()
     cursor.execute(
         """
@@ -276,21 +284,15 @@ def add_item_data(
     return cursor.lastrowid
 
 
-def get_items_missing_data_extraction(
-    conn: sqlite3.Connection,
+def get_extraction_filter(
     config: SystemConfig,
     model_opts: "models.ModelOpts",
-):
+) -> "AndOperator":
     """
-    Get all items that should be processed by the given setter.
-    More efficient than get_items_missing_tags as it does not require
-    a join with the tags table.
-    It also avoids joining with the files table to get the path,
-    instead getting paths one by one.
+    Get the PQL filter matching the items that should be processed
+    by the given setter, including the user's job filters.
     """
-    from panoptikon.data_extractors.types import JobInputData
-    from panoptikon.db.pql.pql_model import AndOperator, PQLQuery, QueryElement
-    from panoptikon.db.pql.search import search_pql
+    from panoptikon.db.pql.pql_model import AndOperator
 
     user_filters = [
         f.pql_query
@@ -310,16 +312,24 @@ def get_items_missing_data_extraction(
 
     model_filters = model_opts.item_extraction_rules()
     model_filters.and_.extend(flattened_user_filters)
+    return model_filters
+
+
+def build_job_item_query(
+    query_filter: "QueryElement",
+    target_entities: List[str],
+) -> "PQLQuery":
+    from panoptikon.db.pql.pql_model import PQLQuery
 
     query = PQLQuery(
-        query=model_filters,
+        query=query_filter,
         page_size=0,
         check_path=False,
     )
     logger.debug(
         f"Job Item Query: {(query.query or query).model_dump(exclude_defaults=True)}"
     )
-    if model_opts.target_entities() == ["items"]:
+    if target_entities == ["items"]:
         query.entity = "file"
         query.partition_by = ["item_id"]
         query.select = [
@@ -335,7 +345,7 @@ def get_items_missing_data_extraction(
             "video_tracks",
             "subtitle_tracks",
         ]
-    elif model_opts.target_entities() == ["text"]:
+    elif target_entities == ["text"]:
         query.entity = "text"
         query.partition_by = ["data_id"]
         query.select = [
@@ -351,6 +361,19 @@ def get_items_missing_data_extraction(
         ]
     else:
         raise ValueError("Only Items and Text target entities are supported")
+    return query
+
+
+def get_job_items(
+    conn: sqlite3.Connection,
+    query: "PQLQuery",
+) -> Generator[Tuple["JobInputData", int], None, None]:
+    """
+    Run a job item query, yielding each item with a path that exists,
+    along with the number of items remaining after it.
+    """
+    from panoptikon.data_extractors.types import JobInputData
+    from panoptikon.db.pql.search import search_pql
 
     results_generator, total_count, rm, cm = search_pql(conn, query)
 
@@ -358,17 +381,242 @@ def get_items_missing_data_extraction(
     for result in results_generator:
         item = JobInputData(**result.model_dump())
         remaining_count -= 1
-        if os.path.exists(item.path):
-            yield item, remaining_count
-            continue
-        if file := get_existing_file_for_sha256(conn, item.sha256):
-            item.path = file.path
-            item.file_id = file.id
-            item.last_modified = file.last_modified
+        if resolve_item_path(conn, item):
             yield item, remaining_count
-        else:
-            # If no working path is found, skip this item
-            continue
+
+
+def resolve_item_path(conn: sqlite3.Connection, item: "JobInputData") -> bool:
+    """
+    Make sure the item's path exists, replacing it with another file
+    for the same item if it does not.
+    Returns False if no working path is found, in which case
+    the item should be skipped.
+    """
+    if os.path.exists(item.path):
+        return True
+    if file := get_existing_file_for_sha256(conn, item.sha256):
+        item.path = file.path
+        item.file_id = file.id
+        item.last_modified = file.last_modified
+        return True
+    return False
+
+
+def count_job_items(
+    conn: sqlite3.Connection,
+    query_filter: "QueryElement",
+    target_entities: List[str],
+) -> int:
+    """
+    Count the items matching a job item query, without fetching them.
+    """
+    from panoptikon.db.pql.search import search_pql
+
+    query = build_job_item_query(query_filter, target_entities)
+    query.results = False
+    _, total_count, _, _ = search_pql(conn, query)
+    return total_count
+
+
+def get_items_missing_data_extraction(
+    conn: sqlite3.Connection,
+    config: SystemConfig,
+    model_opts: "models.ModelOpts",
+):
+    """
+    Get all items that should be processed by the given setter.
+    More efficient than get_items_missing_tags as it does not require
+    a join with the tags table.
+    It also avoids joining with the files table to get the path,
+    instead getting paths one by one.
+    """
+    query = build_job_item_query(
+        get_extraction_filter(config, model_opts),
+        model_opts.target_entities(),
+    )
+    yield from get_job_items(conn, query)
+
+
+def count_items_missing_data_extraction(
+    conn: sqlite3.Connection,
+    config: SystemConfig,
+    model_opts: "models.ModelOpts",
+) -> int:
+    """
+    Get the number of items that should be processed by the given setter.
+    """
+    return count_job_items(
+        conn,
+        get_extraction_filter(config, model_opts),
+        model_opts.target_entities(),
+    )
+
+
+def stream_items_missing_data_extraction(
+    conn: sqlite3.Connection,
+    config: SystemConfig,
+    model_opts: "models.ModelOpts",
+    chunk_size: int,
+    total_count: int | None = None,
+) -> Generator[Tuple["JobInputData", int], None, None]:
+    """
+    Work queue version of get_items_missing_data_extraction.
+    Items are fetched in chunks ordered by id, each chunk starting
+    after the last id of the previous one (keyset pagination),
+    so each query is short-lived and does not hold a read snapshot
+    for the whole job, and no query needs to count the results.
+    The next chunk is fetched in a background thread, on its own
+    read-only connection, while the current one is being processed.
+    The remaining counts are estimated from `total_count`
+    (counted once if not given).
+    """
+    from concurrent.futures import Future, ThreadPoolExecutor
+
+    from panoptikon.data_extractors.types import JobInputData
+    from panoptikon.db import get_database_connection, get_index_db_name
+    from panoptikon.db.pql.filters.kvfilters import (
+        Match,
+        MatchOps,
+        MatchValue,
+    )
+    from panoptikon.db.pql.pql_model import AndOperator, OrderArgs
+    from panoptikon.db.pql.search import search_pql
+
+    target_entities = model_opts.target_entities()
+    id_column = "data_id" if target_entities == ["text"] else "item_id"
+    query_filter = get_extraction_filter(config, model_opts)
+    if total_count is None:
+        total_count = count_job_items(conn, query_filter, target_entities)
+
+    def fetch_chunk(
+        chunk_conn: sqlite3.Connection, after_id: int | None
+    ) -> List[JobInputData]:
+        chunk_filter: QueryElement = query_filter
+        if after_id is not None:
+            chunk_filter = AndOperator(
+                and_=[
+                    query_filter,
+                    Match(
+                        match=MatchOps(
+                            gt=MatchValue(**{id_column: after_id})
+                        )
+                    ),
+                ]
+            )
+        query = build_job_item_query(chunk_filter, target_entities)
+        query.count = False
+        query.page_size = chunk_size
+        query.order_by = [OrderArgs(order_by=id_column, order="asc")]
+        results_generator, _, _, _ = search_pql(chunk_conn, query)
+        return [
+            JobInputData(**result.model_dump()) for result in results_generator
+        ]
+
+    index_db = get_index_db_name(conn)
+    thread_conns: List[sqlite3.Connection] = []
+
+    def fetch_in_thread(after_id: int) -> List[JobInputData]:
+        if not thread_conns:
+            thread_conns.append(
+                get_database_connection(
+                    write_lock=False,
+                    index_db=index_db,
+                    check_same_thread=False,
+                )
+            )
+        return fetch_chunk(thread_conns[0], after_id)
+
+    executor = ThreadPoolExecutor(max_workers=1)
+    try:
+        chunk = fetch_chunk(conn, None)
+        remaining_count = total_count
+        while chunk:
+            next_chunk: Future[List[JobInputData]] | None = None
+            if len(chunk) == chunk_size:
+                next_chunk = executor.submit(
+                    fetch_in_thread, getattr(chunk[-1], id_column)
+                )
+            for item in chunk:
+                remaining_count = max(0, remaining_count - 1)
+                if resolve_item_path(conn, item):
+                    yield item, remaining_count
+            chunk = next_chunk.result() if next_chunk is not None else []
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+        for thread_conn in thread_conns:
+            thread_conn.close()
+
+
+def get_items_missing_any_data_extraction(
+    conn: sqlite3.Connection,
+    config: SystemConfig,
+    models_opts: Sequence["models.ModelOpts"],
+    chunk_size: int = 256,
+) -> Generator[Tuple["JobInputData", int, List[str]], None, None]:
+    """
+    Get all items that should be processed by at least one of the given
+    setters, which must all target items.
+    Each item is yielded with the number of items remaining after it,
+    and the names of the setters that should process it.
+    Items are read in chunks, and the setters that still need each item
+    of a chunk are found with one query per setter.
+    """
+    from panoptikon.db.pql.filters.kvfilters import (
+        Match,
+        MatchOps,
+        MatchValues,
+    )
+    from panoptikon.db.pql.pql_model import AndOperator, OrOperator
+    from panoptikon.db.pql.search import search_pql
+
+    for model_opts in models_opts:
+        if model_opts.target_entities() != ["items"]:
+            raise ValueError(
+                f"{model_opts.setter_name()} does not target items"
+            )
+    filters = {
+        model_opts.setter_name(): get_extraction_filter(config, model_opts)
+        for model_opts in models_opts
+    }
+    query = build_job_item_query(
+        OrOperator(or_=list(filters.values())), ["items"]
+    )
+
+    def get_needed_by(chunk: List[Tuple["JobInputData", int]]):
+        needed_by: Dict[str, List[str]] = {
+            item.sha256: [] for item, _ in chunk
+        }
+        for setter_name, setter_filter in filters.items():
+            chunk_query = build_job_item_query(
+                AndOperator(
+                    and_=[
+                        setter_filter,
+                        Match(
+                            match=MatchOps(
+                                in_=MatchValues(sha256=list(needed_by.keys()))
+                            )
+                        ),
+                    ]
+                ),
+                ["items"],
+            )
+            chunk_query.count = False
+            chunk_query.select = ["sha256"]
+            results_generator, _, _, _ = search_pql(conn, chunk_query)
+            for result in results_generator:
+                needed_by[result.sha256].append(setter_name)
+        for item, remaining in chunk:
+            if needed_by[item.sha256]:
+                yield item, remaining, needed_by[item.sha256]
+
+    chunk: List[Tuple[JobInputData, int]] = []
+    for item, remaining in get_job_items(conn, query):
+        chunk.append((item, remaining))
+        if len(chunk) >= chunk_size:
+            yield from get_needed_by(chunk)
+            chunk = []
+    if chunk:
+        yield from get_needed_by(chunk)
 
 
 def get_existing_setters(
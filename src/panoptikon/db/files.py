@@ -1,10 +1,11 @@
 import logging
 import os
 import sqlite3
-from typing import List, Tuple
+from typing import Dict, List, Set, Tuple
 
 from panoptikon.config_type import SystemConfig
 from panoptikon.db import get_item_id
+from panoptikon.db.media_probes import store_media_probe
 from panoptikon.types import (
     FileRecord,
     FileScanData,
@@ -23,7 +24,9 @@ def update_file_data(
     meta = data.item_metadata
 
     cursor = conn.cursor()
-    item_id = get_item_id(conn, sha256)
+    item_id = data.item_id
+    if item_id is None:
+        item_id = get_item_id(conn, sha256)
     if meta and item_id is None:
         # Insert the item into the database
         cursor.execute(
@@ -53,6 +56,8 @@ def update_file_data(
         # Get the rowid of the inserted item, if it was inserted
         item_id = cursor.lastrowid
         item_inserted = True
+        if meta.media_probe is not None:
+            store_media_probe(conn, sha256, meta.media_probe)
     else:
         assert (
             item_id is not None
@@ -62,6 +67,30 @@ def update_file_data(
                 logger.debug(f"Updated size for item {item_id} ({sha256})")
         item_inserted = False
 
+    if data.moved_from_file_id is not None:
+        # The file was moved or renamed, keep its record and update the path
+        file_update_result = cursor.execute(
+            """
+        UPDATE files
+        SET path = ?, filename = ?, scan_id = ?, available = TRUE,
+            last_modified = ?, inode = ?, device = ?,
+            sampled_hash = COALESCE(?, sampled_hash)
+        WHERE id = ?
+        """,
+            (
+                data.path,
+                os.path.basename(data.path),
+                scan_id,
+                data.last_modified,
+                data.inode,
+                data.device,
+                data.sampled_hash,
+                data.moved_from_file_id,
+            ),
+        )
+        file_updated = file_update_result.rowcount > 0
+        return item_inserted, file_updated, False, False
+
     if not data.new_file_hash:
         # Path exists and hash has not changed, update scan_id and available
         # Potentially, the last_modified time has changed, update it
@@ -70,12 +99,16 @@ def update_file_data(
         file_update_result = cursor.execute(
             """
         UPDATE files
-        SET scan_id = ?, available = TRUE, last_modified = ?
+        SET scan_id = ?, available = TRUE, last_modified = ?,
+            inode = ?, device = ?, sampled_hash = COALESCE(?, sampled_hash)
         WHERE path = ?
         """,
             (
                 scan_id,
                 data.last_modified,
+                data.inode,
+                data.device,
+                data.sampled_hash,
                 data.path,
             ),
         )
@@ -101,10 +134,21 @@ def update_file_data(
     file_insert_result = cursor.execute(
         """
     INSERT INTO files
-    (sha256, item_id, path, filename, last_modified, scan_id, available)
-    VALUES (?, ?, ?, ?, ?, ?, TRUE)
+    (sha256, item_id, path, filename, last_modified, scan_id, available,
+    inode, device, sampled_hash)
+    VALUES (?, ?, ?, ?, ?, ?, TRUE, ?, ?, ?)
     """,
-        (sha256, item_id, data.path, filename, data.last_modified, scan_id),
+        (
+            sha256,
+            item_id,
+            data.path,
+            filename,
+            data.last_modified,
+            scan_id,
+            data.inode,
+            data.device,
+            data.sampled_hash,
+        ),
     )
     file_inserted = file_insert_result.rowcount > 0
 
@@ -135,7 +179,7 @@ def add_file_scan(conn: sqlite3.Connection, scan_time: str, path: str) -> int:
 def update_file_scan(
     conn: sqlite3.Connection,
     scan_id: int,
-    end_time: str,
+    end_time: str | None,
     new_items: int,
     unchanged_files: int,
     new_files: int,
@@ -148,6 +192,7 @@ def update_file_scan(
     hashing_time: float,
     thumbgen_time: float,
     blurhash_time: float,
+    moved_files: int = 0,
 ):
     cursor = conn.cursor()
     cursor.execute(
@@ -166,7 +211,8 @@ def update_file_scan(
         metadata_time = ?,
         hashing_time = ?,
         thumbgen_time = ?,
-        blurhash_time = ?
+        blurhash_time = ?,
+        moved_files = ?
     WHERE id = ?
     """,
         (
@@ -183,6 +229,7 @@ def update_file_scan(
             round(hashing_time, 2),
             round(thumbgen_time, 2),
             round(blurhash_time, 2),
+            moved_files,
             scan_id,
         ),
     )
@@ -216,7 +263,8 @@ def get_all_file_scans(
         metadata_time,
         hashing_time,
         thumbgen_time,
-        blurhash_time
+        blurhash_time,
+        moved_files
         FROM file_scans
         ORDER BY start_time
         DESC
@@ -228,6 +276,54 @@ def get_all_file_scans(
     return [FileScanRecord(*scan_record) for scan_record in scan_records]
 
 
+def get_incomplete_file_scan(
+    conn: sqlite3.Connection, path: str
+) -> FileScanRecord | None:
+    """
+    Get the latest scan of `path` that was checkpointed but never completed
+    """
+    cursor = conn.cursor()
+    cursor.execute(
+        """
+        SELECT
+        id,
+        start_time,
+        end_time,
+        path,
+        total_available,
+        new_items,
+        unchanged_files,
+        new_files,
+        modified_files,
+        marked_unavailable,
+        errors,
+        false_changes,
+        metadata_time,
+        hashing_time,
+        thumbgen_time,
+        blurhash_time,
+        moved_files
+        FROM file_scans
+        WHERE path = ?
+        AND end_time IS NULL
+        ORDER BY id DESC
+        LIMIT 1
+        """,
+        (path,),
+    )
+    row = cursor.fetchone()
+    return FileScanRecord(*row) if row else None
+
+
+def get_paths_in_file_scan(conn: sqlite3.Connection, scan_id: int) -> Set[str]:
+    """
+    Get the paths of the files last seen by the scan `scan_id`
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT path FROM files WHERE scan_id = ?", (scan_id,))
+    return {row[0] for row in cursor}
+
+
 def mark_unavailable_files(conn: sqlite3.Connection, scan_id: int, path: str):
     """
     Mark files as unavailable if their path is a subpath of `path`
@@ -259,7 +355,16 @@ def mark_unavailable_files(conn: sqlite3.Connection, scan_id: int, path: str):
         (scan_id, path),
     )
 
-    # Count available files
+    available_files = count_available_files(conn, path)
+
+    return marked_unavailable, available_files
+
+
+def count_available_files(conn: sqlite3.Connection, path: str) -> int:
+    """
+    Count the available files whose path is a subpath of `path`
+    """
+    cursor = conn.cursor()
     result_available = cursor.execute(
         """
         SELECT COUNT(*)
@@ -269,9 +374,39 @@ def mark_unavailable_files(conn: sqlite3.Connection, scan_id: int, path: str):
     """,
         (path,),
     )
-    available_files: int = result_available.fetchone()[0]
+    return result_available.fetchone()[0]
 
-    return marked_unavailable, available_files
+
+def mark_path_unavailable(
+    conn: sqlite3.Connection, path: str, recursive: bool = False
+) -> int:
+    """
+    Mark the file at `path` as unavailable,
+    or, if `recursive`, every file whose path is a subpath of `path`.
+    Returns the number of files marked.
+    """
+    cursor = conn.cursor()
+    if recursive:
+        result = cursor.execute(
+            """
+            UPDATE files
+            SET available = FALSE
+            WHERE available = TRUE
+            AND path LIKE ? || '%'
+        """,
+            (path,),
+        )
+    else:
+        result = cursor.execute(
+            """
+            UPDATE files
+            SET available = FALSE
+            WHERE available = TRUE
+            AND path = ?
+        """,
+            (path,),
+        )
+    return result.rowcount
 
 
 def get_file_by_path(conn: sqlite3.Connection, path: str):
@@ -298,6 +433,54 @@ def get_file_by_path(conn: sqlite3.Connection, path: str):
         )
 
 
+def get_known_files_under_path(
+    conn: sqlite3.Connection, path: str
+) -> Dict[str, Tuple[int, str, str, int | None, int]]:
+    """
+    Load every file under `path` in a single sequential read.
+    Returns a mapping of
+    path -> (file_id, sha256, last_modified, size, item_id),
+    used during rescans in place of one `get_file_by_path` query per file.
+    """
+    cursor = conn.cursor()
+    cursor.execute(
+        """
+    SELECT files.path, files.id, files.sha256, files.last_modified, items.size, files.item_id
+    FROM files
+    JOIN items ON files.item_id = items.id
+    WHERE files.path LIKE ? || '%'
+    """,
+        (path,),
+    )
+    return {
+        row[0]: (row[1], row[2], row[3], row[4], row[5]) for row in cursor
+    }
+
+
+def get_move_candidates(
+    conn: sqlite3.Connection, size: int, last_modified: str
+) -> List[Tuple[int, str, str, int, int | None, int | None, str | None]]:
+    """
+    Get the files with the given size and last modified time,
+    which a new path may have been moved or renamed from.
+    Returns a list of
+    (file_id, path, sha256, item_id, inode, device, sampled_hash).
+    """
+    cursor = conn.cursor()
+    cursor.execute(
+        """
+    SELECT files.id, files.path, files.sha256, files.item_id,
+        files.inode, files.device, files.sampled_hash
+    FROM files
+    JOIN items ON files.item_id = items.id
+    WHERE files.last_modified = ?
+    AND items.size = ?
+    """,
+        (last_modified, size),
+    )
+    return cursor.fetchall()
+
+
 def get_existing_file_for_sha256(
     conn: sqlite3.Connection, sha256: str
 ) -> FileRecord | None:
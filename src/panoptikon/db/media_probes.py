@@ -0,0 +1,60 @@
+import json
+import logging
+import sqlite3
+from datetime import datetime
+from typing import Any, Dict
+
+logger = logging.getLogger(__name__)
+
+
+def get_media_probe(
+    conn: sqlite3.Connection, sha256: str
+) -> Dict[str, Any] | None:
+    """
+    Get the cached ffprobe output for an item, if any
+    """
+    cursor = conn.cursor()
+    cursor.execute(
+        """
+    SELECT probe
+    FROM media_probes
+    WHERE sha256 = ?
+    """,
+        (sha256,),
+    )
+    row = cursor.fetchone()
+    if not row:
+        return None
+    return json.loads(row[0])
+
+
+def store_media_probe(
+    conn: sqlite3.Connection, sha256: str, probe: Dict[str, Any]
+):
+    """
+    Cache the ffprobe output for an item
+    """
+    cursor = conn.cursor()
+    cursor.execute(
+        """
+    INSERT OR REPLACE INTO media_probes (sha256, probe, time_added)
+    VALUES (?, ?, ?)
+    """,
+        (sha256, json.dumps(probe), datetime.now().isoformat()),
+    )
+
+
+def delete_orphaned_media_probes(conn: sqlite3.Connection):
+    cursor = conn.cursor()
+    cursor.execute(
+        """
+        DELETE FROM media_probes
+        WHERE sha256 NOT IN (
+            SELECT sha256
+            FROM items
+        )
+        """
+    )
+    if cursor.rowcount > 0:
+        logger.info(f"Deleted {cursor.rowcount} orphaned media probes")
+    return cursor.rowcount
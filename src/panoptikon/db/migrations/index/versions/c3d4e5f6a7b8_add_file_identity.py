@@ -0,0 +1,46 @@
+"""Add inode, device and sampled_hash to files and moved_files to file_scans
+
+Revision ID: c3d4e5f6a7b8
+Revises: b2c3d4e5f6a7
+Create Date: 2024-11-04 12:00:00.000000
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "c3d4e5f6a7b8"
+down_revision = "b2c3d4e5f6a7"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # File identity on disk, used to detect moved and renamed files
+    op.add_column("files", sa.Column("inode", sa.Integer, nullable=True))
+    op.add_column("files", sa.Column("device", sa.Integer, nullable=True))
+    op.add_column(
+        "files", sa.Column("sampled_hash", sa.String, nullable=True)
+    )
+
+    # Not indexed: move candidates are looked up by last_modified
+    # (already indexed) and size, inode and device are only compared
+
+    # Add moved_files column to file_scans table
+    op.add_column(
+        "file_scans",
+        sa.Column(
+            "moved_files", sa.Integer, nullable=False, server_default="0"
+        ),
+    )
+
+
+def downgrade() -> None:
+    # Remove identity columns from files table
+    op.drop_column("files", "sampled_hash")
+    op.drop_column("files", "device")
+    op.drop_column("files", "inode")
+
+    # Remove moved_files column from file_scans table
+    op.drop_column("file_scans", "moved_files")
@@ -0,0 +1,30 @@
+"""Add media_probes table
+
+Revision ID: d4e5f6a7b8c9
+Revises: c3d4e5f6a7b8
+Create Date: 2024-11-08 12:00:00.000000
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "d4e5f6a7b8c9"
+down_revision = "c3d4e5f6a7b8"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Cache of the ffprobe output for each audio/video item
+    op.create_table(
+        "media_probes",
+        sa.Column("sha256", sa.String, primary_key=True),
+        sa.Column("probe", sa.String, nullable=False),
+        sa.Column("time_added", sa.String, nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("media_probes")
@@ -0,0 +1,30 @@
+"""Add rendered_documents table
+
+Revision ID: 8e2f4a6b1c3d
+Revises: 31adcda83d69
+Create Date: 2024-11-20 12:00:00.000000
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "8e2f4a6b1c3d"
+down_revision = "31adcda83d69"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # PDF renderings of documents that need converting before they can be
+    # rasterised (HTML), shared by thumbnail generation and data extraction
+    op.create_table(
+        "rendered_documents",
+        sa.Column("item_sha256", sa.String, primary_key=True),
+        sa.Column("document", sa.LargeBinary, nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("rendered_documents")
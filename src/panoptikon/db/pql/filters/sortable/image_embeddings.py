@@ -331,6 +331,7 @@ def get_clip_embed(
             embed_args.lru_size,
             embed_args.ttl_seconds,
             [({"text": input}, None)],
+            no_wait=True,
         )[0]
         embed = deserialize_array(embed_bytes)
         assert isinstance(embed, np.ndarray)
@@ -347,6 +348,7 @@ def get_clip_embed(
             embed_args.lru_size,
             embed_args.ttl_seconds,
             [({}, input_bytes)],
+            no_wait=True,
         )[0]
         embed = deserialize_array(embed_bytes)
         assert isinstance(embed, np.ndarray)
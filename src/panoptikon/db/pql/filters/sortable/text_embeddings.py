@@ -301,6 +301,7 @@ def get_embed(
         cache_args.lru_size,
         cache_args.ttl_seconds,
         [({"text": text, "task": "s2s"}, None)],
+        no_wait=True,
     )[0]
     deserialized_embedding = deserialize_array(embed_bytes)
     if isinstance(deserialized_embedding[0], np.ndarray):
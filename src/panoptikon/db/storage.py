@@ -2,7 +2,7 @@ import io
 import logging
 import sqlite3
 import time
-from typing import Sequence
+from typing import List, Sequence, Tuple
 
 import PIL.Image as PILImage
 
@@ -16,6 +16,33 @@ def store_thumbnails(
     process_version: int,
     thumbnails: Sequence[PILImage.Image],
 ):
+    store_encoded_thumbnails(
+        conn,
+        sha256,
+        file_mime_type,
+        process_version,
+        [
+            (
+                thumbnail.width,
+                thumbnail.height,
+                thumbnail_to_bytes(thumbnail, get_thumb_format(file_mime_type)),
+            )
+            for thumbnail in thumbnails
+        ],
+    )
+
+
+def store_encoded_thumbnails(
+    conn: sqlite3.Connection,
+    sha256: str,
+    file_mime_type: str,
+    process_version: int,
+    thumbnails: Sequence[Tuple[int, int, bytes]],
+):
+    """
+    Store thumbnails that were already encoded,
+    given as (width, height, data) tuples
+    """
     cursor = conn.cursor()
     # Delete existing thumbnails for the item if they have a lower version
     cursor.execute(
@@ -35,12 +62,12 @@ def store_thumbnails(
                 sha256,
                 idx,
                 file_mime_type,
-                thumbnail.width,
-                thumbnail.height,
+                width,
+                height,
                 process_version,
-                thumbnail_to_bytes(thumbnail, get_thumb_format(file_mime_type)),
+                data,
             )
-            for idx, thumbnail in enumerate(thumbnails)
+            for idx, (width, height, data) in enumerate(thumbnails)
         ],
     )
 
@@ -127,6 +154,68 @@ def get_thumbnail_bytes(
         return None
 
 
+def get_items_missing_previews(
+    conn: sqlite3.Connection,
+    thumbnail_version: int,
+    sha256s: Sequence[str] | None = None,
+) -> List[Tuple[str, str, bool, float | None]]:
+    """
+    Get the items that still need a thumbnail and/or a blurhash,
+    optionally only among the given items.
+    Returns a list of (sha256, mime_type, has_thumbnail, duration).
+    Images only need a thumbnail if they are very large, so they are
+    considered done once they have a blurhash.
+    Videos without a video track never get a thumbnail, and are skipped.
+    """
+    sha256_filter = ""
+    if sha256s is not None:
+        if not sha256s:
+            return []
+        sha256_filter = (
+            f"AND items.sha256 IN ({', '.join('?' * len(sha256s))})"
+        )
+    cursor = conn.cursor()
+    cursor.execute(
+        f"""
+        SELECT sha256, type, has_thumbnail, duration
+        FROM (
+            SELECT
+                items.sha256,
+                items.type,
+                items.blurhash,
+                items.duration,
+                EXISTS(
+                    SELECT 1
+                    FROM thumbnails
+                    WHERE item_sha256 = items.sha256
+                    AND idx = 0
+                    AND version >= ?
+                ) AS has_thumbnail
+            FROM items
+            WHERE (
+                items.type LIKE 'image%'
+                OR items.type LIKE 'audio%'
+                OR items.type LIKE 'application/pdf%'
+                OR items.type LIKE 'text/html%'
+                OR (
+                    items.type LIKE 'video%'
+                    AND items.video_tracks > 0
+                    AND items.duration > 0
+                )
+            )
+            {sha256_filter}
+        )
+        WHERE blurhash IS NULL
+        OR (type NOT LIKE 'image%' AND NOT has_thumbnail)
+        """,
+        (thumbnail_version, *(sha256s or [])),
+    )
+    return [
+        (sha256, mime_type, bool(has_thumbnail), duration)
+        for sha256, mime_type, has_thumbnail, duration in cursor.fetchall()
+    ]
+
+
 def delete_orphaned_thumbnails(conn: sqlite3.Connection):
     cursor = conn.cursor()
     cursor.execute(
@@ -152,6 +241,34 @@ def store_frames(
     process_version: int,
     frames: list[PILImage.Image],
 ):
+    encoded_frames = [
+        thumbnail_to_bytes(frame, get_thumb_format(file_mime_type))
+        for frame in frames
+    ]
+    store_encoded_frames(
+        conn,
+        sha256,
+        file_mime_type,
+        process_version,
+        [
+            (frame.width, frame.height, encoded_frames[idx])
+            for idx, frame in enumerate(frames)
+        ],
+    )
+    return encoded_frames
+
+
+def store_encoded_frames(
+    conn: sqlite3.Connection,
+    sha256: str,
+    file_mime_type: str,
+    process_version: int,
+    frames: Sequence[Tuple[int, int, bytes]],
+):
+    """
+    Store frames that were already encoded,
+    given as (width, height, data) tuples
+    """
     cursor = conn.cursor()
     # Delete existing frames for the item if they have a lower version
     cursor.execute(
@@ -161,10 +278,6 @@ def store_frames(
     """,
         (sha256, process_version),
     )
-    encoded_frames = [
-        thumbnail_to_bytes(frame, get_thumb_format(file_mime_type))
-        for frame in frames
-    ]
     cursor.executemany(
         """
     INSERT INTO frames (item_sha256, idx, item_mime_type, width, height, version, frame)
@@ -175,15 +288,14 @@ def store_frames(
                 sha256,
                 idx,
                 file_mime_type,
-                frame.width,
-                frame.height,
+                width,
+                height,
                 process_version,
-                encoded_frames[idx],
+                data,
             )
-            for idx, frame in enumerate(frames)
+            for idx, (width, height, data) in enumerate(frames)
         ],
     )
-    return encoded_frames
 
 
 def has_frame(
@@ -250,3 +362,50 @@ def delete_orphaned_frames(conn: sqlite3.Connection):
     if cursor.rowcount > 0:
         logger.info(f"Deleted {cursor.rowcount} orphaned frames")
     return cursor.rowcount  # Return the number of rows deleted
+
+
+def store_rendered_document(
+    conn: sqlite3.Connection, sha256: str, document: bytes
+):
+    """
+    Store the PDF rendering of a document that has to be converted
+    before it can be rasterised (e.g. HTML), so it is only converted once
+    """
+    cursor = conn.cursor()
+    cursor.execute(
+        """
+    INSERT OR REPLACE INTO rendered_documents (item_sha256, document)
+    VALUES (?, ?)
+    """,
+        (sha256, document),
+    )
+
+
+def get_rendered_document(conn: sqlite3.Connection, sha256: str) -> bytes | None:
+    cursor = conn.cursor()
+    cursor.execute(
+        """
+        SELECT document
+        FROM rendered_documents
+        WHERE item_sha256 = ?
+        """,
+        (sha256,),
+    )
+    result = cursor.fetchone()
+    return result[0] if result else None
+
+
+def delete_orphaned_rendered_documents(conn: sqlite3.Connection):
+    cursor = conn.cursor()
+    cursor.execute(
+        """
+        DELETE FROM rendered_documents
+        WHERE item_sha256 NOT IN (
+            SELECT sha256
+            FROM items
+        )
+        """
+    )
+    if cursor.rowcount > 0:
+        logger.info(f"Deleted {cursor.rowcount} orphaned rendered documents")
+    return cursor.rowcount  # Return the number of rows deleted
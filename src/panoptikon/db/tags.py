@@ -1,8 +1,11 @@
+import logging
 import sqlite3
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
 
 from panoptikon.db.tagstats import get_tag_frequency_by_ids
 
+logger = logging.getLogger(__name__)
+
 
 def upsert_tag(
     conn: sqlite3.Connection,
@@ -69,6 +72,130 @@ def add_tag_to_item(
     insert_tag_item(conn, data_id, tag_id, confidence)
 
 
+def upsert_tags(
+    conn: sqlite3.Connection,
+    tags: Sequence[Tuple[str, str]],
+) -> Dict[Tuple[str, str], int]:
+    """
+    Insert the given (namespace, name) tags if they don't exist yet,
+    and return their ids.
+    """
+    cursor = conn.cursor()
+    cursor.executemany(
+        """
+    INSERT INTO tags (namespace, name)
+    VALUES (?, ?)
+    ON CONFLICT(namespace, name) DO NOTHING
+    """,
+        tags,
+    )
+    ids: Dict[Tuple[str, str], int] = {}
+    # Two parameters per tag, kept well below SQLite's parameter limit
+    chunk_size = 400
+    for start in range(0, len(tags), chunk_size):
+        chunk = tags[start : start + chunk_size]
+        values = ", ".join(["(?, ?)"] * len(chunk))
+        cursor.execute(
+            f"""
+        SELECT namespace, name, id
+        FROM tags
+        WHERE (namespace, name) IN (VALUES {values})
+        """,
+            [value for tag in chunk for value in tag],
+        )
+        for namespace, name, tag_id in cursor.fetchall():
+            ids[(namespace, name)] = tag_id
+    return ids
+
+
+class TagCache:
+    """
+    In-memory map of (namespace, name) to tag id, so that tagging jobs
+    only go to the database for tags they have never seen.
+    Ids of tags inserted by the current transaction are kept apart
+    until `commit` is called, and forgotten on `rollback`,
+    so the cache never holds ids that were rolled back.
+    """
+
+    def __init__(self, ids: Dict[Tuple[str, str], int] | None = None):
+        self.ids: Dict[Tuple[str, str], int] = ids or {}
+        self.pending: Dict[Tuple[str, str], int] = {}
+
+    @classmethod
+    def load(cls, conn: sqlite3.Connection) -> "TagCache":
+        cursor = conn.cursor()
+        cursor.execute("SELECT namespace, name, id FROM tags")
+        cache = cls(
+            {(namespace, name): tag_id for namespace, name, tag_id in cursor}
+        )
+        logger.debug(f"Loaded {len(cache.ids)} tags into the tag cache")
+        return cache
+
+    def get_ids(
+        self,
+        conn: sqlite3.Connection,
+        tags: Iterable[Tuple[str, str]],
+    ) -> Dict[Tuple[str, str], int]:
+        """
+        Get the ids of the given (namespace, name) tags,
+        inserting the ones that don't exist yet.
+        """
+        ids: Dict[Tuple[str, str], int] = {}
+        missing: List[Tuple[str, str]] = []
+        for tag in tags:
+            tag_id = self.ids.get(tag) or self.pending.get(tag)
+            if tag_id is None:
+                missing.append(tag)
+            else:
+                ids[tag] = tag_id
+        if missing:
+            new_ids = upsert_tags(conn, missing)
+            self.pending.update(new_ids)
+            ids.update(new_ids)
+        return ids
+
+    def commit(self):
+        self.ids.update(self.pending)
+        self.pending.clear()
+
+    def rollback(self):
+        self.pending.clear()
+
+
+def add_tags_to_item(
+    conn: sqlite3.Connection,
+    data_id: int,
+    tags: Sequence[Tuple[str, str, float]],
+    tag_cache: TagCache | None = None,
+):
+    """
+    Add (namespace, name, confidence) tags to an item_data entry,
+    with a single insert for all of them.
+    """
+    if not tags:
+        return
+    keys = [(namespace, name) for namespace, name, _ in tags]
+    if tag_cache is not None:
+        tag_ids = tag_cache.get_ids(conn, keys)
+    else:
+        tag_ids = upsert_tags(conn, keys)
+    cursor = conn.cursor()
+    cursor.executemany(
+        """
+        INSERT INTO tags_items
+        (item_data_id, tag_id, confidence)
+        SELECT item_data.id, ?, ?
+        FROM item_data
+        WHERE item_data.id = ?
+        AND item_data.data_type = 'tags'
+        """,
+        [
+            (tag_ids[(namespace, name)], round(float(confidence), 4), data_id)
+            for namespace, name, confidence in tags
+        ],
+    )
+
+
 def delete_orphan_tags(conn: sqlite3.Connection):
     cursor = conn.cursor()
     cursor.execute(
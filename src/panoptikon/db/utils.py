@@ -3,6 +3,8 @@ import sqlite3
 import struct
 from typing import List
 
+import numpy as np
+
 logger = logging.getLogger(__name__)
 
 
@@ -79,3 +81,19 @@ def pretty_print_SQL(query_str: str, params: List[str | float | int]):
 def serialize_f32(vector: List[float]) -> bytes:
     """serializes a list of floats into a compact "raw bytes" format"""
     return struct.pack("%sf" % len(vector), *vector)
+
+
+def as_f32_buffer(vector: np.ndarray) -> np.ndarray:
+    """
+    Validate an embedding and return it as a contiguous little-endian
+    float32 array, in the same format as `serialize_f32`.
+    The array can be bound directly as a BLOB parameter.
+    It is only copied if it is not already in that format.
+    """
+    if vector.ndim != 1:
+        raise ValueError(f"Expected a 1D embedding, got shape {vector.shape}")
+    if vector.size == 0:
+        raise ValueError("Embedding is empty")
+    if vector.dtype.kind != "f":
+        raise ValueError(f"Expected a float embedding, got {vector.dtype}")
+    return np.ascontiguousarray(vector, dtype="<f4")
@@ -1,10 +1,19 @@
+import bisect
 import hashlib
+import heapq
 import logging
 import os
 import sqlite3
 import time
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Future,
+    ThreadPoolExecutor,
+    wait,
+)
+from dataclasses import dataclass
 from datetime import datetime, timezone
-from typing import List, Tuple
+from typing import Dict, Iterable, Iterator, List, Set, Tuple
 
 import blurhash
 import numpy as np
@@ -14,15 +23,23 @@ from panoptikon.config_type import SystemConfig
 from panoptikon.data_extractors.data_loaders.audio import (
     extract_media_info,
     get_audio_thumbnail,
+    probe_media,
 )
 from panoptikon.data_extractors.data_loaders.images import (
     generate_thumbnail,
+    get_html_document,
     get_html_image,
     get_pdf_image,
 )
 from panoptikon.data_extractors.data_loaders.video import video_to_frames
 from panoptikon.db import get_item_id, get_item_metadata
-from panoptikon.db.files import get_file_by_path, has_blurhash, set_blurhash
+from panoptikon.db.files import (
+    get_file_by_path,
+    get_known_files_under_path,
+    get_move_candidates,
+    has_blurhash,
+    set_blurhash,
+)
 from panoptikon.db.storage import (
     get_frames,
     get_thumbnail,
@@ -46,39 +63,107 @@ def get_files_by_extension(
     """
     Get all files with the given extensions in the given starting points and their entire directory trees, excluding the given excluded paths.
     """
+    for file_path, _ in walk_files_by_extension(
+        starting_points, excluded_paths, extensions
+    ):
+        yield file_path
+
+
+# Directories taking longer than this to list and stat are logged as slow
+SLOW_DIRECTORY_SECONDS = 5.0
+
+
+def walk_files_by_extension(
+    starting_points: List[str],
+    excluded_paths: List[str],
+    extensions: List[str],
+    slowest_dirs_reported: int = 10,
+) -> Iterator[Tuple[str, os.stat_result | None]]:
+    """
+    Walk the given starting points with os.scandir, yielding
+    (path, stat) for every file with one of the given extensions,
+    skipping the excluded paths.
+    The stat result comes from the directory entry, so no separate
+    os.stat() call is needed. It is None if the file could not be stat'ed.
+    The time spent listing and stat'ing each directory is measured,
+    and the slowest directories are logged once each starting point is done.
+    """
     logger.info(
         f"Scanning for files with extensions {extensions} in {starting_points} excluding {excluded_paths}"
     )
-    excluded_paths = [
-        normalize_path(excluded_path) for excluded_path in excluded_paths
-    ]
-    starting_points = [
-        normalize_path(starting_point) for starting_point in starting_points
-    ]
-
-    for starting_point in starting_points:
-        for root, dirs, files in os.walk(starting_point, followlinks=True):
-            # Normalize root path with trailing slash
-            root_with_slash = normalize_path(root)
-
-            # Filter directories: exclude if they start with any excluded path
-            dirs[:] = [
-                d
-                for d in dirs
-                if not any(
-                    # Create full path for the directory and check against excluded paths
-                    normalize_path(os.path.join(root_with_slash, d)).startswith(
-                        excluded
-                    )
-                    for excluded in excluded_paths
+    # Sorted and free of nested paths, so a bisect finds the only
+    # excluded path that can be a prefix of any given directory
+    excluded_sorted = deduplicate_paths(excluded_paths)
+    extension_set = {ext.lower() for ext in extensions}
+
+    def is_excluded(dir_path: str) -> bool:
+        i = bisect.bisect_right(excluded_sorted, dir_path)
+        return i > 0 and dir_path.startswith(excluded_sorted[i - 1])
+
+    for starting_point in [normalize_path(p) for p in starting_points]:
+        walk_start = time.perf_counter()
+        dir_count, file_count = 0, 0
+        # Min-heap of (seconds, path), keeps the slowest directories
+        slowest_dirs: List[Tuple[float, str]] = []
+        stack = [starting_point]
+        while stack:
+            dir_path = stack.pop()
+            dir_start = time.perf_counter()
+            found: List[Tuple[str, os.stat_result | None]] = []
+            try:
+                with os.scandir(dir_path) as it:
+                    for entry in it:
+                        name = entry.name
+                        try:
+                            # Follows symlinks, like os.walk(followlinks=True)
+                            is_dir = entry.is_dir()
+                        except OSError:
+                            continue
+                        if is_dir:
+                            sub_dir = dir_path + name + os.sep
+                            if not is_excluded(sub_dir):
+                                stack.append(sub_dir)
+                            continue
+                        if os.path.splitext(name)[1].lower() not in (
+                            extension_set
+                        ):
+                            continue
+                        # Skip hidden files and temporary files
+                        if name.startswith(".") or name.startswith("~"):
+                            continue
+                        try:
+                            stat = entry.stat()
+                        except OSError as e:
+                            logger.info(
+                                f"Error getting last modified time for {entry.path}: {e}"
+                            )
+                            stat = None
+                        found.append((dir_path + name, stat))
+            except OSError as e:
+                logger.warning(f"Error listing directory {dir_path}: {e}")
+                continue
+            elapsed = time.perf_counter() - dir_start
+            dir_count += 1
+            file_count += len(found)
+            if elapsed > SLOW_DIRECTORY_SECONDS:
+                logger.warning(
+                    f"Slow directory: {dir_path} took {elapsed:.2f}s to list ({len(found)} files)"
                 )
-            ]
-            for file in files:
-                if any(file.lower().endswith(ext) for ext in extensions):
-                    # Skip hidden files and temporary files
-                    if file.startswith(".") or file.startswith("~"):
-                        continue
-                    yield os.path.join(root, file)
+            if len(slowest_dirs) < slowest_dirs_reported:
+                heapq.heappush(slowest_dirs, (elapsed, dir_path))
+            elif slowest_dirs and elapsed > slowest_dirs[0][0]:
+                heapq.heapreplace(slowest_dirs, (elapsed, dir_path))
+            yield from found
+
+        slowest_str = ", ".join(
+            f"{path} ({seconds:.2f}s)"
+            for seconds, path in sorted(slowest_dirs, reverse=True)
+        )
+        logger.info(
+            f"Walked {dir_count} directories ({file_count} files) under {starting_point} "
+            + f"in {time.perf_counter() - walk_start:.2f}s. "
+            + f"Slowest directories: {slowest_str}"
+        )
 
 
 # Convert ISO string to epoch time number
@@ -96,12 +181,31 @@ def scan_files(
     include_audio=False,
     include_html=False,
     include_pdf=False,
-):
+    workers: int = 1,
+    max_in_flight: int | None = None,
+    preload_files: bool = False,
+    detect_moves: bool = False,
+    move_sampled_hash: bool = False,
+) -> Iterator[Tuple[FileScanData | None, float, float]]:
     """
     Scan files in the given starting points and their entire directory trees, excluding the given excluded paths, and including images, video, and/or audio files.
-    """
-    from panoptikon.db.pql.filters.kvfilters import MatchValue, evaluate_match
 
+    With `workers` > 1, hashing and media probing of new or modified files
+    run in a thread pool, with at most `max_in_flight` files queued at once
+    (default: 2 * workers). A file is only probed once its hash shows
+    that its contents are not yet an item. Database reads stay on the calling thread,
+    and results are yielded as soon as they are ready, so they may come out
+    of walk order. The caller remains the single writer.
+
+    With `preload_files`, the known file records under the starting points
+    are loaded into memory up front, instead of being queried one by one.
+
+    With `detect_moves`, a path without a file record is first matched
+    against known files with the same size and mtime whose path no longer
+    exists. If the inode and device (or, with `move_sampled_hash`, a hash
+    of a few sampled chunks) also match, the file is treated as moved
+    and its hash is reused instead of hashing the whole file again.
+    """
     extensions = (
         include_images * get_image_extensions()
         + include_video * get_video_extensions()
@@ -109,71 +213,228 @@ def scan_files(
         + include_html * get_html_extensions()
         + include_pdf * get_pdf_extensions()
     )
-    for file_path in get_files_by_extension(
-        starting_points=starting_points,
-        excluded_paths=excluded_paths,
-        extensions=extensions,
-    ):
-        try:
-            last_modified, file_size = get_last_modified_time_and_size(
-                file_path
+    executor: ThreadPoolExecutor | None = None
+    if workers > 1:
+        executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="scan_hasher"
+        )
+        if max_in_flight is None or max_in_flight < 1:
+            max_in_flight = 2 * workers
+        logger.info(
+            f"Hashing files with {workers} workers ({max_in_flight} in flight)"
+        )
+    in_flight: Dict[
+        Future[HashedFile],
+        Tuple[str, str, int, FileRecord | None, os.stat_result],
+    ] = {}
+    # Ids of the file records already claimed by a moved file in this scan
+    moved_file_ids: Set[int] = set()
+    known_files: Dict[str, Tuple[int, str, str, int | None, int]] | None = (
+        None
+    )
+    if preload_files:
+        known_files = {}
+        for starting_point in starting_points:
+            known_files.update(
+                get_known_files_under_path(
+                    conn, normalize_path(starting_point)
+                )
             )
-        except Exception as e:
-            logger.info(
-                f"Error getting last modified time for {file_path}: {e}"
+        logger.info(f"Preloaded {len(known_files)} known file records")
+
+    def collect(futures: Iterable[Future[HashedFile]]):
+        for future in futures:
+            file_path, last_modified, file_size, file_record, stat = (
+                in_flight.pop(future)
             )
-            yield None, 0.0, 0.0
-            continue
+            try:
+                hashed = future.result()
+                if hashed.item_metadata is None and is_new_item(
+                    conn, file_record, hashed
+                ):
+                    # Only files with new contents are probed,
+                    # back in the pool now that their hash is known
+                    assert executor is not None
+                    in_flight[
+                        executor.submit(probe_hashed_file, file_path, hashed)
+                    ] = (file_path, last_modified, file_size, file_record, stat)
+                    continue
+                yield with_file_identity(
+                    resolve_file_metadata(
+                        conn,
+                        config,
+                        file_path,
+                        last_modified,
+                        file_size,
+                        file_record,
+                        hashed,
+                    ),
+                    stat,
+                )
+            except Exception as e:
+                logger.error(f"Error extracting metadata for {file_path}: {e}")
+                yield None, 0.0, 0.0
+
+    try:
+        for file_path, stat in walk_files_by_extension(
+            starting_points=starting_points,
+            excluded_paths=excluded_paths,
+            extensions=extensions,
+        ):
+            if stat is None:
+                yield None, 0.0, 0.0
+                continue
+            last_modified, file_size = stat_to_last_modified_and_size(stat)
 
-        # Check if the value matches the filter
-        if config.filescan_filter is not None:
-            if not evaluate_match(
-                config.filescan_filter,
-                MatchValue(
-                    last_modified=last_modified,
-                    size=file_size,
-                    path=file_path,
-                    filename=os.path.basename(file_path),
-                    type=get_mime_type(file_path),
-                ),
+            # Check if the value matches the filter
+            if not matches_filescan_filter(
+                config, file_path, last_modified, file_size
             ):
-                logger.debug(
-                    f"File {file_path} does not match the filescan filter (Stage 1), skipping..."
-                )
                 yield None, 0.0, 0.0
                 continue
 
-        # Assume file is new or has changed
-        new_or_new_timestamp = True
-        # Check if the file is already in the database
-        if file_record := get_file_by_path(conn, file_path):
-            # Check if the file has been modified since the last scan
-            if last_modified == file_record.last_modified:
-                # File has not been modified
-                new_or_new_timestamp = False
+            # Assume file is new or has changed
+            new_or_new_timestamp = True
+            known_item_id = None
+            # Check if the file is already in the database
+            if known_files is not None:
+                file_record = None
+                if known := known_files.pop(file_path, None):
+                    file_id, sha256, known_last_modified, _, known_item_id = (
+                        known
+                    )
+                    file_record = FileRecord(
+                        id=file_id,
+                        sha256=sha256,
+                        path=file_path,
+                        last_modified=known_last_modified,
+                    )
+            else:
+                file_record = get_file_by_path(conn, file_path)
+            if file_record:
+                # Check if the file has been modified since the last scan
+                if last_modified == file_record.last_modified:
+                    # File has not been modified
+                    new_or_new_timestamp = False
 
-        if new_or_new_timestamp:
-            try:
-                yield extract_file_metadata(
-                    conn,
-                    config,
+            if not new_or_new_timestamp:
+                assert file_record is not None
+                inode, device = get_file_identity(stat)
+                yield FileScanData(
+                    sha256=file_record.sha256,
+                    last_modified=file_record.last_modified,
+                    path=file_record.path,
+                    new_file_timestamp=False,
+                    new_file_hash=False,
+                    item_id=known_item_id,
+                    inode=inode,
+                    device=device,
+                ), 0.0, 0.0
+                continue
+
+            if detect_moves and file_record is None:
+                try:
+                    moved = find_moved_file(
+                        conn,
+                        file_path,
+                        last_modified,
+                        file_size,
+                        stat,
+                        moved_file_ids,
+                        use_sampled_hash=move_sampled_hash,
+                    )
+                except Exception as e:
+                    logger.error(f"Error detecting move for {file_path}: {e}")
+                    moved = None
+                if moved is not None:
+                    assert moved.moved_from_file_id is not None
+                    moved_file_ids.add(moved.moved_from_file_id)
+                    yield moved, 0.0, 0.0
+                    continue
+
+            if executor is None:
+                try:
+                    yield with_file_identity(
+                        extract_file_metadata(
+                            conn,
+                            config,
+                            file_path,
+                            last_modified,
+                            file_size,
+                            file_record,
+                            sampled_hash=move_sampled_hash,
+                        ),
+                        stat,
+                    )
+                except Exception as e:
+                    logger.error(
+                        f"Error extracting metadata for {file_path}: {e}"
+                    )
+                    yield None, 0.0, 0.0
+            else:
+                assert max_in_flight is not None
+                future = executor.submit(
+                    hash_file, file_path, move_sampled_hash
+                )
+                in_flight[future] = (
                     file_path,
                     last_modified,
                     file_size,
                     file_record,
+                    stat,
                 )
-            except Exception as e:
-                logger.error(f"Error extracting metadata for {file_path}: {e}")
-                yield None, 0.0, 0.0
-        else:
-            assert file_record is not None
-            yield FileScanData(
-                sha256=file_record.sha256,
-                last_modified=file_record.last_modified,
-                path=file_record.path,
-                new_file_timestamp=False,
-                new_file_hash=False,
-            ), 0.0, 0.0
+                if len(in_flight) >= max_in_flight:
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    yield from collect(done)
+
+        # Drain the remaining work
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            yield from collect(done)
+    finally:
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+
+def matches_filescan_filter(
+    config: SystemConfig, file_path: str, last_modified: str, file_size: int
+) -> bool:
+    """
+    Check a file against the filescan filter (Stage 1),
+    using only what is known before hashing it.
+    """
+    from panoptikon.db.pql.filters.kvfilters import MatchValue, evaluate_match
+
+    if config.filescan_filter is None:
+        return True
+    if not evaluate_match(
+        config.filescan_filter,
+        MatchValue(
+            last_modified=last_modified,
+            size=file_size,
+            path=file_path,
+            filename=os.path.basename(file_path),
+            type=get_mime_type(file_path),
+        ),
+    ):
+        logger.debug(
+            f"File {file_path} does not match the filescan filter (Stage 1), skipping..."
+        )
+        return False
+    return True
+
+
+def get_scan_extensions(config: SystemConfig) -> List[str]:
+    """
+    Get the file extensions included in scans by the given config.
+    """
+    return (
+        config.scan_images * get_image_extensions()
+        + config.scan_video * get_video_extensions()
+        + config.scan_audio * get_audio_extensions()
+        + config.scan_html * get_html_extensions()
+        + config.scan_pdf * get_pdf_extensions()
+    )
 
 
 def extract_file_metadata(
@@ -183,20 +444,141 @@ def extract_file_metadata(
     last_modified: str,
     reported_size: int,
     file_record: FileRecord | None,
+    sampled_hash: bool = False,
 ) -> Tuple[FileScanData | None, float, float]:
     """
     Extract metadata from a file.
     """
-    from panoptikon.db.pql.filters.kvfilters import MatchValue, evaluate_match
+    return resolve_file_metadata(
+        conn,
+        config,
+        file_path,
+        last_modified,
+        reported_size,
+        file_record,
+        hash_file(file_path, sampled_hash=sampled_hash),
+    )
+
 
+@dataclass
+class HashedFile:
+    md5: str
+    sha256: str
+    size: int
+    hash_time: float
+    item_metadata: ItemScanMeta | None = None
+    metadata_time: float = 0.0
+    sampled_hash: str | None = None
+
+
+def hash_file(file_path: str, sampled_hash: bool = False) -> HashedFile:
+    """
+    Calculate the hashes of a file, timing the operation.
+    With `sampled_hash`, also calculate its sampled hash.
+    """
     hash_start = datetime.now()
     md5, sha256, real_size = calculate_hashes(file_path)
+    sampled = calculate_sampled_hash(file_path) if sampled_hash else None
+    hash_time_seconds = (datetime.now() - hash_start).total_seconds()
+    return HashedFile(
+        md5=md5,
+        sha256=sha256,
+        size=real_size,
+        hash_time=hash_time_seconds,
+        sampled_hash=sampled,
+    )
+
+
+def is_new_item(
+    conn: sqlite3.Connection,
+    file_record: FileRecord | None,
+    hashed: HashedFile,
+) -> bool:
+    """
+    Check whether the hashed contents of a file are not yet an item,
+    i.e. whether `resolve_file_metadata` will need its item metadata.
+    """
+    if file_record is not None and file_record.sha256 == hashed.sha256:
+        return False
+    return not get_item_id(conn, hashed.sha256)
+
+
+def probe_hashed_file(file_path: str, hashed: HashedFile) -> HashedFile:
+    """
+    Probe the media metadata of a file that was already hashed.
+    Does not touch the database, so it is safe to run in a worker thread.
+    """
+    meta_start = datetime.now()
+    hashed.item_metadata = probe_item_metadata(file_path, hashed.md5)
+    hashed.metadata_time = (datetime.now() - meta_start).total_seconds()
+    return hashed
+
+
+def probe_item_metadata(file_path: str, md5: str) -> ItemScanMeta:
+    """
+    Extract the item metadata (mime type, dimensions, duration, tracks)
+    from a file.
+    Audio and video files are probed with a single ffprobe call,
+    whose full output is kept so it can be cached with the item.
+    """
+    mime_type = get_mime_type(file_path)
+    item_meta = ItemScanMeta(
+        md5=md5,
+        mime_type=mime_type,
+    )
+    if mime_type.startswith("image"):
+        from PIL import Image
+
+        with Image.open(file_path) as img:
+            width, height = img.size
+        item_meta.width = width
+        item_meta.height = height
+    elif mime_type.startswith("video"):
+        item_meta.media_probe = probe_media(file_path)
+        media_info = extract_media_info(file_path, item_meta.media_probe)
+        if media_info.video_track:
+            item_meta.width = media_info.video_track.width
+            item_meta.height = media_info.video_track.height
+            item_meta.duration = media_info.video_track.duration
+            item_meta.audio_tracks = len(media_info.audio_tracks)
+            item_meta.video_tracks = 1
+            item_meta.subtitle_tracks = len(media_info.subtitle_tracks)
+
+    elif mime_type.startswith("audio"):
+        item_meta.media_probe = probe_media(file_path)
+        media_info = extract_media_info(file_path, item_meta.media_probe)
+        item_meta.duration = sum(
+            track.duration for track in media_info.audio_tracks
+        )
+        item_meta.audio_tracks = len(media_info.audio_tracks)
+        item_meta.video_tracks = 0
+        item_meta.subtitle_tracks = len(media_info.subtitle_tracks)
+    return item_meta
+
+
+def resolve_file_metadata(
+    conn: sqlite3.Connection,
+    config: SystemConfig,
+    file_path: str,
+    last_modified: str,
+    reported_size: int,
+    file_record: FileRecord | None,
+    hashed: HashedFile,
+) -> Tuple[FileScanData | None, float, float]:
+    """
+    Turn the hashes (and, optionally, pre-extracted item metadata) of a file
+    into a FileScanData record, checking the database for an existing item.
+    Item metadata is only extracted here if it was not already provided.
+    """
+    from panoptikon.db.pql.filters.kvfilters import MatchValue, evaluate_match
+
+    md5, sha256, real_size = hashed.md5, hashed.sha256, hashed.size
     if real_size != reported_size:
         logger.warning(
             f"Real file size ({real_size}) does not reported size reported by filesystem ({reported_size}): {file_path}"
         )
 
-    hash_time_seconds = (datetime.now() - hash_start).total_seconds()
+    hash_time_seconds = hashed.hash_time
     if file_record is not None and file_record.sha256 == sha256:
         logger.warning(
             f"File has a different timestamp "
@@ -211,9 +593,10 @@ def extract_file_metadata(
                 file_size=real_size,
                 new_file_timestamp=True,
                 new_file_hash=False,
+                sampled_hash=hashed.sampled_hash,
             ),
             hash_time_seconds,
-            0.0,
+            hashed.metadata_time,
         )
     if get_item_id(conn, sha256):
         logger.info(f"Item already exists: {file_path}")
@@ -225,44 +608,20 @@ def extract_file_metadata(
                 file_size=real_size,
                 new_file_timestamp=True,
                 new_file_hash=True,
+                sampled_hash=hashed.sampled_hash,
             ),
             hash_time_seconds,
-            0.0,
-        )
-    logger.info(f"Extracting metadata for {file_path}")
-    meta_start = datetime.now()
-    mime_type = get_mime_type(file_path)
-    item_meta = ItemScanMeta(
-        md5=md5,
-        mime_type=mime_type,
-    )
-    if mime_type.startswith("image"):
-        from PIL import Image
-
-        with Image.open(file_path) as img:
-            width, height = img.size
-        item_meta.width = width
-        item_meta.height = height
-    elif mime_type.startswith("video"):
-        media_info = extract_media_info(file_path)
-        if media_info.video_track:
-            item_meta.width = media_info.video_track.width
-            item_meta.height = media_info.video_track.height
-            item_meta.duration = media_info.video_track.duration
-            item_meta.audio_tracks = len(media_info.audio_tracks)
-            item_meta.video_tracks = 1
-            item_meta.subtitle_tracks = len(media_info.subtitle_tracks)
-
-    elif mime_type.startswith("audio"):
-        media_info = extract_media_info(file_path)
-        item_meta.duration = sum(
-            track.duration for track in media_info.audio_tracks
+            hashed.metadata_time,
         )
-        item_meta.audio_tracks = len(media_info.audio_tracks)
-        item_meta.video_tracks = 0
-        item_meta.subtitle_tracks = len(media_info.subtitle_tracks)
-
-    meta_time_seconds = (datetime.now() - meta_start).total_seconds()
+    if hashed.item_metadata is not None:
+        item_meta = hashed.item_metadata
+        meta_time_seconds = hashed.metadata_time
+    else:
+        logger.info(f"Extracting metadata for {file_path}")
+        meta_start = datetime.now()
+        item_meta = probe_item_metadata(file_path, md5)
+        meta_time_seconds = (datetime.now() - meta_start).total_seconds()
+    mime_type = item_meta.mime_type
     if config.filescan_filter is not None:
         if not evaluate_match(
             config.filescan_filter,
@@ -296,12 +655,97 @@ def extract_file_metadata(
             new_file_timestamp=True,
             new_file_hash=True,
             item_metadata=item_meta,
+            sampled_hash=hashed.sampled_hash,
         ),
         hash_time_seconds,
         meta_time_seconds,
     )
 
 
+def get_file_identity(stat: os.stat_result) -> Tuple[int | None, int | None]:
+    """
+    Get the (inode, device) pair identifying a file on disk.
+    Both are None if the filesystem does not report an inode.
+    """
+    if not stat.st_ino:
+        return None, None
+    return stat.st_ino, stat.st_dev
+
+
+def with_file_identity(
+    result: Tuple[FileScanData | None, float, float], stat: os.stat_result
+) -> Tuple[FileScanData | None, float, float]:
+    """
+    Record the identity of the file on disk on a scan result.
+    """
+    file_data = result[0]
+    if file_data is not None:
+        file_data.inode, file_data.device = get_file_identity(stat)
+    return result
+
+
+def find_moved_file(
+    conn: sqlite3.Connection,
+    file_path: str,
+    last_modified: str,
+    file_size: int,
+    stat: os.stat_result,
+    claimed_file_ids: Set[int],
+    use_sampled_hash: bool = False,
+) -> FileScanData | None:
+    """
+    Check whether a path without a file record is a known file that was
+    moved or renamed, without hashing it.
+    Candidates are the known files with the same size and last modified
+    time whose path no longer exists on disk.
+    A candidate is a match if its inode and device are the same,
+    or, with `use_sampled_hash`, if its sampled hash is the same
+    (candidates without a stored sampled hash fall back to inode and device).
+    """
+    inode, device = get_file_identity(stat)
+    sampled_hash: str | None = None
+    for (
+        file_id,
+        old_path,
+        sha256,
+        item_id,
+        known_inode,
+        known_device,
+        known_sampled_hash,
+    ) in get_move_candidates(conn, file_size, last_modified):
+        if file_id in claimed_file_ids or old_path == file_path:
+            continue
+        if os.path.exists(old_path):
+            # Still there, this is a copy and not a move
+            continue
+        if use_sampled_hash and known_sampled_hash is not None:
+            if sampled_hash is None:
+                sampled_hash = calculate_sampled_hash(file_path)
+            is_match = sampled_hash == known_sampled_hash
+        else:
+            is_match = (
+                inode is not None
+                and known_inode == inode
+                and known_device == device
+            )
+        if not is_match:
+            continue
+        logger.info(f"File moved: {old_path} -> {file_path}")
+        return FileScanData(
+            sha256=sha256,
+            last_modified=last_modified,
+            path=file_path,
+            new_file_timestamp=False,
+            new_file_hash=False,
+            item_id=item_id,
+            inode=inode,
+            device=device,
+            sampled_hash=sampled_hash,
+            moved_from_file_id=file_id,
+        )
+    return None
+
+
 def get_image_extensions():
     return [".jpg", ".jpeg", ".png", ".bmp", ".gif", ".tiff", ".webp"]
 
@@ -322,6 +766,11 @@ def get_pdf_extensions():
     return [".pdf"]
 
 
+# Large reads keep per-chunk interpreter overhead low, and let hashlib
+# release the GIL for long stretches when hashing in worker threads
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
 def calculate_hashes(file_path: str):
     """
     Calculate the MD5 and SHA-256 hashes of the file at the given path and return the file size.
@@ -332,7 +781,7 @@ def calculate_hashes(file_path: str):
 
     try:
         with open(file_path, "rb") as f:
-            for chunk in iter(lambda: f.read(4096), b""):
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
                 total_size += len(chunk)  # Accumulate the size of each chunk
                 hash_md5.update(chunk)
                 hash_sha256.update(chunk)
@@ -358,6 +807,29 @@ def calculate_hashes(file_path: str):
     raise Exception("Error calculating hashes")
 
 
+# Size and number of the chunks read for a sampled hash
+SAMPLED_HASH_CHUNK_SIZE = 64 * 1024
+SAMPLED_HASH_CHUNKS = 3
+
+
+def calculate_sampled_hash(file_path: str) -> str:
+    """
+    Calculate a SHA-256 hash of the file size and of a few chunks
+    spread evenly across the file, from the start to the end.
+    Cheap even for very large files, but only a heuristic:
+    it is never used in place of the full hash to identify content.
+    """
+    hash_sampled = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        hash_sampled.update(str(size).encode())
+        last_offset = max(0, size - SAMPLED_HASH_CHUNK_SIZE)
+        for i in range(SAMPLED_HASH_CHUNKS):
+            f.seek(last_offset * i // (SAMPLED_HASH_CHUNKS - 1))
+            hash_sampled.update(f.read(SAMPLED_HASH_CHUNK_SIZE))
+    return hash_sampled.hexdigest()
+
+
 def get_os_stat(path: str):
     """
     Get the os.stat() information for the file at the given path.
@@ -387,7 +859,13 @@ def get_last_modified_time_and_size(file_path: str):
     """
     Get the last modified time and the size of the file at the given path.
     """
-    stat = get_os_stat(file_path)
+    return stat_to_last_modified_and_size(get_os_stat(file_path))
+
+
+def stat_to_last_modified_and_size(stat: os.stat_result):
+    """
+    Get the last modified time and the size of a file from its stat result.
+    """
     size = stat.st_size
     mtime_ns = stat.st_mtime_ns
     # Avoid floating point arithmetic by using integer division
@@ -437,6 +915,12 @@ def deduplicate_paths(paths: List[str]):
     return deduplicated_paths
 
 
+# Versions of the thumbnail and frame generation processes.
+# Thumbnails with a lower version are regenerated.
+THUMBNAIL_PROCESS_VERSION = 1
+FRAME_PROCESS_VERSION = 1
+
+
 def ensure_thumbnail_exists(
     conn: sqlite3.Connection,
     sha256: str,
@@ -447,8 +931,8 @@ def ensure_thumbnail_exists(
     Ensure that a thumbnail exists for the given item.
     """
     start_time = time.time()
-    thumbnail_process_version = 1
-    frame_version = 1
+    thumbnail_process_version = THUMBNAIL_PROCESS_VERSION
+    frame_version = FRAME_PROCESS_VERSION
     if has_thumbnail(conn, sha256, thumbnail_process_version):
         return
     mime_type = get_mime_type(file_path)
@@ -472,7 +956,11 @@ def ensure_thumbnail_exists(
                     )
                     return
             logger.debug(f"Extracting video frames for {file_path}")
-            frames = video_to_frames(file_path, num_frames=4)
+            frames = video_to_frames(
+                file_path,
+                num_frames=4,
+                duration=item_meta.duration if item_meta else None,
+            )
             store_frames(
                 conn,
                 sha256=sha256,
@@ -491,7 +979,8 @@ def ensure_thumbnail_exists(
     elif mime_type.startswith("application/pdf"):
         thumbs = [get_pdf_image(file_path)]
     elif mime_type.startswith("text/html"):
-        thumbs = [get_html_image(file_path)]
+        document = get_html_document(conn, sha256, file_path)
+        thumbs = [get_html_image(file_path, document)]
     else:
         logger.debug(
             f"No thumbnail generation for type {mime_type}: {file_path}"
@@ -530,6 +1019,15 @@ def ensure_blurhash_exists(
         else:
             return None
 
+    blurhash_str = compute_blurhash(thumb, file_path)
+    set_blurhash(conn, sha256, blurhash_str)
+    return blurhash_str
+
+
+def compute_blurhash(thumb: PILImage.Image, file_path: str = "") -> str:
+    """
+    Compute the blurhash of an image (usually the item's thumbnail).
+    """
     # For the blurhash we need to resize the image to a smaller size
     largest_dim = 128
     if thumb.width > thumb.height:
@@ -548,6 +1046,4 @@ def ensure_blurhash_exists(
     logger.debug(
         f"Resized image from {thumb.width}x{thumb.height} to {blurhash_width}x{blurhash_height} (Time: {resize_time}) for {file_path}"
     )
-    blurhash_str = blurhash.encode(thumb_arr, 4, 4)
-    set_blurhash(conn, sha256, blurhash_str)
-    return blurhash_str
+    return blurhash.encode(thumb_arr, 4, 4)
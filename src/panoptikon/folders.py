@@ -7,11 +7,14 @@ from datetime import datetime
 from typing import List
 
 from panoptikon.config_type import SystemConfig
+from panoptikon.db import checkpoint_transaction
 from panoptikon.db.files import (
     add_file_scan,
     delete_files_not_allowed,
     delete_items_without_files,
     delete_unavailable_files,
+    get_incomplete_file_scan,
+    get_paths_in_file_scan,
     mark_unavailable_files,
     update_file_data,
     update_file_scan,
@@ -23,14 +26,14 @@ from panoptikon.db.folders import (
     delete_folders_not_in_list,
     get_folders_from_database,
 )
+from panoptikon.db.media_probes import delete_orphaned_media_probes
 from panoptikon.db.storage import (
     delete_orphaned_frames,
+    delete_orphaned_rendered_documents,
     delete_orphaned_thumbnails,
 )
 from panoptikon.files import (
     deduplicate_paths,
-    ensure_blurhash_exists,
-    ensure_thumbnail_exists,
     scan_files,
 )
 from panoptikon.utils import normalize_path
@@ -58,12 +61,25 @@ def execute_folder_scan(
     conn: sqlite3.Connection,
     system_config: SystemConfig,
     included_folders: None | List[str] = None,
+    checkpoints: bool = False,
 ) -> list[int]:
     """
     Execute a scan of the files in the given `included_folders`,
     or all folders marked as `included` within the db, and update the database with the results.
     Marks files that were not found in the scan but are present in the db as `unavailable`.
     Will never scan folders not marked as `included` in the database.
+
+    With `checkpoints` set, and checkpoints enabled in the config,
+    the transaction opened by the caller is committed every `scan_checkpoint_files` files and/or
+    `scan_checkpoint_seconds` seconds, along with the progress of the scan.
+    A scan that was interrupted after a checkpoint is resumed on the next run,
+    skipping the files it had already processed.
+    Files are only marked as `unavailable` once the scan completes.
+    Only set `checkpoints` if committing the caller's earlier changes
+    midway through is safe, and they are redone if the scan is interrupted.
+
+    Thumbnails and blurhashes are not generated here,
+    see `panoptikon.previews.generate_missing_previews`.
     """
     all_included_folders = get_folders_from_database(conn, included=True)
     if included_folders is None:
@@ -81,6 +97,11 @@ def execute_folder_scan(
     starting_points = deduplicate_paths(included_folders)
     scan_time = datetime.now().isoformat()
     logger.info(f"Scanning folders: {included_folders}")
+    checkpoint_files = system_config.scan_checkpoint_files
+    checkpoint_seconds = system_config.scan_checkpoint_seconds
+    checkpoints_enabled = checkpoints and (
+        checkpoint_files > 0 or checkpoint_seconds > 0
+    )
     scan_ids = []
     for folder in starting_points:
         (
@@ -90,6 +111,7 @@ def execute_folder_scan(
             modified_files,
             errors,
             false_mod_timestamps,
+            moved_files,
         ) = (
             0,
             0,
@@ -97,15 +119,62 @@ def execute_folder_scan(
             0,
             0,
             0,
+            0,
         )
-        time_hashing, time_metadata, time_thumbgen, time_blurhash = (
-            0.0,
-            0.0,
-            0.0,
-            0.0,
+        time_hashing, time_metadata = 0.0, 0.0
+        resumed_scan = (
+            get_incomplete_file_scan(conn, folder)
+            if checkpoints_enabled
+            else None
         )
-        scan_id = add_file_scan(conn, scan_time, folder)
+        if resumed_scan is not None:
+            scan_id = resumed_scan.id
+            new_items = resumed_scan.new_items
+            unchanged_files = resumed_scan.unchanged_files
+            new_files = resumed_scan.new_files
+            modified_files = resumed_scan.modified_files
+            errors = resumed_scan.errors
+            false_mod_timestamps = resumed_scan.false_changes
+            moved_files = resumed_scan.moved_files
+            time_hashing = resumed_scan.hashing_time
+            time_metadata = resumed_scan.metadata_time
+            # Files processed before the last checkpoint
+            already_scanned = get_paths_in_file_scan(conn, scan_id)
+            logger.info(
+                f"Resuming scan {scan_id} of {folder} ({len(already_scanned)} files already scanned)"
+            )
+        else:
+            scan_id = add_file_scan(conn, scan_time, folder)
+            already_scanned = set()
         scan_ids.append(scan_id)
+
+        def save_scan_progress(
+            end_time: str | None,
+            marked_unavailable: int = 0,
+            total_available: int = 0,
+        ):
+            update_file_scan(
+                conn,
+                scan_id=scan_id,
+                end_time=end_time,
+                new_items=new_items,
+                unchanged_files=unchanged_files,
+                new_files=new_files,
+                modified_files=modified_files,
+                marked_unavailable=marked_unavailable,
+                errors=errors,
+                total_available=total_available,
+                false_changes=false_mod_timestamps,
+                metadata_time=time_metadata,
+                hashing_time=time_hashing,
+                # Previews are generated in a separate stage
+                thumbgen_time=0.0,
+                blurhash_time=0.0,
+                moved_files=moved_files,
+            )
+
+        files_since_checkpoint = 0
+        last_checkpoint = time.time()
         for file_data, hash_time, metadata_time in scan_files(
             conn,
             config=system_config,
@@ -116,42 +185,41 @@ def execute_folder_scan(
             include_audio=system_config.scan_audio,
             include_html=system_config.scan_html,
             include_pdf=system_config.scan_pdf,
+            workers=system_config.scan_workers,
+            max_in_flight=system_config.scan_max_in_flight,
+            preload_files=system_config.scan_preload_files,
+            detect_moves=system_config.scan_detect_moves,
+            move_sampled_hash=system_config.scan_move_sampled_hash,
         ):
+            if checkpoints_enabled and (
+                (
+                    checkpoint_files > 0
+                    and files_since_checkpoint >= checkpoint_files
+                )
+                or (
+                    checkpoint_seconds > 0
+                    and time.time() - last_checkpoint >= checkpoint_seconds
+                )
+            ):
+                save_scan_progress(end_time=None)
+                checkpoint_transaction(conn, logger)
+                logger.debug(f"Checkpointed scan {scan_id} of {folder}")
+                files_since_checkpoint = 0
+                last_checkpoint = time.time()
+            files_since_checkpoint += 1
+
             time_hashing += hash_time
             time_metadata += metadata_time
             if file_data is None:
                 errors += 1
                 continue
-            thumbgen_start = time.time()
-            try:
-                ensure_thumbnail_exists(
-                    conn,
-                    file_data.sha256,
-                    file_data.path,
-                    file_data.item_metadata,
-                )
-            except Exception as e:
-                logger.error(
-                    f"Error generating thumbnail for {file_data.path}: {e}",
-                    exc_info=True,
-                )
-            time_thumbgen += time.time() - thumbgen_start
-            blurhash_start = time.time()
-            try:
-                blurhash = ensure_blurhash_exists(
-                    conn, file_data.sha256, file_data.path
-                )
-                if blurhash is not None:
-                    logger.debug(
-                        f"Generated blurhash for {file_data.path} in {round(time.time() - blurhash_start, 2)} seconds"
-                    )
-                    file_data.blurhash = blurhash
-            except Exception as e:
-                logger.error(
-                    f"Error generating blurhash for {file_data.path}: {e}",
-                    exc_info=True,
-                )
-            time_blurhash += time.time() - blurhash_start
+            if (
+                file_data.path in already_scanned
+                and not file_data.new_file_timestamp
+                and file_data.moved_from_file_id is None
+            ):
+                # Already processed before the scan was interrupted
+                continue
             if (
                 file_data.new_file_timestamp == True
                 and file_data.new_file_hash == False
@@ -167,7 +235,10 @@ def execute_folder_scan(
             )
             if item_inserted:
                 new_items += 1
-            if file_updated:
+            if file_updated and file_data.moved_from_file_id is not None:
+                # File was moved or renamed, its record now has the new path
+                moved_files += 1
+            elif file_updated:
                 # File was already in the database and has NOT been modified on disk
                 unchanged_files += 1
             elif file_deleted:
@@ -182,25 +253,12 @@ def execute_folder_scan(
             conn, scan_id=scan_id, path=folder
         )
         logger.info(
-            f"Scan of {folder} complete. New items: {new_items}, Unchanged files: {unchanged_files}, New files: {new_files}, Modified files: {modified_files}, Marked unavailable: {marked_unavailable}, Errors: {errors}, Total available: {total_available}"
+            f"Scan of {folder} complete. New items: {new_items}, Unchanged files: {unchanged_files}, New files: {new_files}, Modified files: {modified_files}, Moved files: {moved_files}, Marked unavailable: {marked_unavailable}, Errors: {errors}, Total available: {total_available}"
         )
-        end_time = datetime.now().isoformat()
-        update_file_scan(
-            conn,
-            scan_id=scan_id,
-            end_time=end_time,
-            new_items=new_items,
-            unchanged_files=unchanged_files,
-            new_files=new_files,
-            modified_files=modified_files,
+        save_scan_progress(
+            end_time=datetime.now().isoformat(),
             marked_unavailable=marked_unavailable,
-            errors=errors,
             total_available=total_available,
-            false_changes=false_mod_timestamps,
-            metadata_time=time_metadata,
-            hashing_time=time_hashing,
-            thumbgen_time=time_thumbgen,
-            blurhash_time=time_blurhash,
         )
 
     return scan_ids
@@ -255,6 +313,9 @@ def update_folder_lists(
         if added:
             excluded_added.append(folder)
 
+    # Not checkpointed: a checkpoint would commit the folder list changes
+    # above, so an interrupted update would neither be detected by
+    # `is_resync_needed` nor rescan the new folders on the next run
     scan_ids = execute_folder_scan(
         conn, system_config=system_config, included_folders=included_added
     )
@@ -270,6 +331,8 @@ def update_folder_lists(
     orphan_items_deleted = delete_items_without_files(conn)
     delete_orphaned_frames(conn)
     delete_orphaned_thumbnails(conn)
+    delete_orphaned_rendered_documents(conn)
+    delete_orphaned_media_probes(conn)
 
     return UpdateFoldersResult(
         included_deleted=included_deleted,
@@ -330,7 +393,11 @@ def rescan_all_folders(conn: sqlite3.Connection, system_config: SystemConfig):
     Executes the related cleanup operations.
 
     """
-    scan_ids = execute_folder_scan(conn, system_config=system_config)
+    # Nothing is written before the scan, and the cleanup after it
+    # runs again on the next rescan, so the scan can be checkpointed
+    scan_ids = execute_folder_scan(
+        conn, system_config=system_config, checkpoints=True
+    )
     if system_config.remove_unavailable_files:
         unavailable_files_deleted = delete_unavailable_files(conn)
     else:
@@ -341,6 +408,8 @@ def rescan_all_folders(conn: sqlite3.Connection, system_config: SystemConfig):
 
     delete_orphaned_frames(conn)
     delete_orphaned_thumbnails(conn)
+    delete_orphaned_rendered_documents(conn)
+    delete_orphaned_media_probes(conn)
 
     return (
         scan_ids,
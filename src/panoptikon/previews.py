@@ -0,0 +1,275 @@
+import io
+import logging
+import sqlite3
+import time
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Future,
+    ProcessPoolExecutor,
+    wait,
+)
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Sequence, Tuple
+
+from PIL import Image as PILImage
+
+from panoptikon.db import atomic_transaction
+from panoptikon.db.files import get_existing_file_for_sha256, set_blurhash
+from panoptikon.db.storage import (
+    get_frames_bytes,
+    get_items_missing_previews,
+    get_thumb_format,
+    get_thumbnail_bytes,
+    store_encoded_frames,
+    store_encoded_thumbnails,
+    store_rendered_document,
+    thumbnail_to_bytes,
+)
+from panoptikon.files import (
+    FRAME_PROCESS_VERSION,
+    THUMBNAIL_PROCESS_VERSION,
+    compute_blurhash,
+)
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PreviewTask:
+    sha256: str
+    path: str
+    mime_type: str
+    need_thumbnail: bool
+    duration: float | None = None
+    # Already stored video frames, and the already stored thumbnail
+    frames: List[bytes] = field(default_factory=list)
+    thumbnail: bytes | None = None
+
+
+@dataclass
+class PreviewResult:
+    sha256: str
+    path: str
+    mime_type: str
+    # Encoded images, as (width, height, data)
+    thumbnails: List[Tuple[int, int, bytes]] = field(default_factory=list)
+    frames: List[Tuple[int, int, bytes]] = field(default_factory=list)
+    blurhash: str | None = None
+    # PDF rendering of an HTML document, stored for data extraction
+    document: bytes | None = None
+    thumbgen_time: float = 0.0
+    blurhash_time: float = 0.0
+
+
+@dataclass
+class PreviewReport:
+    generated: int = 0
+    errors: int = 0
+    thumbgen_time: float = 0.0
+    blurhash_time: float = 0.0
+
+
+def render_previews(task: PreviewTask) -> PreviewResult:
+    """
+    Generate the thumbnails and blurhash for an item.
+    Does not touch the database, so it can run in a worker process.
+    """
+    from panoptikon.data_extractors.data_loaders.audio import (
+        get_audio_thumbnail,
+    )
+    from panoptikon.data_extractors.data_loaders.images import (
+        generate_thumbnail,
+        get_html_image,
+        get_pdf_image,
+        render_html,
+    )
+    from panoptikon.data_extractors.data_loaders.video import video_to_frames
+    from panoptikon.utils import make_video_thumbnails
+
+    result = PreviewResult(
+        sha256=task.sha256, path=task.path, mime_type=task.mime_type
+    )
+    thumb_format = get_thumb_format(task.mime_type)
+    thumbs: List[PILImage.Image] = []
+    start_time = time.time()
+    if task.need_thumbnail:
+        mime_type = task.mime_type
+        if mime_type.startswith("video"):
+            if task.frames:
+                frames = [
+                    PILImage.open(io.BytesIO(frame)) for frame in task.frames
+                ]
+            else:
+                frames = video_to_frames(
+                    task.path, num_frames=4, duration=task.duration
+                )
+                result.frames = [
+                    (
+                        frame.width,
+                        frame.height,
+                        thumbnail_to_bytes(frame, thumb_format),
+                    )
+                    for frame in frames
+                ]
+            assert len(frames) > 0, "No frames found"
+            thumbs = make_video_thumbnails(frames, task.sha256, mime_type)
+        elif mime_type.startswith("audio"):
+            thumbs = [get_audio_thumbnail(mime_type, task.path)]
+        elif mime_type.startswith("image"):
+            thumb = generate_thumbnail(task.path)
+            thumbs = [thumb] if thumb else []
+        elif mime_type.startswith("application/pdf"):
+            thumbs = [get_pdf_image(task.path)]
+        elif mime_type.startswith("text/html"):
+            result.document = render_html(task.path)
+            thumbs = [get_html_image(task.path, result.document)]
+        result.thumbnails = [
+            (
+                thumb.width,
+                thumb.height,
+                thumbnail_to_bytes(thumb, thumb_format),
+            )
+            for thumb in thumbs
+        ]
+    result.thumbgen_time = time.time() - start_time
+
+    start_time = time.time()
+    if thumbs:
+        source = thumbs[0]
+    elif task.thumbnail:
+        source = PILImage.open(io.BytesIO(task.thumbnail))
+    elif task.mime_type.startswith("image"):
+        source = PILImage.open(task.path)
+    else:
+        return result
+    result.blurhash = compute_blurhash(source.convert("RGB"), task.path)
+    result.blurhash_time = time.time() - start_time
+    return result
+
+
+def get_preview_tasks(
+    conn: sqlite3.Connection, sha256s: Sequence[str] | None = None
+) -> Iterator[PreviewTask]:
+    """
+    Yield a task for every item that is missing its thumbnail or blurhash,
+    and still has a file on disk (only among `sha256s`, if given).
+    """
+    for (
+        sha256,
+        mime_type,
+        has_thumbnail,
+        duration,
+    ) in get_items_missing_previews(
+        conn, THUMBNAIL_PROCESS_VERSION, sha256s
+    ):
+        file = get_existing_file_for_sha256(conn, sha256)
+        if file is None:
+            continue
+        task = PreviewTask(
+            sha256=sha256,
+            path=file.path,
+            mime_type=mime_type,
+            need_thumbnail=not has_thumbnail,
+            duration=duration,
+        )
+        if has_thumbnail:
+            task.thumbnail = get_thumbnail_bytes(conn, sha256, 0)
+        elif mime_type.startswith("video"):
+            task.frames = get_frames_bytes(conn, sha256)
+        yield task
+
+
+def store_previews(conn: sqlite3.Connection, results: List[PreviewResult]):
+    with atomic_transaction(conn, logger):
+        for result in results:
+            if result.frames:
+                store_encoded_frames(
+                    conn,
+                    result.sha256,
+                    result.mime_type,
+                    FRAME_PROCESS_VERSION,
+                    result.frames,
+                )
+            if result.thumbnails:
+                store_encoded_thumbnails(
+                    conn,
+                    result.sha256,
+                    result.mime_type,
+                    THUMBNAIL_PROCESS_VERSION,
+                    result.thumbnails,
+                )
+            if result.document is not None:
+                store_rendered_document(conn, result.sha256, result.document)
+            if result.blurhash is not None:
+                set_blurhash(conn, result.sha256, result.blurhash)
+
+
+def generate_missing_previews(
+    conn: sqlite3.Connection,
+    workers: int = 1,
+    write_batch_size: int = 32,
+    sha256s: Sequence[str] | None = None,
+) -> PreviewReport:
+    """
+    Generate the thumbnails and blurhashes missing from the database,
+    or only those missing for the given items.
+    With `workers` > 1, they are rendered in a process pool.
+    Results are written in batches of `write_batch_size` items,
+    each in its own transaction, so previews show up as they are generated
+    and the write lock is only held briefly.
+    """
+    report = PreviewReport()
+    pending: List[PreviewResult] = []
+
+    def add_result(result: PreviewResult):
+        pending.append(result)
+        report.generated += 1
+        report.thumbgen_time += result.thumbgen_time
+        report.blurhash_time += result.blurhash_time
+        if len(pending) >= write_batch_size:
+            store_previews(conn, pending)
+            pending.clear()
+
+    # The list of items is fetched up front, so batches can be written
+    # while the remaining tasks are still being read
+    tasks = get_preview_tasks(conn, sha256s)
+    if workers <= 1:
+        for task in tasks:
+            try:
+                add_result(render_previews(task))
+            except Exception as e:
+                logger.error(
+                    f"Error generating previews for {task.path}: {e}"
+                )
+                report.errors += 1
+    else:
+        max_in_flight = 2 * workers
+        in_flight: Dict[Future[PreviewResult], PreviewTask] = {}
+
+        def collect(futures):
+            for future in futures:
+                task = in_flight.pop(future)
+                try:
+                    add_result(future.result())
+                except Exception as e:
+                    logger.error(
+                        f"Error generating previews for {task.path}: {e}"
+                    )
+                    report.errors += 1
+
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for task in tasks:
+                in_flight[executor.submit(render_previews, task)] = task
+                if len(in_flight) >= max_in_flight:
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    collect(done)
+            while in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                collect(done)
+    if pending:
+        store_previews(conn, pending)
+    logger.info(
+        f"Generated previews for {report.generated} items ({report.errors} errors). "
+        + f"Thumbnails: {report.thumbgen_time:.2f}s, blurhashes: {report.blurhash_time:.2f}s"
+    )
+    return report
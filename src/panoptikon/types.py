@@ -1,5 +1,15 @@
 from dataclasses import dataclass, field
-from typing import TYPE_CHECKING, List, Literal, Optional, Tuple, Type, Union
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Dict,
+    List,
+    Literal,
+    Optional,
+    Tuple,
+    Type,
+    Union,
+)
 
 from pydantic import BaseModel, Field
 
@@ -19,6 +29,8 @@ class ItemScanMeta:
     audio_tracks: int | None = None
     video_tracks: int | None = None
     subtitle_tracks: int | None = None
+    # Full ffprobe output for audio/video files, cached in the database
+    media_probe: Dict[str, Any] | None = None
 
 
 @dataclass
@@ -48,6 +60,14 @@ class FileScanData:
     file_size: int | None = None
     item_metadata: ItemScanMeta | None = None
     blurhash: str | None = None
+    # Known item id (from a preloaded file record), saves a lookup
+    item_id: int | None = None
+    # Identity of the file on disk, used to detect moves and renames
+    inode: int | None = None
+    device: int | None = None
+    sampled_hash: str | None = None
+    # Id of the file record this file was moved or renamed from
+    moved_from_file_id: int | None = None
 
 
 @dataclass
@@ -84,7 +104,7 @@ class FileSearchResult:
 class FileScanRecord:
     id: int
     start_time: str
-    end_time: str
+    end_time: str | None
     path: str
     total_available: int
     new_items: int
@@ -98,6 +118,7 @@ class FileScanRecord:
     hashing_time: float
     thumbgen_time: float
     blurhash_time: float
+    moved_files: int = 0
 
 
 @dataclass
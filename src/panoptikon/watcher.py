@@ -0,0 +1,573 @@
+import ctypes
+import ctypes.util
+import errno
+import logging
+import os
+import select
+import sqlite3
+import struct
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, List, Literal, Tuple
+
+from panoptikon.config import retrieve_system_config
+from panoptikon.config_type import SystemConfig
+from panoptikon.db import atomic_transaction, get_database_connection
+from panoptikon.db.files import (
+    add_file_scan,
+    count_available_files,
+    get_file_by_path,
+    mark_path_unavailable,
+    update_file_data,
+    update_file_scan,
+)
+from panoptikon.files import (
+    deduplicate_paths,
+    extract_file_metadata,
+    find_moved_file,
+    get_file_identity,
+    get_scan_extensions,
+    matches_filescan_filter,
+    stat_to_last_modified_and_size,
+    walk_files_by_extension,
+)
+from panoptikon.previews import generate_missing_previews
+from panoptikon.types import FileScanData
+from panoptikon.utils import normalize_path
+
+logger = logging.getLogger(__name__)
+
+# inotify(7) constants
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = (
+    IN_ATTRIB
+    | IN_CLOSE_WRITE
+    | IN_MOVED_FROM
+    | IN_MOVED_TO
+    | IN_CREATE
+    | IN_DELETE
+    | IN_DELETE_SELF
+    | IN_ONLYDIR
+)
+
+EVENT_HEADER = struct.Struct("iIII")
+
+# How long to wait before retrying paths that could not be written
+# because the database was locked (for example, by a running folder scan)
+LOCKED_RETRY_SECONDS = 10.0
+
+# Maximum number of items per preview generation query
+PREVIEW_QUERY_CHUNK = 500
+
+WatchAction = Literal["update", "delete", "delete_tree"]
+
+
+class Inotify:
+    """
+    Minimal inotify wrapper using ctypes, to avoid a new dependency.
+    Only available on Linux.
+    """
+
+    def __init__(self):
+        libc_name = ctypes.util.find_library("c")
+        self.libc = ctypes.CDLL(libc_name, use_errno=True)
+        self.libc.inotify_add_watch.argtypes = [
+            ctypes.c_int,
+            ctypes.c_char_p,
+            ctypes.c_uint32,
+        ]
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+
+    def add_watch(self, path: str, mask: int) -> int:
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err), path)
+        return wd
+
+    def rm_watch(self, wd: int):
+        # Fails if the watch is already gone, which is fine
+        self.libc.inotify_rm_watch(self.fd, wd)
+
+    def read_events(self, timeout: float) -> List[Tuple[int, int, int, str]]:
+        """
+        Wait up to `timeout` seconds for events,
+        and return them as (wd, mask, cookie, name) tuples.
+        """
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            buffer = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        events = []
+        offset = 0
+        while offset < len(buffer):
+            wd, mask, cookie, length = EVENT_HEADER.unpack_from(
+                buffer, offset
+            )
+            offset += EVENT_HEADER.size
+            name = os.fsdecode(
+                buffer[offset : offset + length].rstrip(b"\0")
+            )
+            offset += length
+            events.append((wd, mask, cookie, name))
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+
+@dataclass
+class WatchStats:
+    """
+    Counters for the changes applied by the watcher to one included folder.
+    They are saved in a single file_scans row per watcher session.
+    """
+
+    scan_id: int | None = None
+    start_time: str = field(default_factory=lambda: datetime.now().isoformat())
+    new_items: int = 0
+    unchanged_files: int = 0
+    new_files: int = 0
+    modified_files: int = 0
+    moved_files: int = 0
+    marked_unavailable: int = 0
+    errors: int = 0
+    false_changes: int = 0
+    metadata_time: float = 0.0
+    hashing_time: float = 0.0
+    thumbgen_time: float = 0.0
+    blurhash_time: float = 0.0
+
+
+class FolderWatcher(threading.Thread):
+    """
+    Watches the included folders of an index database with inotify,
+    and applies the changes to the database as they happen.
+    Events are debounced and coalesced per path: a path is only processed
+    once it has seen no new events for `debounce_seconds`.
+    Periodic full rescans are still needed to catch anything missed,
+    for example changes made while the watcher was not running.
+    """
+
+    def __init__(self, index_db: str, config: SystemConfig):
+        super().__init__(name=f"folder_watcher[{index_db}]", daemon=True)
+        self.index_db = index_db
+        self.config = config
+        self.included = deduplicate_paths(config.included_folders)
+        self.excluded = deduplicate_paths(config.excluded_folders)
+        self.extensions = {ext.lower() for ext in get_scan_extensions(config)}
+        self.debounce_seconds = config.watch_debounce_seconds
+        self.stop_event = threading.Event()
+        self.inotify: Inotify | None = None
+        self.watches: Dict[int, str] = {}
+        self.pending: Dict[str, Tuple[WatchAction, float]] = {}
+        self.stats: Dict[str, WatchStats] = {}
+
+    def stop(self):
+        self.stop_event.set()
+
+    def run(self):
+        try:
+            self.inotify = Inotify()
+        except Exception as e:
+            logger.error(f"Could not start folder watcher: {e}")
+            return
+        try:
+            for folder in self.included:
+                self.watch_tree(folder)
+            logger.info(
+                f"Watching {len(self.watches)} directories under {self.included} for {self.index_db}"
+            )
+            while not self.stop_event.is_set():
+                for event in self.inotify.read_events(self.next_timeout()):
+                    self.handle_event(*event)
+                self.flush_due()
+        except Exception as e:
+            logger.error(f"Folder watcher for {self.index_db} failed: {e}")
+        finally:
+            self.inotify.close()
+            logger.info(f"Stopped folder watcher for {self.index_db}")
+
+    def next_timeout(self) -> float:
+        if not self.pending:
+            return 1.0
+        next_due = min(deadline for _, deadline in self.pending.values())
+        return min(1.0, max(0.0, next_due - time.monotonic()))
+
+    def is_excluded(self, path: str) -> bool:
+        return any(path.startswith(excluded) for excluded in self.excluded)
+
+    def is_included(self, path: str) -> bool:
+        return any(path.startswith(included) for included in self.included)
+
+    def is_watched_file(self, path: str) -> bool:
+        name = os.path.basename(path)
+        if name.startswith(".") or name.startswith("~"):
+            return False
+        if os.path.splitext(name)[1].lower() not in self.extensions:
+            return False
+        return self.is_included(path) and not self.is_excluded(path)
+
+    def watch_tree(self, dir_path: str):
+        """
+        Add watches for a directory and all its subdirectories.
+        """
+        assert self.inotify is not None
+        stack = [normalize_path(dir_path)]
+        while stack:
+            current = stack.pop()
+            if self.is_excluded(current):
+                continue
+            try:
+                wd = self.inotify.add_watch(current, WATCH_MASK)
+            except OSError as e:
+                if e.errno == errno.ENOSPC:
+                    logger.warning(
+                        f"Inotify watch limit reached, {current} is not watched. "
+                        + "Increase fs.inotify.max_user_watches to watch more directories."
+                    )
+                    return
+                logger.debug(f"Could not watch {current}: {e}")
+                continue
+            self.watches[wd] = current
+            try:
+                with os.scandir(current) as it:
+                    for entry in it:
+                        if entry.is_dir():
+                            stack.append(current + entry.name + os.sep)
+            except OSError as e:
+                logger.debug(f"Could not list {current}: {e}")
+
+    def unwatch_tree(self, dir_path: str):
+        assert self.inotify is not None
+        for wd, path in list(self.watches.items()):
+            if path.startswith(dir_path):
+                self.inotify.rm_watch(wd)
+                del self.watches[wd]
+
+    def enqueue(self, path: str, action: WatchAction, delay: float | None = None):
+        if delay is None:
+            delay = self.debounce_seconds
+        # Later events for the same path replace earlier ones
+        self.pending[path] = (action, time.monotonic() + delay)
+
+    def handle_event(self, wd: int, mask: int, cookie: int, name: str):
+        if mask & IN_Q_OVERFLOW:
+            logger.warning(
+                f"Inotify event queue overflowed for {self.index_db}, "
+                + "some changes will only be picked up by the next full rescan"
+            )
+            return
+        if mask & IN_IGNORED:
+            self.watches.pop(wd, None)
+            return
+        dir_path = self.watches.get(wd)
+        if dir_path is None or not name:
+            return
+        path = dir_path + name
+        if mask & IN_ISDIR:
+            dir_path = path + os.sep
+            if self.is_excluded(dir_path):
+                return
+            if mask & (IN_CREATE | IN_MOVED_TO):
+                # Watch the new directory and pick up any files it already has
+                self.watch_tree(dir_path)
+                for file_path, _ in walk_files_by_extension(
+                    [dir_path], self.excluded, list(self.extensions)
+                ):
+                    self.enqueue(file_path, "update")
+            elif mask & (IN_DELETE | IN_MOVED_FROM):
+                self.unwatch_tree(dir_path)
+                self.enqueue(dir_path, "delete_tree")
+            return
+        if not self.is_watched_file(path):
+            return
+        if mask & (IN_DELETE | IN_MOVED_FROM):
+            self.enqueue(path, "delete")
+        elif mask & IN_CREATE:
+            # The file is still being written, and writes don't push back
+            # the debounce deadline. It is picked up by IN_CLOSE_WRITE
+            # once complete (or IN_MOVED_TO, if moved into place)
+            return
+        else:
+            self.enqueue(path, "update")
+
+    def flush_due(self):
+        now = time.monotonic()
+        due = [
+            (path, action)
+            for path, (action, deadline) in self.pending.items()
+            if deadline <= now
+        ]
+        if not due:
+            return
+        for path, _ in due:
+            del self.pending[path]
+        # Apply deletions first, so moved files can find their old records
+        due.sort(key=lambda item: item[1] == "update")
+        conn = get_database_connection(
+            write_lock=True, index_db=self.index_db
+        )
+        # Items indexed by this batch, per included folder
+        indexed: Dict[str, List[str]] = {}
+        try:
+            for path, action in due:
+                try:
+                    sha256 = self.apply(conn, path, action)
+                    if sha256 is not None:
+                        indexed.setdefault(self.get_folder(path), []).append(
+                            sha256
+                        )
+                except sqlite3.OperationalError as e:
+                    if "locked" not in str(e):
+                        raise
+                    logger.debug(f"Database locked, retrying {path} later")
+                    if path not in self.pending:
+                        self.enqueue(path, action, delay=LOCKED_RETRY_SECONDS)
+                except Exception as e:
+                    logger.error(f"Error applying change to {path}: {e}")
+                    if stats := self.stats.get(self.get_folder(path)):
+                        stats.errors += 1
+            # Previews are rendered after the changes are committed,
+            # so the write lock is only held to store them
+            for folder, sha256s in indexed.items():
+                self.generate_previews(conn, folder, sha256s)
+            self.save_stats(conn)
+        except sqlite3.OperationalError as e:
+            logger.debug(f"Database locked, could not save watcher stats: {e}")
+        finally:
+            conn.close()
+
+    def generate_previews(
+        self, conn: sqlite3.Connection, folder: str, sha256s: List[str]
+    ):
+        """
+        Generate the thumbnails and blurhashes missing for the given items.
+        Anything that fails here is picked up by the preview generation
+        that follows the next folder scan.
+        """
+        stats = self.stats[folder]
+        unique = list(dict.fromkeys(sha256s))
+        for start in range(0, len(unique), PREVIEW_QUERY_CHUNK):
+            try:
+                report = generate_missing_previews(
+                    conn,
+                    write_batch_size=self.config.thumbnail_write_batch_size,
+                    sha256s=unique[start : start + PREVIEW_QUERY_CHUNK],
+                )
+            except Exception as e:
+                logger.error(f"Watcher: error generating previews: {e}")
+                continue
+            stats.thumbgen_time += report.thumbgen_time
+            stats.blurhash_time += report.blurhash_time
+
+    def get_folder(self, path: str) -> str:
+        return next(
+            included for included in self.included if path.startswith(included)
+        )
+
+    def get_stats(self, conn: sqlite3.Connection, path: str) -> WatchStats:
+        """
+        Get the stats for the included folder containing `path`,
+        adding its file_scans row on first use.
+        """
+        folder = self.get_folder(path)
+        stats = self.stats.setdefault(folder, WatchStats())
+        if stats.scan_id is None:
+            with atomic_transaction(conn, logger):
+                scan_id = add_file_scan(conn, stats.start_time, folder)
+                # Set the end time right away, so that the row is never
+                # mistaken for an interrupted scan to resume
+                self.save_folder_stats(conn, folder, stats, scan_id)
+            stats.scan_id = scan_id
+        return stats
+
+    def apply(
+        self, conn: sqlite3.Connection, path: str, action: WatchAction
+    ) -> str | None:
+        """
+        Apply a change to the database.
+        Returns the sha256 of the file's item if it was indexed.
+        """
+        if action == "delete_tree":
+            stats = self.get_stats(conn, path)
+            with atomic_transaction(conn, logger):
+                marked = mark_path_unavailable(conn, path, recursive=True)
+                stats.marked_unavailable += marked
+            logger.info(f"Watcher: {path} removed ({marked} files)")
+            return None
+
+        stat = None
+        if action == "update":
+            try:
+                stat = os.stat(path)
+            except OSError:
+                # Gone again before we got to it
+                pass
+        if stat is None:
+            stats = self.get_stats(conn, path)
+            with atomic_transaction(conn, logger):
+                stats.marked_unavailable += mark_path_unavailable(conn, path)
+            logger.debug(f"Watcher: {path} removed")
+            return None
+
+        last_modified, file_size = stat_to_last_modified_and_size(stat)
+        if not matches_filescan_filter(
+            self.config, path, last_modified, file_size
+        ):
+            return None
+
+        # Hash outside of the transaction, so the write lock is not held
+        hash_time, metadata_time = 0.0, 0.0
+        file_data: FileScanData | None = None
+        file_record = get_file_by_path(conn, path)
+        if file_record is not None:
+            if file_record.last_modified == last_modified:
+                file_data = FileScanData(
+                    sha256=file_record.sha256,
+                    last_modified=last_modified,
+                    path=path,
+                    new_file_timestamp=False,
+                    new_file_hash=False,
+                )
+        elif self.config.scan_detect_moves:
+            file_data = find_moved_file(
+                conn,
+                path,
+                last_modified,
+                file_size,
+                stat,
+                set(),
+                use_sampled_hash=self.config.scan_move_sampled_hash,
+            )
+        if file_data is None:
+            file_data, hash_time, metadata_time = extract_file_metadata(
+                conn,
+                self.config,
+                path,
+                last_modified,
+                file_size,
+                file_record,
+                sampled_hash=self.config.scan_move_sampled_hash,
+            )
+            if file_data is None:
+                # Does not match the filescan filter
+                return None
+        if file_data.moved_from_file_id is None:
+            file_data.inode, file_data.device = get_file_identity(stat)
+
+        stats = self.get_stats(conn, path)
+        with atomic_transaction(conn, logger):
+            stats.hashing_time += hash_time
+            stats.metadata_time += metadata_time
+            if file_data.new_file_timestamp and not file_data.new_file_hash:
+                stats.false_changes += 1
+            item_inserted, file_updated, file_deleted, file_inserted = (
+                update_file_data(
+                    conn,
+                    time_added=datetime.now().isoformat(),
+                    scan_id=stats.scan_id,
+                    data=file_data,
+                )
+            )
+        if item_inserted:
+            stats.new_items += 1
+        if file_updated and file_data.moved_from_file_id is not None:
+            stats.moved_files += 1
+        elif file_updated:
+            stats.unchanged_files += 1
+        elif file_deleted:
+            stats.modified_files += 1
+        elif file_inserted:
+            stats.new_files += 1
+        logger.info(f"Watcher: indexed {path}")
+        return file_data.sha256
+
+    def save_stats(self, conn: sqlite3.Connection):
+        with atomic_transaction(conn, logger):
+            for folder, stats in self.stats.items():
+                if stats.scan_id is None:
+                    continue
+                self.save_folder_stats(conn, folder, stats, stats.scan_id)
+
+    def save_folder_stats(
+        self,
+        conn: sqlite3.Connection,
+        folder: str,
+        stats: WatchStats,
+        scan_id: int,
+    ):
+        update_file_scan(
+            conn,
+            scan_id=scan_id,
+            end_time=datetime.now().isoformat(),
+            new_items=stats.new_items,
+            unchanged_files=stats.unchanged_files,
+            new_files=stats.new_files,
+            modified_files=stats.modified_files,
+            marked_unavailable=stats.marked_unavailable,
+            errors=stats.errors,
+            total_available=count_available_files(conn, folder),
+            false_changes=stats.false_changes,
+            metadata_time=stats.metadata_time,
+            hashing_time=stats.hashing_time,
+            thumbgen_time=stats.thumbgen_time,
+            blurhash_time=stats.blurhash_time,
+            moved_files=stats.moved_files,
+        )
+
+
+# Running watchers, per index db
+watchers: Dict[str, FolderWatcher] = {}
+
+
+def sync_folder_watcher(index_db: str):
+    """
+    Start, stop or restart the folder watcher for an index database
+    to match its current config. Meant to be called periodically.
+    """
+    readonly_mode = os.environ.get("READONLY", "false").lower() in [
+        "true",
+        "1",
+    ]
+    system_config = retrieve_system_config(index_db)
+    enabled = (
+        system_config.watch_folders
+        and not readonly_mode
+        and sys.platform.startswith("linux")
+        and bool(system_config.included_folders)
+    )
+    watcher = watchers.get(index_db)
+    if watcher is not None:
+        if enabled and watcher.config == system_config and watcher.is_alive():
+            return
+        # Disabled, or the config changed, restart with the new one
+        watcher.stop()
+        del watchers[index_db]
+    if not enabled:
+        return
+    watcher = FolderWatcher(index_db, system_config)
+    watcher.start()
+    watchers[index_db] = watcher